@@ -0,0 +1,18 @@
+# alx_travel_app/celery.py
+
+"""
+Celery application for alx_travel_app.
+
+Configuration is read from the Django settings under the ``CELERY_`` prefix,
+and tasks are discovered in each installed app's ``tasks`` module.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_travel_app.settings")
+
+app = Celery("alx_travel_app")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -67,6 +67,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless REQUEST_PROFILING is on
+    "listings.profiling.RequestProfilingMiddleware",
+    # Removes itself when WRITE_CONCURRENCY_LIMIT is 0
+    "listings.throttling.WriteLoadShedMiddleware",
+    # Removes itself unless REPLICA_DATABASES is set
+    "listings.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,6 +84,20 @@ MIDDLEWARE = [
 ]
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Per-request SQL and timing instrumentation (Server-Timing headers, JSON logs
+# on the listings.profiling logger and histograms at /profiling/)
+REQUEST_PROFILING = env.bool("REQUEST_PROFILING", default=False)
+
+# Serve the listing list, detail, reviews and availability GETs from native
+# async views (listings/async_views.py). Only worth it under ASGI: a WSGI
+# server would start an event loop for every such request.
+ASYNC_READ_VIEWS = env.bool("ASYNC_READ_VIEWS", default=False)
+
+# Writes one process runs at once before answering more with 503, and the
+# Retry-After seconds sent with it; 0 turns load shedding off
+WRITE_CONCURRENCY_LIMIT = env.int("WRITE_CONCURRENCY_LIMIT", default=32)
+LOAD_SHED_RETRY_AFTER = env.int("LOAD_SHED_RETRY_AFTER", default=1)
+
 ROOT_URLCONF = "alx_travel_app.urls"
 
 TEMPLATES = [
@@ -109,9 +129,50 @@ DATABASES = {
         "PASSWORD": env("MYSQL_PASSWORD"),
         "HOST": env("MYSQL_HOST"),
         "PORT": env("MYSQL_PORT"),
+        # Keep connections open between requests and ping them before reuse.
+        # Use 0 under ASGI, where each request runs its queries in a new thread.
+        "CONN_MAX_AGE": env.int("MYSQL_CONN_MAX_AGE", default=60),
+        "CONN_HEALTH_CHECKS": True,
     },
 }
 
+# Read replicas of the primary, one alias per host. Safe listing and booking
+# reads go to them (listings/routers.py) unless the request or the client's
+# recent requests wrote to the primary.
+REPLICA_DATABASES = []
+for number, host in enumerate(env.list("MYSQL_REPLICA_HOSTS", default=[]), 1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["listings.routers.ReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after a write, to cover
+# replication lag
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=15)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": env(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": env("CACHE_LOCATION", default="alx-travel-app"),
+        "TIMEOUT": env.int("CACHE_TIMEOUT", default=300),
+        "OPTIONS": {"MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", default=10000)},
+    },
+}
+
+# Seconds a cached listing list/detail/reviews response may be served
+LISTING_CACHE_TIMEOUT = env.int("LISTING_CACHE_TIMEOUT", default=60)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -166,6 +227,18 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
     ],
     "DEFAULT_SCHEMA_CLASS": "rest_framework.schemas.coreapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "listings.pagination.KeysetPagination",
+    "PAGE_SIZE": env.int("API_PAGE_SIZE", default=20),
+    "DEFAULT_THROTTLE_CLASSES": [
+        "listings.throttling.ReadThrottle",
+        "listings.throttling.WriteThrottle",
+    ],
+    # Token buckets per user, or per IP for anonymous clients: "N/period"
+    # allows bursts of N requests refilled at N per period; empty disables
+    "DEFAULT_THROTTLE_RATES": {
+        "read": env("THROTTLE_READ_RATE", default="600/min") or None,
+        "write": env("THROTTLE_WRITE_RATE", default="60/min") or None,
+    },
 }
 
 # CORS configuration
@@ -173,3 +246,35 @@ CORS_ORIGIN_ALLOW_ALL = True
 
 # Swagger configuration
 SWAGGER_SETTINGS = {"SECURITY_DEFINITIONS": {"Basic": {"type": "basic"}}}
+
+
+# Celery
+# https://docs.celeryq.dev/en/stable/django/first-steps-with-django.html
+
+# Without CELERY_BROKER_URL there is no worker to send tasks to, so they run
+# inline in the request (or command) that queues them
+CELERY_BROKER_URL = env("CELERY_BROKER_URL", default=None)
+CELERY_TASK_ALWAYS_EAGER = env.bool(
+    "CELERY_TASK_ALWAYS_EAGER", default=CELERY_BROKER_URL is None
+)
+CELERY_TASK_EAGER_PROPAGATES = True
+CELERY_TASK_ACKS_LATE = True
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_TIMEZONE = TIME_ZONE
+CELERY_BEAT_SCHEDULE = {
+    "expire-pending-bookings": {
+        "task": "listings.tasks.expire_pending_bookings",
+        "schedule": env.int("BOOKING_EXPIRY_INTERVAL", default=300),
+    },
+}
+
+# Hours a pending booking holds its nights before the sweeper cancels it
+BOOKING_PENDING_HOLD_HOURS = env.int("BOOKING_PENDING_HOLD_HOURS", default=24)
+BOOKING_EXPIRY_BATCH_SIZE = env.int("BOOKING_EXPIRY_BATCH_SIZE", default=500)
+
+
+# Email
+EMAIL_BACKEND = env(
+    "EMAIL_BACKEND", default="django.core.mail.backends.console.EmailBackend"
+)
+DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="bookings@localhost")
@@ -0,0 +1,179 @@
+# listings/async_views.py
+
+# Native async handlers for the hot listing reads: list, detail, reviews and
+# availability. With ASYNC_READ_VIEWS on, listings/urls.py sends GETs of
+# those routes here and every other request to the DRF viewset as before.
+#
+# Under ASGI a DRF view runs in the single thread that sync_to_async keeps
+# for synchronous code, so requests queue for that thread from routing to
+# rendering. These handlers stay on the event loop and only hand it the
+# queries, through Django's async ORM. They reuse the viewset's filtering,
+# serializers, paginator and response cache, so the JSON and the cache and
+# ETag headers match the DRF routes. Other formats (`?format=`, the
+# browsable API) still go to the viewset.
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from . import cache as listing_cache
+from .serializers import ListingReviewSerializer
+from .views import ListingViewSet
+
+
+async def listing_list(view, request):
+    async def build():
+        queryset = view.get_values_queryset()
+        page = await view.paginator.apaginate_queryset(queryset, request, view)
+        return view.get_paginated_response(view.get_values_serializer(page).data)
+
+    return await listing_cache.acached_response(
+        request,
+        listing_cache.collection_scopes(request),
+        build,
+        validators=view._acollection_validators,
+    )
+
+
+async def listing_detail(view, request, id):
+    async def build():
+        listing = await _aget_object(view)
+        return Response(view.get_serializer(listing).data)
+
+    return await listing_cache.acached_response(
+        request,
+        [listing_cache.listing_scope(id)],
+        build,
+        validators=functools.partial(view._adetail_validators, id),
+    )
+
+
+async def listing_reviews(view, request, id):
+    async def build():
+        listing = await _aget_object(view)
+        paginator = view.pagination_class()
+        page = await paginator.apaginate_queryset(view._reviews(listing), request)
+        serializer = ListingReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    return await listing_cache.acached_response(
+        request, [listing_cache.listing_scope(id)], build
+    )
+
+
+async def listing_availability(view, request, id):
+    listing = await _aget_object(view)
+    start, end = view._availability_window(request)
+    booked = [
+        night async for night in view._booked_nights(listing, start, end).aiterator()
+    ]
+    return view._availability_response(listing, start, end, booked)
+
+
+HANDLERS = {
+    "listing-list": ("list", listing_list),
+    "listing-detail": ("retrieve", listing_detail),
+    "listing-reviews": ("reviews", listing_reviews),
+    "listing-availability": ("availability", listing_availability),
+}
+
+
+def route_reads(patterns):
+    """
+    Point the GET routes in HANDLERS at their async handler, keeping the
+    viewset view for everything else. Format-suffix routes are left alone.
+    """
+    routed = []
+    for pattern in patterns:
+        if (
+            pattern.name in HANDLERS
+            and "format" not in pattern.pattern.regex.groupindex
+        ):
+            action, handler = HANDLERS[pattern.name]
+            pattern.callback = _read_view(action, handler, pattern.callback)
+        routed.append(pattern)
+    return routed
+
+
+def _read_view(action, handler, viewset_view):
+    sync_view = sync_to_async(viewset_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD") or not _wants_json(request):
+            return await sync_view(request, *args, **kwargs)
+
+        viewset = ListingViewSet(
+            action_map=viewset_view.actions,
+            action=action,
+            detail=action != "list",
+            args=args,
+            kwargs=kwargs,
+            format_kwarg=None,
+            headers={},
+        )
+        for method, name in viewset_view.actions.items():
+            setattr(viewset, method, getattr(viewset, name))
+        drf_request = viewset.request = viewset.initialize_request(request)
+        drf_request.accepted_renderer = JSONRenderer()
+        drf_request.accepted_media_type = JSONRenderer.media_type
+        try:
+            # Session and token lookups query the database
+            await sync_to_async(viewset.perform_authentication)(drf_request)
+            viewset.check_permissions(drf_request)
+            viewset.check_throttles(drf_request)
+            response = await handler(viewset, drf_request, *args, **kwargs)
+        except Exception as exc:
+            response = exception_handler(exc, {"view": viewset, "request": drf_request})
+            if response is None:
+                raise
+        return _render(viewset, response)
+
+    # Keeps csrf_exempt, and the viewset details the schema generator reads
+    functools.update_wrapper(view, viewset_view)
+    return view
+
+
+def _wants_json(request):
+    if "format" in request.GET:
+        return False
+    return "text/html" not in request.headers.get("Accept", "")
+
+
+def _render(viewset, response):
+    """
+    Render a DRF response into a plain HttpResponse, so Django does not
+    send it to a thread to render it.
+    """
+    if not isinstance(response, Response):
+        return response  # a 304 from the conditional request handling
+    response.accepted_renderer = viewset.request.accepted_renderer
+    response.accepted_media_type = viewset.request.accepted_media_type
+    response.renderer_context = viewset.get_renderer_context()
+    rendered = HttpResponse(
+        response.rendered_content,
+        status=response.status_code,
+        content_type=response["Content-Type"],
+    )
+    for name, value in {
+        **viewset.default_response_headers,
+        **response.headers,
+    }.items():
+        rendered[name] = value
+    return rendered
+
+
+async def _aget_object(view):
+    """`get_object` with `aget`, failing with the same 404."""
+    queryset = view.filter_queryset(view.get_queryset())
+    lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+    try:
+        obj = await queryset.aget(**{view.lookup_field: view.kwargs[lookup_url_kwarg]})
+    except (queryset.model.DoesNotExist, DjangoValidationError, TypeError, ValueError):
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    view.check_object_permissions(view.request, obj)
+    return obj
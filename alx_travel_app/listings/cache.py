@@ -0,0 +1,228 @@
+# listings/cache.py
+
+# Read-through response cache for listing reads. Entries are keyed by the
+# request URL plus the version token of every scope the response depends on:
+# COLLECTION for list responses, plus AVAILABILITY for date searches, and
+# listing_scope(id) for one listing's detail and reviews. Listing writes bump
+# COLLECTION, while booking writes only bump AVAILABILITY. Signals invalidate
+# by replacing a scope's token, never by deleting entries; stale ones simply
+# become unreachable and age out by TTL and LRU.
+#
+# Entries also keep the validators (ETag and Last-Modified) of the response,
+# so conditional requests that hit the cache are answered without a query.
+
+import hashlib
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+KEY_PREFIX = "listings"
+GENERATION = "generation"
+COLLECTION = "collection"
+AVAILABILITY = "availability"
+HITS_KEY = f"{KEY_PREFIX}:stats:hits"
+MISSES_KEY = f"{KEY_PREFIX}:stats:misses"
+DELETED_KEY = f"{KEY_PREFIX}:deleted_at"
+
+
+def listing_scope(listing_id):
+    return f"listing:{listing_id}"
+
+
+def collection_scopes(request):
+    """The scopes of a list response; bookings only change date searches."""
+    if "check_in" in request.query_params:
+        return [COLLECTION, AVAILABILITY]
+    return [COLLECTION]
+
+
+def _version_key(scope):
+    return f"{KEY_PREFIX}:version:{scope}"
+
+
+def _get_versions(scopes):
+    keys = [_version_key(scope) for scope in (GENERATION, *scopes)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # A missing token (never set or culled) gets a fresh one, so a
+            # culled version can never bring back entries cached under it.
+            cache.add(key, uuid.uuid4().hex, timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*scopes):
+    """Make every cached response that depends on `scopes` unreachable."""
+    cache.set_many(
+        {_version_key(scope): uuid.uuid4().hex for scope in scopes}, timeout=None
+    )
+
+
+def invalidate_all():
+    invalidate(GENERATION)
+
+
+def mark_deleted():
+    """Record that a listing was deleted, for the collection Last-Modified."""
+    cache.set(DELETED_KEY, time.time(), timeout=None)
+
+
+def last_deleted():
+    """
+    Return the time of the last listing deletion as a Unix timestamp.
+
+    `max(updated_at)` cannot see deletions, so collection responses fold this
+    into their Last-Modified. A lost record is replaced with the current time,
+    which can only cause extra full responses, never a wrong 304.
+    """
+    cache.add(DELETED_KEY, time.time(), timeout=None)
+    return cache.get(DELETED_KEY, 0)
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def cache_stats():
+    """Return the hit and miss counters of the listing response cache."""
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {"hits": stats.get(HITS_KEY, 0), "misses": stats.get(MISSES_KEY, 0)}
+
+
+def reset_cache_stats():
+    cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+def _response_key(request, scopes):
+    query = urlencode(sorted(request.query_params.lists()), doseq=True)
+    # Host and scheme matter because pagination links are absolute URLs
+    raw = "|".join(
+        [
+            request.scheme,
+            request.get_host(),
+            request.path,
+            query,
+            *_get_versions(scopes),
+        ]
+    )
+    return f"{KEY_PREFIX}:response:{hashlib.sha256(raw.encode()).hexdigest()}"
+
+
+def _etag(request, fingerprint):
+    # Strong ETags must differ per representation, and the cached fingerprint
+    # is shared by every renderer of the URL.
+    raw = "|".join(
+        [fingerprint, request.accepted_media_type or "", request.get_full_path()]
+    )
+    return quote_etag(hashlib.sha256(raw.encode()).hexdigest()[:32])
+
+
+def cached_response(request, scopes, build, validators=None):
+    """
+    Return the cached response data for `request`, or build and cache it.
+
+    `build` is called on a miss and must return a DRF `Response`; only
+    successful responses are stored. `validators`, if given, is called on a
+    miss and returns a `(fingerprint, last_modified)` pair describing the
+    current data without serializing it, or None to skip conditional
+    handling. Matching If-None-Match / If-Modified-Since requests get a 304.
+    """
+    key, entry = _lookup(request, scopes)
+    if entry is not None:
+        state = entry["validators"]
+    else:
+        # Read before the data, so a concurrent write can only make the
+        # stored validators older than the body, never newer.
+        state = validators() if validators is not None else None
+
+    headers, response = _conditional_response(request, entry, state)
+    if response is not None:
+        return response
+    if entry is not None:
+        response = Response(entry["data"])
+    else:
+        response = build()
+        if not _store(key, response, state):
+            return response
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+async def acached_response(request, scopes, build, validators=None):
+    """
+    `cached_response` for async views, with coroutine functions as `build`
+    and `validators`.
+
+    The cache is still read synchronously: Django's async cache methods only
+    run the same calls in a worker thread.
+    """
+    key, entry = _lookup(request, scopes)
+    if entry is not None:
+        state = entry["validators"]
+    else:
+        state = await validators() if validators is not None else None
+
+    headers, response = _conditional_response(request, entry, state)
+    if response is not None:
+        return response
+    if entry is not None:
+        response = Response(entry["data"])
+    else:
+        response = await build()
+        if not _store(key, response, state):
+            return response
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _lookup(request, scopes):
+    key = _response_key(request, scopes)
+    entry = cache.get(key)
+    _count(MISSES_KEY if entry is None else HITS_KEY)
+    return key, entry
+
+
+def _conditional_response(request, entry, state):
+    """
+    Return the headers for the response, plus a 304 carrying them when the
+    client's copy is current.
+    """
+    headers = {"X-Cache": "MISS" if entry is None else "HIT"}
+    if state is None:
+        return headers, None
+    fingerprint, last_modified = state
+    headers["ETag"] = _etag(request, fingerprint)
+    headers["Last-Modified"] = http_date(last_modified)
+    response = get_conditional_response(
+        request, etag=headers["ETag"], last_modified=int(last_modified)
+    )
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+    return headers, response
+
+
+def _store(key, response, state):
+    """Cache a successful built response; others are only marked as misses."""
+    if response.status_code != 200:
+        response["X-Cache"] = "MISS"
+        return False
+    cache.set(
+        key,
+        {"data": response.data, "validators": state},
+        timeout=settings.LISTING_CACHE_TIMEOUT,
+    )
+    return True
@@ -0,0 +1,516 @@
+# listings/management/commands/bench_api.py
+
+import itertools
+import json
+import math
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from listings import cache as listing_cache
+from listings.models import Booking, Listing
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every listings API route on seeded datasets of several "
+        "sizes, in a throwaway test database, and writes the results as JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scales",
+            default="100,1000",
+            help="Comma-separated listing counts to seed, one run each",
+        )
+        parser.add_argument("--bookings-per-listing", type=int, default=5)
+        parser.add_argument("--reviews-per-listing", type=int, default=5)
+        parser.add_argument(
+            "--requests", type=int, default=20, help="Timed requests per route"
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Let the listing response cache serve repeated reads",
+        )
+        parser.add_argument(
+            "--output", default="-", help="Write the JSON report here (- = stdout)"
+        )
+        parser.add_argument(
+            "--compare",
+            help="Earlier JSON report; fail if any route now runs more queries",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            scales = [int(scale) for scale in options["scales"].split(",")]
+        except ValueError:
+            raise CommandError("--scales must be a comma-separated list of integers.")
+        if min(scales) < 1 or options["requests"] < 1:
+            raise CommandError("--scales and --requests must be at least 1.")
+        self.options = options
+
+        with self._test_database():
+            results = []
+            for scale in scales:
+                results.extend(self._run_scale(scale))
+
+        report = {"meta": self._meta(scales), "results": results}
+        self._write(report)
+        if options["compare"]:
+            self._compare(report, options["compare"])
+
+    @contextmanager
+    def _test_database(self):
+        """
+        Run inside a throwaway test database, which keeps the seeded rows
+        away from real data on whichever backend the settings point at.
+        Replicas are left out, since they do not see the test database, and
+        so are rate limits and load shedding, which would cut the run short.
+        """
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            with override_settings(
+                REPLICA_DATABASES=[],
+                WRITE_CONCURRENCY_LIMIT=0,
+                REST_FRAMEWORK={
+                    **settings.REST_FRAMEWORK,
+                    "DEFAULT_THROTTLE_RATES": {},
+                },
+            ):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _run_scale(self, scale):
+        self.stderr.write(f"Seeding {scale} listings...")
+        call_command(
+            "seed",
+            listings=scale,
+            bookings_per_listing=self.options["bookings_per_listing"],
+            reviews_per_listing=self.options["reviews_per_listing"],
+            seed=self.options["seed"],
+            start_date=date.today() + timedelta(days=1),
+            stdout=StringIO(),
+        )
+        self.user = User.objects.get(email="test@example.com")
+        self.stays = itertools.count()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.listing_ids = list(
+            Listing.objects.order_by("id").values_list("id", flat=True)
+        )
+        self.booking_ids = list(
+            Booking.objects.order_by("id").values_list("id", flat=True)
+        )
+
+        results = []
+        for name, build, repeat in self._routes():
+            self.stderr.write(f"  {name}")
+            result = self._measure(build, min(repeat, self.options["requests"]))
+            results.append({"scale": scale, "route": name, **result})
+        return results
+
+    def _routes(self):
+        """(name, build, max requests); build(i) returns method, url, data."""
+        listing = self._listing
+        booking = self._booking
+        today = date.today()
+        search = {
+            "check_in": (today + timedelta(days=10)).isoformat(),
+            "check_out": (today + timedelta(days=13)).isoformat(),
+            "guests": 2,
+            "min_price": 50,
+            "max_price": 250,
+        }
+        return [
+            (
+                "listings.list",
+                lambda i: ("get", reverse("listings:listing-list"), None),
+                math.inf,
+            ),
+            (
+                "listings.list.search",
+                lambda i: ("get", reverse("listings:listing-list"), search),
+                math.inf,
+            ),
+            (
+                "listings.list.by_rating",
+                lambda i: (
+                    "get",
+                    reverse("listings:listing-list"),
+                    {"ordering": "-average_rating", "min_rating": 3},
+                ),
+                math.inf,
+            ),
+            (
+                "listings.list.text",
+                lambda i: (
+                    "get",
+                    reverse("listings:listing-list"),
+                    {"q": "amazing views"},
+                ),
+                math.inf,
+            ),
+            (
+                # Seeded titles end in their number, so this matches one listing
+                "listings.list.text.selective",
+                lambda i: (
+                    "get",
+                    reverse("listings:listing-list"),
+                    {"q": f"apartment {10 + i % 90}"},
+                ),
+                math.inf,
+            ),
+            (
+                "listings.retrieve",
+                lambda i: ("get", listing("detail", i), None),
+                math.inf,
+            ),
+            (
+                "listings.reviews",
+                lambda i: ("get", listing("reviews", i), None),
+                math.inf,
+            ),
+            (
+                "listings.availability",
+                lambda i: ("get", listing("availability", i), None),
+                math.inf,
+            ),
+            (
+                "listings.create",
+                lambda i: (
+                    "post",
+                    reverse("listings:listing-list"),
+                    self._listing_payload(i),
+                ),
+                math.inf,
+            ),
+            (
+                "listings.update",
+                lambda i: ("put", listing("detail", i), self._listing_payload(i)),
+                math.inf,
+            ),
+            (
+                "listings.partial_update",
+                lambda i: (
+                    "patch",
+                    listing("detail", i),
+                    {"price_per_night": f"{100 + i}.00"},
+                ),
+                math.inf,
+            ),
+            (
+                "listings.destroy",
+                lambda i: (
+                    "delete",
+                    self._url("listing-detail", self._new_listing().pk),
+                    None,
+                ),
+                math.inf,
+            ),
+            (
+                "listings.bulk",
+                lambda i: (
+                    "post",
+                    reverse("listings:listing-bulk"),
+                    [self._listing_payload(i * 50 + n) for n in range(50)],
+                ),
+                math.inf,
+            ),
+            (
+                "bookings.list",
+                lambda i: ("get", reverse("listings:booking-list"), None),
+                math.inf,
+            ),
+            (
+                "bookings.list.filtered",
+                lambda i: (
+                    "get",
+                    reverse("listings:booking-list"),
+                    {"status": "confirmed", "from": today.isoformat()},
+                ),
+                math.inf,
+            ),
+            ("bookings.retrieve", lambda i: ("get", booking(i), None), math.inf),
+            (
+                "bookings.create",
+                lambda i: (
+                    "post",
+                    reverse("listings:booking-list"),
+                    self._booking_payload(i),
+                ),
+                math.inf,
+            ),
+            (
+                "bookings.update",
+                lambda i: self._replace_booking(i),
+                math.inf,
+            ),
+            (
+                "bookings.partial_update.status",
+                lambda i: (
+                    "patch",
+                    self._url("booking-detail", self._new_booking(i).pk),
+                    {"status": "confirmed"},
+                ),
+                math.inf,
+            ),
+            (
+                "bookings.partial_update.dates",
+                lambda i: self._move_booking(i),
+                math.inf,
+            ),
+            (
+                "bookings.destroy",
+                lambda i: (
+                    "delete",
+                    self._url("booking-detail", self._new_booking(i).pk),
+                    None,
+                ),
+                math.inf,
+            ),
+            # Full exports read every booking, so a few runs are enough
+            (
+                "bookings.export.csv",
+                lambda i: (
+                    "get",
+                    reverse("listings:booking-export", kwargs={"export_format": "csv"}),
+                    None,
+                ),
+                3,
+            ),
+            (
+                "bookings.export.ndjson",
+                lambda i: (
+                    "get",
+                    reverse(
+                        "listings:booking-export", kwargs={"export_format": "ndjson"}
+                    ),
+                    None,
+                ),
+                3,
+            ),
+        ]
+
+    def _url(self, name, pk):
+        return reverse(f"listings:{name}", kwargs={"id": pk})
+
+    def _listing(self, view, i):
+        return self._url(f"listing-{view}", self.listing_ids[i % len(self.listing_ids)])
+
+    def _booking(self, i):
+        return self._url("booking-detail", self.booking_ids[i % len(self.booking_ids)])
+
+    def _listing_payload(self, i):
+        return {
+            "title": f"Benchmark listing #{i}",
+            "description": "Created by the API benchmark",
+            "price_per_night": "120.00",
+            "max_guests": 4,
+        }
+
+    def _stay(self):
+        # Far beyond the seeded stays, and a fresh week for every booking
+        start = date.today() + timedelta(days=20 * 365 + next(self.stays) * 7)
+        return start, start + timedelta(days=2)
+
+    def _booking_payload(self, i):
+        start, end = self._stay()
+        return {
+            "listing": self.listing_ids[i % len(self.listing_ids)],
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+        }
+
+    def _new_listing(self):
+        return Listing.objects.create(
+            title="Benchmark listing",
+            description="Created by the API benchmark",
+            price_per_night=Decimal("120.00"),
+            max_guests=2,
+        )
+
+    def _new_booking(self, i):
+        start, end = self._stay()
+        return Booking.objects.create(
+            listing_id=self.listing_ids[i % len(self.listing_ids)],
+            user=self.user,
+            start_date=start,
+            end_date=end,
+        )
+
+    def _replace_booking(self, i):
+        booking = self._new_booking(i)
+        return (
+            "put",
+            self._url("booking-detail", booking.pk),
+            {
+                "listing": booking.listing_id,
+                "start_date": booking.start_date.isoformat(),
+                "end_date": (booking.end_date + timedelta(days=1)).isoformat(),
+            },
+        )
+
+    def _move_booking(self, i):
+        booking = self._new_booking(i)
+        return (
+            "patch",
+            self._url("booking-detail", booking.pk),
+            {"end_date": (booking.end_date + timedelta(days=1)).isoformat()},
+        )
+
+    def _measure(self, build, requests):
+        timings, queries, rows, statuses = [], [], 0, set()
+        # One untimed request first, so imports and caches do not skew it
+        for i in range(requests + 1):
+            method, url, data = build(i)
+            if not self.options["warm_cache"]:
+                listing_cache.invalidate_all()
+            with CaptureQueriesContext(connection) as captured:
+                began = time.perf_counter()
+                response = self._send(method, url, data)
+                count = self._count_rows(response)
+                elapsed = time.perf_counter() - began
+            if i == 0:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+            rows += count
+            statuses.add(response.status_code)
+
+        total_seconds = sum(timings) / 1000
+        return {
+            "requests": requests,
+            "status": sorted(statuses),
+            "queries": max(queries),
+            "queries_min": min(queries),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(self._percentile(timings, 95), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "rows_per_request": rows / requests,
+            "rows_per_sec": round(rows / total_seconds, 1) if total_seconds else 0,
+        }
+
+    def _send(self, method, url, data):
+        if method == "get":
+            return self.client.get(url, data)
+        return getattr(self.client, method)(url, data, format="json")
+
+    def _count_rows(self, response):
+        """Rows in the response body; streaming bodies are read to the end."""
+        if response.streaming:
+            lines = b"".join(response.streaming_content).count(b"\n")
+            csv = response["Content-Type"].startswith("text/csv")
+            return max(lines - 1, 0) if csv else lines
+        if response.status_code >= 400:
+            return 0
+        if not response.content:
+            return 1
+        data = response.json()
+        if isinstance(data, dict) and isinstance(data.get("results"), list):
+            return len(data["results"])
+        if isinstance(data, list):
+            return len(data)
+        return 1
+
+    def _percentile(self, values, percent):
+        """Nearest-rank percentile."""
+        ordered = sorted(values)
+        rank = math.ceil(percent / 100 * len(ordered))
+        return ordered[max(rank, 1) - 1]
+
+    def _meta(self, scales):
+        return {
+            "created_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "commit": self._git_commit(),
+            "vendor": connection.vendor,
+            "django": django.get_version(),
+            "scales": scales,
+            "bookings_per_listing": self.options["bookings_per_listing"],
+            "reviews_per_listing": self.options["reviews_per_listing"],
+            "requests": self.options["requests"],
+            "warm_cache": self.options["warm_cache"],
+        }
+
+    def _git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _write(self, report):
+        payload = json.dumps(report, indent=2)
+        if self.options["output"] == "-":
+            self.stdout.write(payload)
+        else:
+            with open(self.options["output"], "w") as handle:
+                handle.write(payload + "\n")
+            self.stderr.write(f"Wrote {self.options['output']}")
+
+        self.stderr.write(
+            f"\n{'scale':>7} {'route':<32} {'queries':>7} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'rows/sec':>11}"
+        )
+        for row in report["results"]:
+            self.stderr.write(
+                f"{row['scale']:>7} {row['route']:<32} {row['queries']:>7} "
+                f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+                f"{row['rows_per_sec']:>11,.0f}"
+            )
+
+    def _compare(self, report, path):
+        with open(path) as handle:
+            baseline = {
+                (row["scale"], row["route"]): row
+                for row in json.load(handle)["results"]
+            }
+
+        regressions = []
+        self.stderr.write(f"\nCompared with {path}:")
+        for row in report["results"]:
+            before = baseline.get((row["scale"], row["route"]))
+            if before is None:
+                continue
+            ratio = row["p50_ms"] / before["p50_ms"] if before["p50_ms"] else 0
+            self.stderr.write(
+                f"{row['scale']:>7} {row['route']:<32} queries "
+                f"{before['queries']} -> {row['queries']}   p50 x{ratio:.2f}"
+            )
+            if row["queries"] > before["queries"]:
+                regressions.append(f"{row['route']} at scale {row['scale']}")
+
+        if regressions:
+            raise CommandError(
+                "More queries per request than the baseline: " + ", ".join(regressions)
+            )
@@ -0,0 +1,320 @@
+# listings/management/commands/bench_asgi.py
+
+import asyncio
+import importlib
+import io
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+import django
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.urls import clear_url_caches, reverse
+from django.utils.module_loading import import_string
+from listings.management.commands import bench_api
+from listings.models import Listing
+
+# (name, server interface, ASYNC_READ_VIEWS)
+VARIANTS = [
+    ("wsgi", "wsgi", False),
+    ("asgi-sync-views", "asgi", False),
+    ("asgi-async-views", "asgi", True),
+]
+
+
+@contextmanager
+def read_views(use_async):
+    """Reload the URLconf with ASYNC_READ_VIEWS set to `use_async`."""
+    modules = ["listings.urls", settings.ROOT_URLCONF]
+    try:
+        with override_settings(ASYNC_READ_VIEWS=use_async):
+            for name in modules:
+                importlib.reload(importlib.import_module(name))
+            clear_url_caches()
+            yield
+    finally:
+        for name in modules:
+            importlib.reload(importlib.import_module(name))
+        clear_url_caches()
+
+
+def sync_only_middleware():
+    """
+    The MIDDLEWARE in use that is not async-capable. Any one of them makes
+    Django adapt the whole ASGI chain, so async views run in a thread anyway.
+    """
+
+    async def get_response(request):
+        pass
+
+    names = []
+    for path in settings.MIDDLEWARE:
+        middleware = import_string(path)
+        if getattr(middleware, "async_capable", False):
+            continue
+        try:
+            middleware(get_response)
+        except MiddlewareNotUsed:
+            continue
+        names.append(path)
+    return names
+
+
+class Command(bench_api.Command):
+    help = (
+        "Load-tests the hot listing reads in process under WSGI (thread pool) "
+        "and ASGI (event loop), with the sync DRF views and the async views, "
+        "and reports requests/sec and tail latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=1000)
+        parser.add_argument("--reviews-per-listing", type=int, default=5)
+        parser.add_argument(
+            "--concurrency",
+            default="16,64,256",
+            help="Comma-separated numbers of concurrent clients, one run each",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=2000, help="Requests per run"
+        )
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Let the listing response cache serve repeated reads",
+        )
+        parser.add_argument(
+            "--output", default="-", help="Write the JSON report here (- = stdout)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency must be a comma-separated list.")
+        if min(levels) < 1 or options["requests"] < 1 or options["listings"] < 1:
+            raise CommandError(
+                "--concurrency, --requests and --listings must be at least 1."
+            )
+        self.options = options
+
+        # A zero timeout makes every read a cache miss
+        timeout = settings.LISTING_CACHE_TIMEOUT if options["warm_cache"] else 0
+        with self._test_database(), override_settings(LISTING_CACHE_TIMEOUT=timeout):
+            self._seed()
+            self.chain = {
+                "async_chain": not isinstance(
+                    ASGIHandler()._middleware_chain, SyncToAsync
+                ),
+                "sync_middleware": sync_only_middleware(),
+            }
+            if not self.chain["async_chain"]:
+                self.stderr.write(
+                    "Sync-only middleware sends async views to a thread: "
+                    + ", ".join(self.chain["sync_middleware"])
+                )
+            results = []
+            for variant, interface, use_async in VARIANTS:
+                with read_views(use_async):
+                    paths = self._paths()
+                    for level in levels:
+                        self.stderr.write(f"  {variant} x{level}")
+                        run = self._run_asgi if interface == "asgi" else self._run_wsgi
+                        timings, failures, elapsed = run(paths, level)
+                        results.append(
+                            {
+                                "variant": variant,
+                                "concurrency": level,
+                                **self._summary(timings, failures, elapsed),
+                            }
+                        )
+
+        self._write({"meta": self._meta(levels), "results": results})
+
+    @contextmanager
+    def _test_database(self):
+        # Reads are never shed, so the load shedder stays in the chain as it
+        # is in production; only replicas and rate limits are left out
+        limit = settings.WRITE_CONCURRENCY_LIMIT
+        with super()._test_database(), override_settings(WRITE_CONCURRENCY_LIMIT=limit):
+            yield
+
+    def _seed(self):
+        self.stderr.write(f"Seeding {self.options['listings']} listings...")
+        call_command(
+            "seed",
+            listings=self.options["listings"],
+            bookings_per_listing=2,
+            reviews_per_listing=self.options["reviews_per_listing"],
+            seed=self.options["seed"],
+            start_date=date.today() + timedelta(days=1),
+            stdout=StringIO(),
+        )
+        self.listing_ids = list(Listing.objects.values_list("id", flat=True))
+
+    def _paths(self):
+        """The request mix: list pages, details, reviews and calendars."""
+        paths = []
+        for i in range(self.options["requests"]):
+            listing_id = self.listing_ids[i % len(self.listing_ids)]
+            name = ("list", "detail", "reviews", "availability")[i % 4]
+            if name == "list":
+                paths.append(reverse("listings:listing-list"))
+            else:
+                paths.append(
+                    reverse(f"listings:listing-{name}", kwargs={"id": listing_id})
+                )
+        return paths
+
+    def _run_wsgi(self, paths, concurrency):
+        """A threaded WSGI server: `concurrency` threads share the requests."""
+        handler = WSGIHandler()
+
+        def request(path):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": "",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "HTTP_HOST": "testserver",
+                "HTTP_ACCEPT": "application/json",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.url_scheme": "http",
+            }
+            statuses = []
+            began = time.perf_counter()
+            body = handler(environ, lambda status, headers: statuses.append(status))
+            b"".join(body)
+            body.close()
+            return time.perf_counter() - began, int(statuses[0].split()[0])
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(request, paths))
+        return self._split(outcomes, time.perf_counter() - began)
+
+    def _run_asgi(self, paths, concurrency):
+        """An ASGI server: `concurrency` clients on one event loop."""
+        handler = ASGIHandler()
+
+        async def request(path):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "headers": [
+                    (b"host", b"testserver"),
+                    (b"accept", b"application/json"),
+                ],
+                "server": ("testserver", 80),
+                "client": ("127.0.0.1", 50000),
+            }
+            done = asyncio.Event()
+            messages = iter([{"type": "http.request", "body": b""}])
+            statuses = []
+
+            async def receive():
+                message = next(messages, None)
+                if message is None:
+                    # Only the disconnect listener gets here; it is cancelled
+                    await done.wait()
+                    return {"type": "http.disconnect"}
+                return message
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            began = time.perf_counter()
+            await handler(scope, receive, send)
+            elapsed = time.perf_counter() - began
+            done.set()
+            return elapsed, statuses[0]
+
+        async def client(queue, outcomes):
+            while not queue.empty():
+                outcomes.append(await request(queue.get_nowait()))
+
+        async def run():
+            queue = asyncio.Queue()
+            for path in paths:
+                queue.put_nowait(path)
+            outcomes = []
+            began = time.perf_counter()
+            await asyncio.gather(*(client(queue, outcomes) for _ in range(concurrency)))
+            return outcomes, time.perf_counter() - began
+
+        outcomes, elapsed = asyncio.run(run())
+        return self._split(outcomes, elapsed)
+
+    def _split(self, outcomes, elapsed):
+        timings = [duration * 1000 for duration, status in outcomes if status < 400]
+        failures = sum(1 for _, status in outcomes if status >= 400)
+        return timings, failures, elapsed
+
+    def _summary(self, timings, failures, elapsed):
+        if not timings:
+            return {"requests": 0, "failures": failures}
+        return {
+            "requests": len(timings),
+            "failures": failures,
+            "requests_per_sec": round(len(timings) / elapsed, 1),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(self._percentile(timings, 95), 3),
+            "p99_ms": round(self._percentile(timings, 99), 3),
+            "max_ms": round(max(timings), 3),
+        }
+
+    def _meta(self, levels):
+        return {
+            "created_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+            "commit": self._git_commit(),
+            "vendor": connection.vendor,
+            "django": django.get_version(),
+            "listings": self.options["listings"],
+            "reviews_per_listing": self.options["reviews_per_listing"],
+            "requests": self.options["requests"],
+            "concurrency": levels,
+            "warm_cache": self.options["warm_cache"],
+            **self.chain,
+        }
+
+    def _write(self, report):
+        payload = json.dumps(report, indent=2)
+        if self.options["output"] == "-":
+            self.stdout.write(payload)
+        else:
+            with open(self.options["output"], "w") as handle:
+                handle.write(payload + "\n")
+            self.stderr.write(f"Wrote {self.options['output']}")
+
+        self.stderr.write(
+            f"\n{'variant':<18} {'clients':>7} {'req/s':>9} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'p99 ms':>9} {'failed':>7}"
+        )
+        for row in report["results"]:
+            self.stderr.write(
+                f"{row['variant']:<18} {row['concurrency']:>7} "
+                f"{row.get('requests_per_sec', 0):>9,.0f} "
+                f"{row.get('p50_ms', 0):>9.2f} {row.get('p95_ms', 0):>9.2f} "
+                f"{row.get('p99_ms', 0):>9.2f} {row['failures']:>7}"
+            )
@@ -0,0 +1,154 @@
+# listings/management/commands/bench_overlap.py
+
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from listings.models import Booking, Listing
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the booking overlap check with the listing foreign key index "
+        "(before) against the composite overlap index (after)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=50)
+        parser.add_argument("--bookings-per-listing", type=int, default=2000)
+        parser.add_argument("--checks", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        # Everything runs inside a transaction that is rolled back, so the
+        # benchmark never leaves synthetic rows behind.
+        with transaction.atomic():
+            listing_ids = self._create_dataset(
+                rng, options["listings"], options["bookings_per_listing"]
+            )
+            checks = [
+                self._random_check(rng, listing_ids) for _ in range(options["checks"])
+            ]
+
+            fk_index = self._listing_fk_index()
+            if fk_index is None:
+                self.stdout.write(
+                    f"Index hints are not supported on {connection.vendor}; "
+                    "skipping the 'before' run."
+                )
+            else:
+                self._report("before (listing_id index)", self._time(checks, fk_index))
+            self._report("after (booking_overlap_idx)", self._time(checks, None))
+
+            listing_id, start, end = checks[0]
+            plan = self._overlap_queryset(listing_id, start, end).explain()
+            self.stdout.write(f"\nQuery plan (after):\n{plan}")
+
+            transaction.set_rollback(True)
+
+    def _create_dataset(self, rng, listing_count, bookings_per_listing):
+        self.stdout.write(
+            f"Creating {listing_count} listings with {bookings_per_listing} "
+            "bookings each..."
+        )
+        user, _ = User.objects.get_or_create(
+            username="overlap-benchmark", defaults={"email": "bench@example.com"}
+        )
+        listings = Listing.objects.bulk_create(
+            Listing(
+                title=f"Benchmark listing #{i}",
+                description="Synthetic listing for the overlap benchmark",
+                price_per_night=100,
+                max_guests=2,
+            )
+            for i in range(listing_count)
+        )
+        if listings[0].pk is None:
+            listings = list(Listing.objects.order_by("-id")[:listing_count])
+
+        # Stays run back to back from the past towards today, which mirrors
+        # production: most of a listing's bookings are historical.
+        for listing in listings:
+            cursor = date.today() - timedelta(days=bookings_per_listing * 4)
+            rows = []
+            for _ in range(bookings_per_listing):
+                start = cursor + timedelta(days=rng.randint(0, 2))
+                end = start + timedelta(days=rng.randint(1, 3))
+                rows.append(
+                    Booking(
+                        listing=listing,
+                        user=user,
+                        start_date=start,
+                        end_date=end,
+                        status=rng.choice(["pending", "confirmed", "cancelled"]),
+                    )
+                )
+                cursor = end
+            Booking.objects.bulk_create(rows, batch_size=1000)
+        return [listing.pk for listing in listings]
+
+    def _random_check(self, rng, listing_ids):
+        start = date.today() + timedelta(days=rng.randint(-30, 60))
+        return rng.choice(listing_ids), start, start + timedelta(days=rng.randint(1, 7))
+
+    def _overlap_queryset(self, listing_id, start, end):
+        # Same query as BookingSerializer.validate
+        return (
+            Booking.objects.filter(listing_id=listing_id)
+            .active()
+            .overlapping(start, end)
+        )
+
+    def _listing_fk_index(self):
+        """Name of the single-column listing_id index from the initial schema."""
+        if connection.vendor not in ("sqlite", "mysql"):
+            return None
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Booking._meta.db_table
+            )
+        for name, info in constraints.items():
+            if info["index"] and info["columns"] == ["listing_id"]:
+                return name
+        return None
+
+    def _hinted_sql(self, queryset, index):
+        sql, params = queryset.values("pk")[:1].query.sql_with_params()
+        if index is None:
+            return sql, params
+        table = connection.ops.quote_name(Booking._meta.db_table)
+        quoted = connection.ops.quote_name(index)
+        if connection.vendor == "sqlite":
+            hint = f"{table} INDEXED BY {quoted}"
+        else:
+            hint = f"{table} FORCE INDEX ({quoted})"
+        return sql.replace(f"FROM {table}", f"FROM {hint}", 1), params
+
+    def _time(self, checks, index):
+        timings = []
+        with connection.cursor() as cursor:
+            for listing_id, start, end in checks:
+                sql, params = self._hinted_sql(
+                    self._overlap_queryset(listing_id, start, end), index
+                )
+                began = time.perf_counter()
+                cursor.execute(sql, params)
+                cursor.fetchall()
+                timings.append((time.perf_counter() - began) * 1_000_000)
+        return timings
+
+    def _report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+        self.stdout.write(
+            f"{label:<30} mean {statistics.fmean(timings):9.1f} us   "
+            f"p50 {statistics.median(timings):9.1f} us   p95 {p95:9.1f} us"
+        )
@@ -0,0 +1,118 @@
+# listings/management/commands/bench_serializers.py
+
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from listings.models import Booking, Listing, ListingRating
+from listings.serializers import (
+    BookingListSerializer,
+    BookingSerializer,
+    ListingListSerializer,
+    ListingSerializer,
+)
+from listings.views import ListingViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares rows/sec of the model serializers (before) with the lean "
+        "values() serializers (after) used by the listing and booking lists"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument(
+            "--repeat", type=int, default=3, help="Runs per variant; the best counts"
+        )
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        if rows < 1 or repeat < 1:
+            raise CommandError("--rows and --repeat must be at least 1.")
+
+        # Synthetic rows are rolled back at the end
+        with transaction.atomic():
+            self._create_dataset(rows)
+            listings = ListingViewSet.queryset.order_by("-created_at", "-id")[:rows]
+            bookings = Booking.objects.order_by("-created_at", "-id")[:rows]
+
+            self._compare(
+                "listings",
+                repeat,
+                lambda: ListingSerializer(list(listings), many=True).data,
+                lambda: ListingListSerializer(
+                    list(listings.values(*ListingListSerializer.columns())), many=True
+                ).data,
+            )
+            self._compare(
+                "bookings",
+                repeat,
+                lambda: BookingSerializer(list(bookings), many=True).data,
+                lambda: BookingListSerializer(
+                    list(bookings.values(*BookingListSerializer.columns())), many=True
+                ).data,
+            )
+            transaction.set_rollback(True)
+
+    def _create_dataset(self, rows):
+        self.stdout.write(f"Creating {rows} listings and bookings...")
+        user, _ = User.objects.get_or_create(
+            username="serializer-benchmark", defaults={"email": "bench@example.com"}
+        )
+        listings = Listing.objects.bulk_create(
+            Listing(
+                title=f"Benchmark listing #{i}",
+                description="Synthetic listing for the serializer benchmark",
+                price_per_night=Decimal("100.00") + i % 200,
+                max_guests=1 + i % 8,
+            )
+            for i in range(rows)
+        )
+        if listings[0].pk is None:
+            listings = list(Listing.objects.order_by("-id")[:rows])
+        ListingRating.objects.bulk_create(
+            ListingRating(
+                listing=listing,
+                review_count=5,
+                rating_sum=18,
+                stars_3=2,
+                stars_4=2,
+                stars_5=1,
+            )
+            for listing in listings[::2]
+        )
+        start = date.today() + timedelta(days=1)
+        Booking.objects.bulk_create(
+            Booking(
+                listing=listing,
+                user=user,
+                start_date=start,
+                end_date=start + timedelta(days=2),
+            )
+            for listing in listings
+        )
+
+    def _compare(self, label, repeat, before, after):
+        # Both variants run the same query shape and page size as the list
+        # route; JSON rendering is identical and left out.
+        rates = []
+        for render in (before, after):
+            best = min(self._time(render) for _ in range(repeat))
+            rows = len(render())
+            rates.append(rows / best)
+        self.stdout.write(
+            f"{label:<9} model serializer {rates[0]:>10,.0f} rows/s   "
+            f"values serializer {rates[1]:>10,.0f} rows/s   "
+            f"x{rates[1] / rates[0]:.1f}"
+        )
+
+    def _time(self, render):
+        began = time.perf_counter()
+        render()
+        return time.perf_counter() - began
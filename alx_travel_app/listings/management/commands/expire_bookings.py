@@ -0,0 +1,37 @@
+# listings/management/commands/expire_bookings.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from listings.tasks import expire_pending_bookings
+
+
+class Command(BaseCommand):
+    help = "Cancels pending bookings older than the hold window, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hold-hours",
+            type=int,
+            default=settings.BOOKING_PENDING_HOLD_HOURS,
+            help="Cancel bookings pending for longer than this many hours",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.BOOKING_EXPIRY_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        began = time.perf_counter()
+        expired = expire_pending_bookings(
+            hold_hours=options["hold_hours"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Expired {expired} pending bookings "
+                f"in {time.perf_counter() - began:.2f}s."
+            )
+        )
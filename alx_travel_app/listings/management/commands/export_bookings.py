@@ -0,0 +1,52 @@
+# listings/management/commands/export_bookings.py
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.exports import stream_bookings
+from listings.models import Booking
+from listings.serializers import BookingFilterSerializer
+
+
+class Command(BaseCommand):
+    help = "Streams bookings to a CSV or NDJSON file with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+        parser.add_argument(
+            "--output", help="File to write to (defaults to standard output)"
+        )
+        parser.add_argument("--listing-id", type=int)
+        parser.add_argument("--user-id", type=int)
+        parser.add_argument("--status", choices=[c for c, _ in Booking.STATUS_CHOICES])
+        parser.add_argument(
+            "--from", dest="start", help="Only stays ending after this date"
+        )
+        parser.add_argument(
+            "--to", dest="end", help="Only stays starting before this date"
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        params = {
+            "listing_id": options["listing_id"],
+            "user_id": options["user_id"],
+            "status": options["status"],
+            "from": options["start"],
+            "to": options["end"],
+        }
+        filters = BookingFilterSerializer(
+            data={key: value for key, value in params.items() if value is not None}
+        )
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        chunks = stream_bookings(
+            filters.filter_queryset(Booking.objects.all()),
+            options["format"],
+            chunk_size=options["chunk_size"],
+        )
+        if options["output"]:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                out.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,34 @@
+# listings/management/commands/rebuild_ratings.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from listings import cache as listing_cache
+from listings.models import ListingRating
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the per-listing rating aggregates from the reviews table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--listing",
+            type=int,
+            action="append",
+            dest="listing_ids",
+            help="Only rebuild this listing (may be repeated)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        began = time.perf_counter()
+        count = ListingRating.objects.rebuild(
+            listing_ids=options["listing_ids"], batch_size=options["batch_size"]
+        )
+        listing_cache.invalidate_all()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt rating aggregates for {count} listings "
+                f"in {time.perf_counter() - began:.2f}s."
+            )
+        )
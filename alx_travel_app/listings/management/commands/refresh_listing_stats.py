@@ -0,0 +1,42 @@
+# listings/management/commands/refresh_listing_stats.py
+
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from listings.models import ListingDailyStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the daily listing stats (nights booked and revenue) from the "
+        "confirmed bookings, for every day or the days in --from/--to"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=date.fromisoformat)
+        parser.add_argument(
+            "--to", dest="end", type=date.fromisoformat, help="Exclusive"
+        )
+        parser.add_argument(
+            "--listing", type=int, action="append", help="Only this listing id"
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start and end and end <= start:
+            raise CommandError("--to must be after --from.")
+        began = time.perf_counter()
+        count = ListingDailyStats.objects.refresh(
+            listing_ids=options["listing"],
+            start=start,
+            end=end,
+            batch_size=options["batch_size"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled up {count} listing days in "
+                f"{time.perf_counter() - began:.2f}s."
+            )
+        )
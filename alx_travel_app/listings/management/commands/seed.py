@@ -1,11 +1,25 @@
 # listings/management/commands/seed.py
 
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import date, timedelta
+from decimal import Decimal
 
 from django.contrib.auth import get_user_model
-from django.core.management.base import BaseCommand
-from listings.models import Booking, Listing, Review
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from listings import cache as listing_cache
+from listings import search as listing_search
+from listings.models import (
+    BookedNight,
+    Booking,
+    Listing,
+    ListingDailyStats,
+    ListingRating,
+    ListingSearchToken,
+    Review,
+)
 
 User = get_user_model()
 
@@ -13,23 +27,38 @@ User = get_user_model()
 class Command(BaseCommand):
     help = "Seeds the database with sample listings, bookings, and reviews"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=10)
+        parser.add_argument("--bookings-per-listing", type=int, default=1)
+        parser.add_argument("--reviews-per-listing", type=int, default=1)
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Random seed; reuse it (with --start-date) to rebuild the same data",
+        )
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            default=None,
+            help="First possible check-in date (YYYY-MM-DD, defaults to tomorrow)",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
     def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        seed = options["seed"]
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**32)
+        start_date = options["start_date"] or date.today() + timedelta(days=1)
+        self.rng = random.Random(seed)
+        self.batch_size = options["batch_size"]
+        self.stdout.write(f"Using --seed {seed} --start-date {start_date}")
+
         self.stdout.write("Deleting existing data...")
-        Listing.objects.all().delete()
-        Booking.objects.all().delete()
-        Review.objects.all().delete()
-
-        self.stdout.write("Creating sample listings...")
-        listings = []
-        for i in range(1, 11):
-            listing = Listing.objects.create(
-                title=f"Beautiful Apartment #{i}",
-                description=f"Spacious apartment with amazing views #{i}",
-                price_per_night=round(random.uniform(50, 300), 2),
-                max_guests=random.randint(1, 8),
-            )
-            listings.append(listing)
-            self.stdout.write(f"Created listing: {listing.title}")
+        self._clear()
 
         # Create a test user
         user, created = User.objects.get_or_create(
@@ -37,28 +66,159 @@ class Command(BaseCommand):
             defaults={"username": "testuser", "password": "testpassword123"},
         )
 
-        self.stdout.write("Creating sample bookings...")
-        for listing in listings:
-            start_date = datetime.now() + timedelta(days=random.randint(1, 30))
-            end_date = start_date + timedelta(days=random.randint(1, 14))
-
-            Booking.objects.create(
-                listing=listing,
-                user=user,
-                start_date=start_date,
-                end_date=end_date,
-                status=random.choice(["pending", "confirmed", "cancelled"]),
+        first_id, count = self._insert(
+            Listing, self._listings(options["listings"]), "listings"
+        )
+        listing_ids = range(first_id, first_id + count)
+        self._insert(
+            Booking,
+            self._bookings(
+                listing_ids, user, start_date, options["bookings_per_listing"]
+            ),
+            "bookings",
+            nights=True,
+        )
+        self._insert(
+            Review,
+            self._reviews(listing_ids, user, options["reviews_per_listing"]),
+            "reviews",
+        )
+
+        # bulk_create skips the Review and Booking signals, so build the
+        # aggregates at once
+        self.stdout.write("Building rating aggregates...")
+        ListingRating.objects.rebuild(batch_size=self.batch_size)
+        self.stdout.write("Building daily listing stats...")
+        ListingDailyStats.objects.refresh(batch_size=self.batch_size)
+        self.stdout.write("Building the search index...")
+        listing_search.rebuild_index(batch_size=self.batch_size)
+        listing_cache.invalidate_all()
+
+        self.stdout.write(
+            self.style.SUCCESS("Database seeding completed successfully!")
+        )
+
+    def _clear(self):
+        """Empty the listings tables with TRUNCATE/DELETE, not per-row deletes."""
+        tables = [
+            model._meta.db_table
+            for model in (
+                BookedNight,
+                ListingDailyStats,
+                ListingRating,
+                ListingSearchToken,
+                Review,
+                Booking,
+                Listing,
             )
+        ]
+        connection.ops.execute_sql_flush(
+            connection.ops.sql_flush(no_style(), tables, allow_cascade=True)
+        )
 
-        self.stdout.write("Creating sample reviews...")
-        for listing in listings:
-            Review.objects.create(
-                listing=listing,
-                user=user,
-                rating=random.randint(1, 5),
-                comment=f"Great experience at {listing.title}!",
+    def _listings(self, count):
+        for i in range(1, count + 1):
+            yield Listing(
+                title=f"Beautiful Apartment #{i}",
+                description=f"Spacious apartment with amazing views #{i}",
+                price_per_night=Decimal(self.rng.uniform(50, 300)).quantize(
+                    Decimal("0.01")
+                ),
+                max_guests=self.rng.randint(1, 8),
             )
 
+    def _bookings(self, listing_ids, user, start_date, per_listing):
+        """Back-to-back stays per listing with random gaps, so none overlap."""
+        for listing_id in listing_ids:
+            check_in = start_date + timedelta(days=self.rng.randint(0, 30))
+            for _ in range(per_listing):
+                check_out = check_in + timedelta(days=self.rng.randint(1, 14))
+                yield Booking(
+                    listing_id=listing_id,
+                    user=user,
+                    start_date=check_in,
+                    end_date=check_out,
+                    status=self.rng.choice(["pending", "confirmed", "cancelled"]),
+                )
+                check_in = check_out + timedelta(days=self.rng.randint(0, 7))
+
+    def _reviews(self, listing_ids, user, per_listing):
+        for listing_id in listing_ids:
+            for _ in range(per_listing):
+                yield Review(
+                    listing_id=listing_id,
+                    user=user,
+                    rating=self.rng.randint(1, 5),
+                    comment=f"Great experience at apartment #{listing_id}!",
+                )
+
+    def _insert(self, model, rows, label, nights=False):
+        """
+        Insert rows with bulk_create, one transaction per batch.
+
+        Primary keys are assigned here rather than read back from the
+        database, because MySQL does not return ids from bulk inserts and
+        bookings need theirs for the night slots. Returns the first id used
+        and the number of rows inserted.
+        """
+        self.stdout.write(f"Creating {label}...")
+        first_id = (model.objects.aggregate(top=models.Max("pk"))["top"] or 0) + 1
+        next_id, batch, total = first_id, [], 0
+        began = last_report = time.perf_counter()
+
+        def flush():
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if nights:
+                    BookedNight.objects.bulk_create(
+                        self._nights(batch), batch_size=self.batch_size
+                    )
+
+        for row in rows:
+            row.pk = next_id
+            next_id += 1
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                flush()
+                total += len(batch)
+                batch = []
+                if time.perf_counter() - last_report >= 1:
+                    last_report = time.perf_counter()
+                    self._progress(label, total, last_report - began)
+        if batch:
+            flush()
+            total += len(batch)
+
+        self._reset_sequence(model)
+        elapsed = time.perf_counter() - began
         self.stdout.write(
-            self.style.SUCCESS("Database seeding completed successfully!")
+            f"Created {total} {label} in {elapsed:.1f}s "
+            f"({self._rate(total, elapsed):,.0f} rows/sec)"
+        )
+        return first_id, total
+
+    def _nights(self, bookings):
+        for booking in bookings:
+            if booking.status in Booking.ACTIVE_STATUSES:
+                for night in booking.nights:
+                    yield BookedNight(
+                        listing_id=booking.listing_id,
+                        booking_id=booking.pk,
+                        night=night,
+                    )
+
+    def _reset_sequence(self, model):
+        # Needed where explicit ids do not advance the sequence (PostgreSQL)
+        statements = connection.ops.sequence_reset_sql(no_style(), [model])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def _progress(self, label, total, elapsed):
+        self.stdout.write(
+            f"  {total} {label} ({self._rate(total, elapsed):,.0f} rows/sec)"
         )
+
+    def _rate(self, total, elapsed):
+        return total / elapsed if elapsed else 0
@@ -0,0 +1,134 @@
+# listings/management/commands/stress_bookings.py
+
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from django.db.models import Exists, OuterRef
+from listings.models import Booking, Listing
+from listings.serializers import BookingSerializer
+from rest_framework.exceptions import ValidationError
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires concurrent booking requests at a few listings and verifies that "
+        "no listing ends up double booked"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--listings", type=int, default=5)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--attempts", type=int, default=400)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the stress listings and bookings instead of deleting them",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        user, _ = User.objects.get_or_create(
+            username="stress-test", defaults={"email": "stress@example.com"}
+        )
+        listings = [
+            Listing.objects.create(
+                title=f"Stress listing #{i}",
+                description="Synthetic listing for the booking stress test",
+                price_per_night=100,
+                max_guests=2,
+            )
+            for i in range(options["listings"])
+        ]
+        listing_ids = [listing.pk for listing in listings]
+
+        # Requests cluster on a short window so most of them contend
+        attempts = []
+        for _ in range(options["attempts"]):
+            start = date.today() + timedelta(days=rng.randint(1, 30))
+            attempts.append(
+                {
+                    "listing": rng.choice(listing_ids),
+                    "start_date": start,
+                    "end_date": start + timedelta(days=rng.randint(1, 4)),
+                }
+            )
+
+        outcomes = Counter()
+        lock = threading.Lock()
+        queue = iter(attempts)
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        payload = next(queue, None)
+                    if payload is None:
+                        return
+                    outcome = self._attempt(payload, user)
+                    with lock:
+                        outcomes[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options["threads"])]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        double_booked = self._count_double_bookings(listing_ids)
+        self.stdout.write(
+            f"{len(attempts)} attempts on {len(listing_ids)} listings with "
+            f"{options['threads']} threads in {elapsed:.2f}s "
+            f"({len(attempts) / elapsed:.1f} req/s)"
+        )
+        self.stdout.write(
+            f"created: {outcomes['created']}  rejected: {outcomes['rejected']}  "
+            f"lost race: {outcomes['lost race']}  errors: {outcomes['error']}  "
+            f"double booked: {double_booked}"
+        )
+
+        if not options["keep"]:
+            Listing.objects.filter(pk__in=listing_ids).delete()
+
+        if double_booked:
+            raise CommandError(f"{double_booked} overlapping bookings were created.")
+        self.stdout.write(self.style.SUCCESS("No double bookings."))
+
+    def _attempt(self, payload, user):
+        close_old_connections()
+        serializer = BookingSerializer(data=payload)
+        try:
+            if not serializer.is_valid():
+                return "rejected"
+            serializer.save(user=user)
+        except ValidationError:
+            # Passed the overlap check but lost the race for a night slot
+            return "lost race"
+        except DatabaseError:
+            # Lock timeouts and deadlocks are reported, not retried
+            return "error"
+        return "created"
+
+    def _count_double_bookings(self, listing_ids):
+        active = Booking.objects.filter(listing_id__in=listing_ids).active()
+        clashes = active.filter(
+            Exists(
+                Booking.objects.active()
+                .filter(listing=OuterRef("listing"))
+                .overlapping(OuterRef("start_date"), OuterRef("end_date"))
+                .exclude(pk=OuterRef("pk"))
+            )
+        )
+        return clashes.count()
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0002_keyset_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                fields=["listing", "end_date", "start_date", "status"],
+                name="booking_overlap_idx",
+            ),
+        ),
+    ]
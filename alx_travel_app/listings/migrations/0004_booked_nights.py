@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:01
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_booked_nights(apps, schema_editor):
+    """Create night slots for the bookings that already hold dates."""
+    Booking = apps.get_model("listings", "Booking")
+    BookedNight = apps.get_model("listings", "BookedNight")
+
+    batch = []
+    bookings = Booking.objects.filter(status__in=["pending", "confirmed"]).values_list(
+        "id", "listing_id", "start_date", "end_date"
+    )
+    for booking_id, listing_id, start_date, end_date in bookings.iterator(
+        chunk_size=2000
+    ):
+        for offset in range((end_date - start_date).days):
+            batch.append(
+                BookedNight(
+                    listing_id=listing_id,
+                    booking_id=booking_id,
+                    night=start_date + timedelta(days=offset),
+                )
+            )
+        if len(batch) >= 5000:
+            # Pre-existing double bookings keep the first holder of a night
+            BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    BookedNight.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0003_booking_overlap_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BookedNight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("night", models.DateField()),
+                (
+                    "booking",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="booked_nights",
+                        to="listings.booking",
+                    ),
+                ),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="booked_nights",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("listing", "night"), name="unique_listing_night"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_booked_nights, migrations.RunPython.noop),
+    ]
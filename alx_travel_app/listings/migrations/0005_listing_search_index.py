@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0004_booked_nights"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="listing",
+            index=models.Index(
+                fields=["price_per_night", "max_guests"],
+                name="listing_price_guests_idx",
+            ),
+        ),
+    ]
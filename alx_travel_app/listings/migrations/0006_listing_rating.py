@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_listing_ratings(apps, schema_editor):
+    """Build rating summaries for the reviews that already exist."""
+    Review = apps.get_model("listings", "Review")
+    ListingRating = apps.get_model("listings", "ListingRating")
+
+    stars = {
+        f"stars_{rating}": models.Count("id", filter=models.Q(rating=rating))
+        for rating in range(1, 6)
+    }
+    totals = (
+        Review.objects.order_by()
+        .values("listing_id")
+        .annotate(
+            review_count=models.Count("id"), rating_sum=models.Sum("rating"), **stars
+        )
+    )
+    ListingRating.objects.bulk_create(
+        (ListingRating(**row) for row in totals.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0005_listing_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ListingRating",
+            fields=[
+                (
+                    "listing",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating",
+                        serialize=False,
+                        to="listings.listing",
+                    ),
+                ),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("stars_1", models.PositiveIntegerField(default=0)),
+                ("stars_2", models.PositiveIntegerField(default=0)),
+                ("stars_3", models.PositiveIntegerField(default=0)),
+                ("stars_4", models.PositiveIntegerField(default=0)),
+                ("stars_5", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_listing_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0006_listing_rating"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["listing", "created_at", "id"],
+                name="review_listing_created_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.4 on 2026-10-17 06:47
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FULLTEXT_INDEX = "listing_fulltext_idx"
+
+# A frozen copy of the listings.search tokenizer, so later changes to it do
+# not change what this migration writes; rebuild_search_index re-tokenizes
+# with the current rules.
+TOKEN_MAX_LENGTH = 64
+TITLE_WEIGHT = 3
+WEIGHT_MAX = 32767
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return [
+        word[:TOKEN_MAX_LENGTH] for word in WORD.findall(text.lower()) if len(word) > 1
+    ]
+
+
+def add_fulltext_index(apps, schema_editor):
+    """MySQL searches with a FULLTEXT index instead of the token table."""
+    if schema_editor.connection.vendor != "mysql":
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"CREATE FULLTEXT INDEX {quote(FULLTEXT_INDEX)} ON "
+        f"{quote('listings_listing')} ({quote('title')}, {quote('description')})"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f"DROP INDEX {quote(FULLTEXT_INDEX)} ON {quote('listings_listing')}"
+    )
+
+
+def backfill_search_tokens(apps, schema_editor):
+    """Index the listings that already exist (not needed on MySQL)."""
+    if schema_editor.connection.vendor == "mysql":
+        return
+    using = schema_editor.connection.alias
+    Listing = apps.get_model("listings", "Listing")
+    ListingSearchToken = apps.get_model("listings", "ListingSearchToken")
+
+    def tokens():
+        listings = Listing.objects.using(using).only("title", "description")
+        for listing in listings.iterator():
+            weights = Counter(tokenize(listing.description))
+            for token in tokenize(listing.title):
+                weights[token] += TITLE_WEIGHT
+            for token, weight in weights.items():
+                yield ListingSearchToken(
+                    listing_id=listing.pk, token=token, weight=min(weight, WEIGHT_MAX)
+                )
+
+    ListingSearchToken.objects.using(using).bulk_create(tokens(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0008_booking_status_created_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ListingSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=64)),
+                ("weight", models.PositiveSmallIntegerField()),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_tokens",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("token", "listing"), name="unique_search_token_listing"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
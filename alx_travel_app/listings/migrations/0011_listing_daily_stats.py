@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-17 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_daily_stats(apps, schema_editor):
+    """Roll up the confirmed nights that already exist."""
+    BookedNight = apps.get_model("listings", "BookedNight")
+    ListingDailyStats = apps.get_model("listings", "ListingDailyStats")
+
+    totals = (
+        BookedNight.objects.filter(booking__status="confirmed")
+        .order_by()
+        .values("listing_id", day=models.F("night"))
+        .annotate(
+            nights_booked=models.Count("id"),
+            revenue=models.Sum("listing__price_per_night"),
+        )
+    )
+    ListingDailyStats.objects.bulk_create(
+        (ListingDailyStats(**row) for row in totals.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0010_admin_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ListingDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("nights_booked", models.PositiveIntegerField(default=0)),
+                (
+                    "revenue",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+                (
+                    "listing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="listings.listing",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["day", "listing"], name="listing_stats_day_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("listing", "day"), name="unique_listing_stats_day"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 08:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("listings", "0011_listing_daily_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                fields=["rating", "created_at", "id"], name="review_rating_created_idx"
+            ),
+        ),
+    ]
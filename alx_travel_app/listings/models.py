@@ -1,11 +1,19 @@
 # listings/models.py
 
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 
 User = get_user_model()
 
 
+class BookingConflict(Exception):
+    """Raised when a booking would hold a night that is already taken."""
+
+
 class Listing(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
@@ -14,11 +22,91 @@ class Listing(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="listing_created_id_idx"),
+            models.Index(
+                fields=["price_per_night", "max_guests"],
+                name="listing_price_guests_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
 
+class ListingSearchToken(models.Model):
+    """
+    One word of a listing's title or description, for full-text search.
+
+    An inverted index kept by `listings.search` on databases without a
+    native one; MySQL uses its FULLTEXT index instead.
+    """
+
+    listing = models.ForeignKey(
+        Listing, on_delete=models.CASCADE, related_name="search_tokens"
+    )
+    token = models.CharField(max_length=64)
+    # Occurrences of the word, with title occurrences counting more
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            # Leading with the token makes each search term an index range
+            models.UniqueConstraint(
+                fields=["token", "listing"], name="unique_search_token_listing"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.token} ({self.listing_id})"
+
+
+class BookingQuerySet(models.QuerySet):
+    def active(self):
+        """Bookings that hold their dates (pending or confirmed)."""
+        return self.filter(status__in=Booking.ACTIVE_STATUSES)
+
+    def overlapping(self, start_date, end_date):
+        """Bookings whose stay shares at least one night with the given range."""
+        return self.filter(start_date__lt=end_date, end_date__gt=start_date)
+
+    def expire_pending(self, created_before, batch_size=500):
+        """
+        Cancel pending bookings created before `created_before`.
+
+        Works through the `booking_status_created_idx` range in batches, each
+        its own short transaction: lock up to `batch_size` rows (skipping any
+        a concurrent confirmation holds), cancel them with one UPDATE and free
+        their night slots. Returns the number of bookings cancelled.
+        """
+        stale = self.filter(status="pending", created_at__lt=created_before)
+        expired = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    stale.select_for_update(skip_locked=True)
+                    .order_by("created_at", "id")
+                    .values_list("pk", flat=True)[:batch_size]
+                )
+                if not batch:
+                    return expired
+                expired += self.filter(pk__in=batch, status="pending").update(
+                    status="cancelled"
+                )
+                BookedNight.objects.filter(
+                    booking_id__in=batch, booking__status="cancelled"
+                ).delete()
+
+
 class Booking(models.Model):
+    ACTIVE_STATUSES = ("pending", "confirmed")
+    # Allowed status changes; cancelled is final
+    STATUS_TRANSITIONS = {
+        "pending": ("confirmed", "cancelled"),
+        "confirmed": ("cancelled",),
+        "cancelled": (),
+    }
     STATUS_CHOICES = [
         ("pending", "Pending"),
         ("confirmed", "Confirmed"),
@@ -34,9 +122,124 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="booking_created_id_idx"),
+            # The pending-booking sweeper scans (status, created_at) ranges
+            models.Index(
+                fields=["status", "created_at"], name="booking_status_created_idx"
+            ),
+            # Overlap checks filter on listing and `end_date > start`; leading
+            # with end_date skips a listing's past stays, and carrying
+            # start_date and status makes the index covering.
+            models.Index(
+                fields=["listing", "end_date", "start_date", "status"],
+                name="booking_overlap_idx",
+            ),
+            # Admin changelist filter on stay dates
+            models.Index(fields=["start_date"], name="booking_start_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.listing.title}"
 
+    @property
+    def nights(self):
+        """The dates of each night of the stay (check-out day excluded)."""
+        return [
+            self.start_date + timedelta(days=offset)
+            for offset in range((self.end_date - self.start_date).days)
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded stay, so a write can refresh the nights it left
+        if {"listing_id", "start_date", "end_date", "status"} <= set(field_names):
+            instance._loaded_stay = instance._stay
+        return instance
+
+    @property
+    def _stay(self):
+        return (self.listing_id, self.start_date, self.end_date, self.status)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the booking and its night slots in one transaction.
+
+        Every active booking owns one ``BookedNight`` row per night, and the
+        unique ``(listing, night)`` constraint lets the database reject a
+        concurrent double booking that slipped past the overlap check. Only
+        writers for the same listing and nights contend with each other.
+        """
+        adding = self._state.adding
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self._hold_nights()
+        except BookingConflict:
+            if adding:
+                self.pk = None
+                self._state.adding = True
+            raise
+
+    def change_status(self, status):
+        """
+        Move the booking to `status` with one conditional UPDATE.
+
+        The row only changes if it still has the status this instance was
+        loaded with, so a concurrent transition makes this return False
+        instead of overwriting it. Leaving the active statuses frees the
+        night slots in the same transaction. Sends no model signals.
+        """
+        with transaction.atomic():
+            changed = Booking.objects.filter(pk=self.pk, status=self.status).update(
+                status=status
+            )
+            if changed and status not in self.ACTIVE_STATUSES:
+                BookedNight.objects.filter(booking=self).delete()
+        if changed:
+            self.status = status
+        return bool(changed)
+
+    def _hold_nights(self):
+        BookedNight.objects.filter(booking=self).delete()
+        if self.status not in self.ACTIVE_STATUSES:
+            return
+        try:
+            BookedNight.objects.bulk_create(
+                BookedNight(listing_id=self.listing_id, booking=self, night=night)
+                for night in self.nights
+            )
+        except IntegrityError as exc:
+            raise BookingConflict(
+                "This listing is already booked for the selected dates."
+            ) from exc
+
+
+class BookedNight(models.Model):
+    """A night of a listing held by a pending or confirmed booking."""
+
+    listing = models.ForeignKey(
+        Listing, on_delete=models.CASCADE, related_name="booked_nights"
+    )
+    booking = models.ForeignKey(
+        Booking, on_delete=models.CASCADE, related_name="booked_nights"
+    )
+    night = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["listing", "night"], name="unique_listing_night"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} - {self.night}"
+
 
 class Review(models.Model):
     RATING_CHOICES = [
@@ -55,5 +258,206 @@ class Review(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["listing", "created_at", "id"],
+                name="review_listing_created_idx",
+            ),
+            # Newest-first admin changelist and its created_at filter
+            models.Index(fields=["created_at", "id"], name="review_created_id_idx"),
+            # The admin's rating filter, newest first
+            models.Index(
+                fields=["rating", "created_at", "id"], name="review_rating_created_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.rating} stars for {self.listing.title}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so edits can be applied to the aggregates
+        instance._loaded_rating = (instance.listing_id, instance.rating)
+        return instance
+
+
+class ListingRatingManager(models.Manager):
+    # Listing responses embed the rating, so every change here also bumps the
+    # listing's updated_at; the ETag and Last-Modified headers rely on it.
+
+    def adjust(self, listing_id, rating, delta):
+        """Add (or with a negative delta, remove) one rating atomically."""
+        changes = {
+            "review_count": models.F("review_count") + delta,
+            "rating_sum": models.F("rating_sum") + delta * rating,
+            f"stars_{rating}": models.F(f"stars_{rating}") + delta,
+        }
+        Listing.objects.filter(pk=listing_id).update(updated_at=timezone.now())
+        if self.filter(listing_id=listing_id).update(**changes) or delta < 0:
+            return
+        self.get_or_create(listing_id=listing_id)
+        self.filter(listing_id=listing_id).update(**changes)
+
+    def rebuild(self, listing_ids=None, batch_size=1000):
+        """Recompute summaries from the reviews table; returns the row count."""
+        reviews = Review.objects.all()
+        summaries = self.all()
+        listings = Listing.objects.all()
+        if listing_ids is not None:
+            reviews = reviews.filter(listing_id__in=listing_ids)
+            summaries = summaries.filter(listing_id__in=listing_ids)
+            listings = listings.filter(pk__in=listing_ids)
+
+        stars = {
+            f"stars_{rating}": models.Count("id", filter=models.Q(rating=rating))
+            for rating, _ in Review.RATING_CHOICES
+        }
+        totals = (
+            reviews.order_by()
+            .values("listing_id")
+            .annotate(
+                review_count=models.Count("id"),
+                rating_sum=models.Sum("rating"),
+                **stars,
+            )
+        )
+        with transaction.atomic():
+            listings.update(updated_at=timezone.now())
+            summaries.delete()
+            created = self.bulk_create(
+                (self.model(**row) for row in totals.iterator()),
+                batch_size=batch_size,
+            )
+        return len(created)
+
+
+class ListingRating(models.Model):
+    """
+    Denormalized review aggregates for a listing.
+
+    Kept in a side table so that saving a listing can never write back stale
+    counts; maintained with F() expressions by the Review signal handlers.
+    """
+
+    listing = models.OneToOneField(
+        Listing, on_delete=models.CASCADE, primary_key=True, related_name="rating"
+    )
+    review_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    objects = ListingRatingManager()
+
+    def __str__(self):
+        return f"{self.review_count} reviews for listing {self.listing_id}"
+
+    @property
+    def average(self):
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 2)
+
+    @property
+    def histogram(self):
+        return {
+            str(rating): getattr(self, f"stars_{rating}")
+            for rating, _ in Review.RATING_CHOICES
+        }
+
+
+class ListingDailyStatsManager(models.Manager):
+    def refresh(self, listing_ids=None, start=None, end=None, batch_size=1000):
+        """
+        Recompute the rollup rows of the nights in [start, end) from the
+        confirmed night slots; returns the number of rows written.
+        """
+        nights = BookedNight.objects.filter(booking__status="confirmed")
+        rows = self.all()
+        if listing_ids is not None:
+            nights = nights.filter(listing_id__in=listing_ids)
+            rows = rows.filter(listing_id__in=listing_ids)
+        if start is not None:
+            nights = nights.filter(night__gte=start)
+            rows = rows.filter(day__gte=start)
+        if end is not None:
+            nights = nights.filter(night__lt=end)
+            rows = rows.filter(day__lt=end)
+
+        totals = (
+            nights.order_by()
+            .values("listing_id", day=models.F("night"))
+            .annotate(
+                nights_booked=models.Count("id"),
+                revenue=models.Sum("listing__price_per_night"),
+            )
+        )
+        # A concurrent refresh of the same days may insert between the delete
+        # and the insert, so overwrite its rows rather than fail on them
+        using = router.db_for_write(self.model)
+        if connections[using].features.supports_update_conflicts_with_target:
+            unique_fields = ["listing", "day"]
+        else:
+            # MySQL upserts on any unique key and takes no target
+            unique_fields = None
+        with transaction.atomic(using=using):
+            rows.using(using).delete()
+            created = self.using(using).bulk_create(
+                (self.model(**row) for row in totals.iterator()),
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=["nights_booked", "revenue"],
+            )
+        return len(created)
+
+    def monthly(self, start, end):
+        """Nights booked and revenue per listing and month, in one query."""
+        return (
+            self.filter(day__gte=start, day__lt=end)
+            .annotate(month=TruncMonth("day"))
+            .values("listing_id", "month")
+            .annotate(
+                nights_booked=models.Sum("nights_booked"),
+                revenue=models.Sum("revenue"),
+            )
+        )
+
+
+class ListingDailyStats(models.Model):
+    """
+    Nights booked and revenue of a listing on one day, from its confirmed
+    bookings.
+
+    A rollup of the night slots priced at the listing's nightly rate when the
+    day was last refreshed, so analytics never scan bookings. Booking writes
+    refresh the days they touch; `refresh_listing_stats` rebuilds a range.
+    """
+
+    listing = models.ForeignKey(
+        Listing, on_delete=models.CASCADE, related_name="daily_stats"
+    )
+    day = models.DateField()
+    nights_booked = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    objects = ListingDailyStatsManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["listing", "day"], name="unique_listing_stats_day"
+            ),
+        ]
+        indexes = [
+            # Date-range reports across every listing
+            models.Index(fields=["day", "listing"], name="listing_stats_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} - {self.day}"
@@ -0,0 +1,212 @@
+# listings/pagination.py
+
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset (seek) pagination over a compound, unique ordering.
+
+    DRF's ``CursorPagination`` seeks on the first ordering field only and falls
+    back to an ``OFFSET`` for ties. This class always appends the primary key
+    as a tie-breaker and seeks on the whole key, e.g.
+    ``(created_at, id) < (:created_at, :id)``, so every page is a bounded
+    index range scan no matter how deep the client has paged. Cursors are
+    opaque base64 tokens encoding the boundary row's key.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    tiebreaker = "id"
+
+    def get_ordering(self, request, queryset, view):
+        """Return the view's ordering with the primary key appended."""
+        ordering = super().get_ordering(request, queryset, view)
+        names = [field.lstrip("-") for field in ordering]
+        if self.tiebreaker not in names and "pk" not in names:
+            direction = "-" if ordering[-1].startswith("-") else ""
+            ordering = (*ordering, f"{direction}{self.tiebreaker}")
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._seek(queryset, request, view)
+        if queryset is None:
+            return None
+        # Fetch one extra row to find out whether another page follows.
+        return self._set_page(list(queryset[: self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, reading rows with `aiterator`."""
+        queryset = self._seek(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page(
+            [row async for row in queryset[: self.page_size + 1].aiterator()]
+        )
+
+    def _seek(self, queryset, request, view):
+        """Order and filter `queryset` to the rows after the cursor."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.current_position = False, None
+        else:
+            self.reverse = self.cursor.reverse
+            self.current_position = self.cursor.position
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            try:
+                queryset = queryset.filter(
+                    self._get_keyset_filter(self.current_position, self.reverse)
+                )
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset
+
+    def _set_page(self, results):
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+
+        if self.reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = self.current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.current_position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+
+        try:
+            position = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=position)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            values.append(
+                value.isoformat() if hasattr(value, "isoformat") else str(value)
+            )
+        return json.dumps(values, separators=(",", ":"))
+
+    def _get_keyset_filter(self, position, reverse):
+        """
+        Build the row-value comparison that seeks past ``position``.
+
+        ``(a, b) < (x, y)`` is expanded to ``a < x OR (a = x AND b < y)``,
+        which every supported backend can answer from a composite index.
+        """
+        clauses = []
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            lookup = "lt" if descending else "gt"
+            clause = Q(**{f"{name}__{lookup}": position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                clause &= Q(**{previous.lstrip("-"): value})
+            clauses.append(clause)
+        return reduce(or_, clauses)
+
+
+class ListingStatsPagination(KeysetPagination):
+    """Keyset pages of listing analytics rows, by listing and then month."""
+
+    ordering = ("listing_id", "month")
+    # One row per listing and month, so the ordering is already unique
+    tiebreaker = "month"
+    max_page_size = 1000
+
+
+# Row count estimates kept by the database's table statistics
+ESTIMATE_SQL = {
+    "mysql": (
+        "SELECT table_rows FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = %s"
+    ),
+    "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+}
+
+
+def estimated_row_count(model, using):
+    """The table statistics' row count of `model`, or None if unavailable."""
+    connection = connections[using]
+    sql = ESTIMATE_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [model._meta.db_table])
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that reads the row count of an unfiltered large table
+    from the table statistics instead of running ``COUNT(*)`` over it.
+
+    Filtered lists, and tables the statistics put below `estimate_above`
+    rows, are counted exactly.
+    """
+
+    estimate_above = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.estimate_above:
+                return estimate
+        return super().count
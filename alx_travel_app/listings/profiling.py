@@ -0,0 +1,257 @@
+# listings/profiling.py
+
+# Opt-in request instrumentation. With REQUEST_PROFILING off the middleware
+# removes itself at startup (MiddlewareNotUsed), and the serializer hook costs
+# one context variable lookup per object.
+#
+# With it on, every request records its query count, DB time, slowest query,
+# serializer time, render time and total time. They are sent back as a
+# Server-Timing header, logged as one JSON line on the `listings.profiling`
+# logger, and folded into per-route histograms kept in this process.
+#
+# Database connections are per thread, and async views run their queries in
+# sync_to_async threads, so queries are timed by a wrapper installed on every
+# connection as it opens, which finds the request through a context variable.
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the latency histogram buckets
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_current = ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """Timings collected for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_query = ("", 0.0)
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.view_finished = None
+
+    def time_query(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - began
+            self.queries += 1
+            self.db_time += elapsed
+            if elapsed > self.slowest_query[1]:
+                self.slowest_query = (sql, elapsed)
+
+    def summary(self):
+        finished = time.perf_counter()
+        view_finished = self.view_finished or finished
+        return {
+            "queries": self.queries,
+            "db_ms": self.db_time * 1000,
+            "slowest_query_ms": self.slowest_query[1] * 1000,
+            "serialize_ms": self.serialize_time * 1000,
+            "render_ms": (finished - view_finished) * 1000,
+            "total_ms": (finished - self.started) * 1000,
+        }
+
+
+def time_query(execute, sql, params, many, context):
+    """Count the query against the current request's profile, if any."""
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.time_query(execute, sql, params, many, context)
+
+
+def _wrap(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class ProfiledSerializerMixin:
+    """Count the time spent turning objects into primitives, once per request."""
+
+    def to_representation(self, instance):
+        profile = _current.get()
+        if profile is None or profile.serializing:
+            return super().to_representation(instance)
+        profile.serializing = True
+        began = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            profile.serializing = False
+            profile.serialize_time += time.perf_counter() - began
+
+
+class ProfiledListSerializer(ProfiledSerializerMixin, serializers.ListSerializer):
+    """Times a whole page at once, for children that define their own rows."""
+
+
+class RouteStats:
+    """Per-route request counts, sums and latency histograms for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, summary):
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "count": 0,
+                    "queries": {"sum": 0, "max": 0},
+                    "total_ms": _histogram(),
+                    "db_ms": _histogram(),
+                    "serialize_ms": _histogram(),
+                }
+            stats["count"] += 1
+            stats["queries"]["sum"] += summary["queries"]
+            stats["queries"]["max"] = max(stats["queries"]["max"], summary["queries"])
+            for name in ("total_ms", "db_ms", "serialize_ms"):
+                _observe(stats[name], summary[name])
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self._routes))
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+def _histogram():
+    return {"sum": 0.0, "max": 0.0, "buckets": [0] * (len(BUCKETS_MS) + 1)}
+
+
+def _observe(histogram, value):
+    histogram["sum"] += value
+    histogram["max"] = max(histogram["max"], value)
+    histogram["buckets"][bisect_left(BUCKETS_MS, value)] += 1
+
+
+route_stats = RouteStats()
+
+
+def stats_report():
+    """Aggregated histograms in a JSON-friendly shape."""
+    routes = route_stats.snapshot()
+    labels = [str(bound) for bound in BUCKETS_MS] + ["+Inf"]
+    for stats in routes.values():
+        for name in ("total_ms", "db_ms", "serialize_ms"):
+            stats[name]["buckets"] = dict(zip(labels, stats[name]["buckets"]))
+    return {
+        "enabled": settings.REQUEST_PROFILING,
+        "pid": os.getpid(),
+        "routes": routes,
+    }
+
+
+class RequestProfilingMiddleware:
+    """
+    Time each request and break it down into DB, serializer and render time.
+
+    List it first in MIDDLEWARE so the total covers the other middleware.
+    Async-capable, so it keeps async views on the event loop under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Django runs sync hooks of an async chain in a thread
+            self.process_template_response = self._aprocess_template_response
+        # Connections opened from now on, in any thread, and this thread's
+        connection_created.connect(_wrap, dispatch_uid=__name__)
+        for connection in connections.all(initialized_only=True):
+            _wrap(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._profiling() as profile:
+            response = self.get_response(request)
+        return self._report(request, response, profile)
+
+    async def __acall__(self, request):
+        with self._profiling() as profile:
+            response = await self.get_response(request)
+        return self._report(request, response, profile)
+
+    @contextmanager
+    def _profiling(self):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            yield profile
+        finally:
+            _current.reset(token)
+
+    def _report(self, request, response, profile):
+        summary = profile.summary()
+        route = _route_name(request)
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={summary["db_ms"]:.2f};desc="{summary["queries"]} queries"',
+                f'slowest-query;dur={summary["slowest_query_ms"]:.2f}',
+                f'serialize;dur={summary["serialize_ms"]:.2f}',
+                f'render;dur={summary["render_ms"]:.2f}',
+                f'total;dur={summary["total_ms"]:.2f}',
+            ]
+        )
+        route_stats.record(route, summary)
+        record = {
+            "route": route,
+            "path": request.path,
+            "status": response.status_code,
+            **{name: round(value, 3) for name, value in summary.items()},
+            "slowest_query": profile.slowest_query[0],
+        }
+        logger.info(json.dumps(record), extra={"profile": record})
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses render right after this hook, once the view is done
+        _mark_view_finished()
+        return response
+
+    async def _aprocess_template_response(self, request, response):
+        _mark_view_finished()
+        return response
+
+
+def _mark_view_finished():
+    profile = _current.get()
+    if profile is not None:
+        profile.view_finished = time.perf_counter()
+
+
+def _route_name(request):
+    match = request.resolver_match
+    if match is None:
+        return f"{request.method} <unmatched>"
+    return f"{request.method} {match.view_name}"
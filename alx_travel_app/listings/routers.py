@@ -0,0 +1,151 @@
+# listings/routers.py
+
+# Read replica routing. Everything reads from the primary unless
+# ReplicaRoutingMiddleware tracks the request as a safe read, and the view it
+# resolved to opts in with `replica_reads = True` (the listing and booking
+# viewsets).
+# Those reads are spread over REPLICA_DATABASES until the request runs a
+# write statement on the primary; from then on it reads from the primary, and
+# a cookie keeps the same client on the primary for REPLICA_PIN_SECONDS so it
+# reads its own writes despite replication lag. Celery tasks and commands
+# run outside any request and always use the primary.
+#
+# Database connections are per thread, and async views run their queries in
+# sync_to_async threads, so writes are spotted by a wrapper installed on every
+# primary connection as it opens, which finds the request through a context
+# variable.
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+
+PIN_COOKIE = "db_pinned"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_current = ContextVar("replica_routing", default=None)
+
+
+class RoutingState:
+    """How the current request may read."""
+
+    def __init__(self, request, pinned=False):
+        self.request = request
+        self.pinned = pinned
+        self.wrote = False
+
+    @property
+    def use_replicas(self):
+        # Read per query, since URL resolution happens inside the middleware
+        match = self.request.resolver_match
+        view_class = getattr(match.func, "cls", None) if match else None
+        return getattr(view_class, "replica_reads", False)
+
+
+def track_writes(execute, sql, params, many, context):
+    """Pin the current request to the primary once it runs a write."""
+    # db_for_write is also asked about unsaved instances, so only statements
+    # that reach the primary count as writes
+    state = _current.get()
+    if state is not None and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        state.pinned = state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def _wrap_primary(connection, **kwargs):
+    if (
+        connection.alias == DEFAULT_DB_ALIAS
+        and track_writes not in connection.execute_wrappers
+    ):
+        connection.execute_wrappers.append(track_writes)
+
+
+class ReplicaRouter:
+    """Send a request's reads to a replica while its RoutingState allows."""
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        if state is None or not settings.REPLICA_DATABASES:
+            return None
+        if state.pinned or not state.use_replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.REPLICA_DATABASES)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Track each request's RoutingState for ReplicaRouter, and pin clients that
+    wrote to the primary.
+
+    Async-capable, so it keeps async views on the event loop under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened from now on, in any thread, and this thread's
+        connection_created.connect(_wrap_primary, dispatch_uid=__name__)
+        for connection in connections.all(initialized_only=True):
+            _wrap_primary(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self._routing(request) as state:
+            response = self.get_response(request)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        with self._routing(request) as state:
+            response = await self.get_response(request)
+        return self._pin(response, state)
+
+    @contextmanager
+    def _routing(self, request):
+        state = RoutingState(
+            request,
+            pinned=request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES,
+        )
+        token = _current.set(state)
+        try:
+            yield state
+        finally:
+            _current.reset(token)
+
+    def _pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,126 @@
+# listings/search.py
+
+# Full-text search over listing titles and descriptions.
+#
+# On MySQL the `listing_fulltext_idx` FULLTEXT index answers the search with
+# MATCH ... AGAINST in boolean mode. Other databases use ListingSearchToken,
+# an inverted index of (token, listing, weight) rows rewritten whenever a
+# listing is saved. Either way every search term must match, and the
+# `relevance` annotation ranks the results.
+#
+# tokenize keeps words of two or more characters. InnoDB only indexes words
+# of innodb_ft_min_token_size (3 by default) and skips its stopwords, so set
+# innodb_ft_min_token_size=2 and innodb_ft_enable_stopword=OFF, then rebuild
+# the index, for MySQL to match the token table on short and common words.
+
+import re
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.expressions import RawSQL
+
+from .models import Listing, ListingSearchToken
+
+TOKEN_MAX_LENGTH = 64
+# Occurrences in the title weigh this much more than in the description
+TITLE_WEIGHT = 3
+WEIGHT_MAX = 32767
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lower-cased words of at least two characters, in order."""
+    return [
+        word[:TOKEN_MAX_LENGTH] for word in _WORD.findall(text.lower()) if len(word) > 1
+    ]
+
+
+def uses_fulltext(using="default"):
+    return connections[using].vendor == "mysql"
+
+
+def search_listings(queryset, query):
+    """
+    Filter listings to those matching every word of `query`, annotated with
+    their `relevance` (higher is better).
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset.none()
+    if uses_fulltext(queryset.db):
+        return _fulltext_search(queryset, terms)
+
+    tokens = ListingSearchToken.objects.filter(token__in=terms).order_by()
+    matches = (
+        tokens.values("listing_id")
+        .annotate(matched=Count("id"))
+        .filter(matched=len(terms))
+        .values("listing_id")
+    )
+    relevance = (
+        tokens.filter(listing_id=OuterRef("pk"))
+        .values("listing_id")
+        .annotate(total=Sum("weight"))
+        .values("total")
+    )
+    return queryset.filter(pk__in=matches).annotate(relevance=Subquery(relevance))
+
+
+def _fulltext_search(queryset, terms):
+    quote = connections[queryset.db].ops.quote_name
+    table = quote(Listing._meta.db_table)
+    match = RawSQL(
+        f"MATCH ({table}.{quote('title')}, {table}.{quote('description')}) "
+        "AGAINST (%s IN BOOLEAN MODE)",
+        # Tokens are plain words, so they carry no boolean operators
+        (" ".join(f"+{term}" for term in terms),),
+    )
+    return queryset.annotate(relevance=match).filter(relevance__gt=0)
+
+
+def _tokens(listing):
+    weights = Counter(tokenize(listing.description))
+    for token in tokenize(listing.title):
+        weights[token] += TITLE_WEIGHT
+    for token, weight in weights.items():
+        yield ListingSearchToken(
+            listing_id=listing.pk, token=token, weight=min(weight, WEIGHT_MAX)
+        )
+
+
+def index_listings(listings, using="default"):
+    """Rewrite the search tokens of the given saved listings."""
+    if uses_fulltext(using):
+        return
+    listings = [listing for listing in listings if listing.pk is not None]
+    with transaction.atomic(using=using, savepoint=False):
+        ListingSearchToken.objects.using(using).filter(
+            listing_id__in=[listing.pk for listing in listings]
+        ).delete()
+        _insert_tokens(listings, using)
+
+
+def rebuild_index(batch_size=1000, using="default"):
+    """Re-tokenize every listing; returns the number of listings indexed."""
+    if uses_fulltext(using):
+        return 0
+    listings = Listing.objects.using(using).only("title", "description")
+    indexed, batch = 0, []
+    with transaction.atomic(using=using):
+        ListingSearchToken.objects.using(using).all().delete()
+        for listing in listings.order_by("pk").iterator(chunk_size=batch_size):
+            batch.append(listing)
+            if len(batch) >= batch_size:
+                _insert_tokens(batch, using)
+                indexed, batch = indexed + len(batch), []
+        _insert_tokens(batch, using)
+    return indexed + len(batch)
+
+
+def _insert_tokens(listings, using):
+    ListingSearchToken.objects.using(using).bulk_create(
+        (token for listing in listings for token in _tokens(listing)),
+        batch_size=1000,
+    )
@@ -1,12 +1,31 @@
 # listings/serializers.py
 
+from datetime import timedelta
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from rest_framework import serializers
 
-from .models import Booking, Listing, Review
+from .models import Booking, BookingConflict, Listing, ListingRating, Review
+from .profiling import ProfiledListSerializer, ProfiledSerializerMixin
+from .search import tokenize
+
+User = get_user_model()
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewerSerializer(serializers.ModelSerializer):
+    """
+    Public summary of the user who wrote a review.
+    """
+
+    class Meta:
+        model = User
+        fields = ["id", "username", "first_name"]
+        read_only_fields = fields
+
+
+class ReviewSerializer(ProfiledSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Review model.
     """
@@ -36,11 +55,46 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ListingSerializer(serializers.ModelSerializer):
+class ListingReviewSerializer(ReviewSerializer):
+    """
+    Review with its reviewer embedded, for the listing reviews feed.
+
+    Expects the queryset to `select_related("user")`.
+    """
+
+    reviewer = ReviewerSerializer(source="user", read_only=True)
+
+    class Meta(ReviewSerializer.Meta):
+        fields = ReviewSerializer.Meta.fields + ["reviewer"]
+
+
+class SparseFieldsMixin:
+    """
+    Drop the fields not named in `context["fields"]`, when it is set.
+
+    Views set it from `?fields=` on reads only, so writes always validate
+    the full payload.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selected = self.context.get("fields")
+        if selected is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in selected}
+
+
+class ListingSerializer(
+    ProfiledSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializer for the Listing model.
     """
 
+    review_count = serializers.SerializerMethodField()
+    average_rating = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
+
     class Meta:
         model = Listing
         fields = [
@@ -51,9 +105,27 @@ class ListingSerializer(serializers.ModelSerializer):
             "max_guests",
             "created_at",
             "updated_at",
+            "review_count",
+            "average_rating",
+            "rating_histogram",
         ]
         read_only_fields = ("id", "created_at", "updated_at")
 
+    def _get_rating(self, obj):
+        try:
+            return obj.rating
+        except ListingRating.DoesNotExist:
+            return ListingRating(listing=obj)
+
+    def get_review_count(self, obj):
+        return self._get_rating(obj).review_count
+
+    def get_average_rating(self, obj):
+        return self._get_rating(obj).average
+
+    def get_rating_histogram(self, obj):
+        return self._get_rating(obj).histogram
+
     def validate_price_per_night(self, value):
         """Ensure price is positive."""
         if value <= 0:
@@ -69,7 +141,103 @@ class ListingSerializer(serializers.ModelSerializer):
         return value
 
 
-class BookingSerializer(serializers.ModelSerializer):
+class ValuesSerializer(serializers.BaseSerializer):
+    """
+    Base for read-only serializers of `.values()` rows.
+
+    `sources` maps each output field to the columns it is built from. A
+    field is copied from its only column unless the class defines
+    `render_<field>(row)`. Pass `fields` to render a subset, and fetch
+    `columns(fields)` for it.
+
+    Each page is rendered by one child instance, so the current timezone is
+    looked up once here instead of once per datetime.
+    """
+
+    sources = {}
+
+    class Meta:
+        list_serializer_class = ProfiledListSerializer
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._datetime = serializers.DateTimeField(
+            default_timezone=serializers.DateTimeField().default_timezone()
+        )
+        self._renderers = [
+            (name, getattr(self, f"render_{name}", None) or itemgetter(columns[0]))
+            for name, columns in self.sources.items()
+            if fields is None or name in fields
+        ]
+
+    @classmethod
+    def columns(cls, fields=None):
+        """The columns to fetch for `fields`, or for every field."""
+        return list(
+            dict.fromkeys(
+                column
+                for name, columns in cls.sources.items()
+                if fields is None or name in fields
+                for column in columns
+            )
+        )
+
+    def to_representation(self, row):
+        return {name: render(row) for name, render in self._renderers}
+
+
+class ListingListSerializer(ValuesSerializer):
+    """
+    Read-only rendering of listing rows, for the list route.
+
+    Produces the same JSON as `ListingSerializer` without model instances
+    or bound fields.
+    """
+
+    sources = {
+        "id": ("id",),
+        "title": ("title",),
+        "description": ("description",),
+        "price_per_night": ("price_per_night",),
+        "max_guests": ("max_guests",),
+        "created_at": ("created_at",),
+        "updated_at": ("updated_at",),
+        "review_count": ("rating__review_count",),
+        "average_rating": ("rating__review_count", "rating__rating_sum"),
+        "rating_histogram": tuple(
+            f"rating__stars_{rating}" for rating, _ in Review.RATING_CHOICES
+        ),
+    }
+    _price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    def render_price_per_night(self, row):
+        return self._price.to_representation(row["price_per_night"])
+
+    def render_created_at(self, row):
+        return self._datetime.to_representation(row["created_at"])
+
+    def render_updated_at(self, row):
+        return self._datetime.to_representation(row["updated_at"])
+
+    def render_review_count(self, row):
+        return row["rating__review_count"] or 0
+
+    def render_average_rating(self, row):
+        review_count = row["rating__review_count"]
+        if not review_count:
+            return None
+        return round(row["rating__rating_sum"] / review_count, 2)
+
+    def render_rating_histogram(self, row):
+        return {
+            str(rating): row[f"rating__stars_{rating}"] or 0
+            for rating, _ in Review.RATING_CHOICES
+        }
+
+
+class BookingSerializer(
+    ProfiledSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializer for the Booking model.
     """
@@ -88,36 +256,63 @@ class BookingSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_at")
         extra_kwargs = {"user": {"read_only": True}, "status": {"required": False}}
 
+    def validate_status(self, value):
+        """
+        Only allow the transitions in `Booking.STATUS_TRANSITIONS`.
+        """
+        current = self.instance.status if self.instance else None
+        if current is not None and value != current:
+            if value not in Booking.STATUS_TRANSITIONS[current]:
+                raise serializers.ValidationError(
+                    f"Cannot change a {current} booking to {value}."
+                )
+        return value
+
     def validate(self, data):
         """
         Validate booking dates and availability.
+
+        Partial updates fall back to the booking's current stay, and the date
+        and overlap checks are skipped when the stay is unchanged.
         """
+        instance = self.instance
+        start_date = data.get("start_date", getattr(instance, "start_date", None))
+        end_date = data.get("end_date", getattr(instance, "end_date", None))
+        listing = data.get("listing")
+        listing_id = listing.pk if listing else getattr(instance, "listing_id", None)
+
         # Check if start_date is before end_date
-        if data["start_date"] >= data["end_date"]:
+        if start_date >= end_date:
             raise serializers.ValidationError("End date must be after start date.")
 
         # Check if booking is for at least 1 night
-        if (data["end_date"] - data["start_date"]).days < 1:
+        if (end_date - start_date).days < 1:
             raise serializers.ValidationError("Booking must be for at least one night.")
 
+        # An unchanged stay was validated when booked and holds its nights
+        if instance and (listing_id, start_date, end_date) == (
+            instance.listing_id,
+            instance.start_date,
+            instance.end_date,
+        ):
+            return data
+
         # Check if booking is not in the past
-        if data["start_date"] < timezone.now().date():
+        if start_date < timezone.now().date():
             raise serializers.ValidationError("Cannot book for past dates.")
 
         # Check if listing exists and is available
-        listing = data.get("listing")
-        if listing:
+        if listing_id:
             # Check for overlapping bookings
-            overlapping_bookings = Booking.objects.filter(
-                listing=listing,
-                start_date__lt=data["end_date"],
-                end_date__gt=data["start_date"],
-                status__in=["pending", "confirmed"],
+            overlapping_bookings = (
+                Booking.objects.filter(listing_id=listing_id)
+                .active()
+                .overlapping(start_date, end_date)
             )
 
             # Exclude current instance when updating
-            if self.instance:
-                overlapping_bookings = overlapping_bookings.exclude(pk=self.instance.pk)
+            if instance:
+                overlapping_bookings = overlapping_bookings.exclude(pk=instance.pk)
 
             if overlapping_bookings.exists():
                 raise serializers.ValidationError(
@@ -125,3 +320,217 @@ class BookingSerializer(serializers.ModelSerializer):
                 )
 
         return data
+
+    def create(self, validated_data):
+        """Create the booking, reporting a lost reservation race as invalid."""
+        try:
+            return super().create(validated_data)
+        except BookingConflict as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def update(self, instance, validated_data):
+        """Update the booking, reporting a lost reservation race as invalid."""
+        try:
+            return super().update(instance, validated_data)
+        except BookingConflict as exc:
+            raise serializers.ValidationError(str(exc))
+
+
+class BookingListSerializer(ValuesSerializer):
+    """
+    Read-only rendering of booking rows, for the list route.
+
+    Same JSON as `BookingSerializer`, without the per-field machinery.
+    """
+
+    sources = {
+        "id": ("id",),
+        "listing": ("listing_id",),
+        "user": ("user_id",),
+        "start_date": ("start_date",),
+        "end_date": ("end_date",),
+        "status": ("status",),
+        "created_at": ("created_at",),
+    }
+    _date = serializers.DateField()
+
+    def render_start_date(self, row):
+        return self._date.to_representation(row["start_date"])
+
+    def render_end_date(self, row):
+        return self._date.to_representation(row["end_date"])
+
+    def render_created_at(self, row):
+        return self._datetime.to_representation(row["created_at"])
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """
+    Validate the ``from``/``to`` window of an availability request.
+
+    ``to`` is exclusive, like a booking's check-out day. The window defaults to
+    the next 90 nights and is capped at a year.
+    """
+
+    DEFAULT_NIGHTS = 90
+    MAX_NIGHTS = 366
+
+    def get_fields(self):
+        # "from" is a Python keyword, so the fields cannot be class attributes
+        return {
+            "from": serializers.DateField(required=False),
+            "to": serializers.DateField(required=False),
+        }
+
+    def validate(self, data):
+        start = data.get("from") or timezone.now().date()
+        end = data.get("to") or start + timedelta(days=self.DEFAULT_NIGHTS)
+
+        if end <= start:
+            raise serializers.ValidationError("'to' must be after 'from'.")
+        if (end - start).days > self.MAX_NIGHTS:
+            raise serializers.ValidationError(
+                f"The window cannot exceed {self.MAX_NIGHTS} nights."
+            )
+        return {"from": start, "to": end}
+
+
+class ListingStatsQuerySerializer(serializers.Serializer):
+    """
+    Validate the window of a listing analytics request.
+
+    ``to`` is exclusive. The window defaults to the current month and is
+    capped at two years.
+    """
+
+    MAX_DAYS = 731
+
+    def get_fields(self):
+        # "from" is a Python keyword, so the fields cannot be class attributes
+        return {
+            "from": serializers.DateField(required=False),
+            "to": serializers.DateField(required=False),
+            "listing_id": serializers.IntegerField(required=False, min_value=1),
+        }
+
+    def validate(self, data):
+        start = data.get("from") or timezone.now().date().replace(day=1)
+        end = data.get("to") or _next_month(start)
+
+        if end <= start:
+            raise serializers.ValidationError("'to' must be after 'from'.")
+        if (end - start).days > self.MAX_DAYS:
+            raise serializers.ValidationError(
+                f"The window cannot exceed {self.MAX_DAYS} days."
+            )
+        return {**data, "from": start, "to": end}
+
+
+class ListingMonthStatsSerializer(serializers.Serializer):
+    """
+    One listing's month within the requested window. Occupancy is the share
+    of the month's nights inside the window that confirmed stays booked.
+    """
+
+    listing_id = serializers.IntegerField()
+    month = serializers.DateField()
+    nights_booked = serializers.IntegerField()
+    available_nights = serializers.SerializerMethodField()
+    occupancy = serializers.SerializerMethodField()
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+
+    def get_available_nights(self, row):
+        start = max(row["month"], self.context["from"])
+        end = min(_next_month(row["month"]), self.context["to"])
+        return (end - start).days
+
+    def get_occupancy(self, row):
+        return round(row["nights_booked"] / self.get_available_nights(row), 4)
+
+
+def _next_month(day):
+    """The first day of the month after `day`."""
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+class ListingSearchSerializer(serializers.Serializer):
+    """
+    Validate the search parameters accepted by the listing collection.
+    """
+
+    check_in = serializers.DateField(required=False)
+    check_out = serializers.DateField(required=False)
+    guests = serializers.IntegerField(required=False, min_value=1)
+    min_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, min_value=0
+    )
+    max_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, required=False, min_value=0
+    )
+    min_rating = serializers.DecimalField(
+        max_digits=3, decimal_places=2, required=False, min_value=1, max_value=5
+    )
+    q = serializers.CharField(required=False, max_length=200)
+
+    def validate_q(self, value):
+        """Require at least one searchable word."""
+        if not tokenize(value):
+            raise serializers.ValidationError("Enter at least one word to search.")
+        return value
+
+    def validate(self, data):
+        """Require both stay dates together and ordered price bounds."""
+        check_in, check_out = data.get("check_in"), data.get("check_out")
+        if (check_in is None) != (check_out is None):
+            raise serializers.ValidationError(
+                "check_in and check_out must be given together."
+            )
+        if check_in and check_out <= check_in:
+            raise serializers.ValidationError("check_out must be after check_in.")
+
+        min_price, max_price = data.get("min_price"), data.get("max_price")
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError(
+                "min_price cannot be greater than max_price."
+            )
+        return data
+
+
+class BookingFilterSerializer(serializers.Serializer):
+    """
+    Validate booking filters shared by the booking list and exports.
+
+    `from` and `to` select bookings whose stay overlaps that window.
+    """
+
+    def get_fields(self):
+        # "from" is a Python keyword, so the fields cannot be class attributes
+        return {
+            "listing_id": serializers.IntegerField(required=False),
+            "user_id": serializers.IntegerField(required=False),
+            "status": serializers.ChoiceField(
+                choices=Booking.STATUS_CHOICES, required=False
+            ),
+            "from": serializers.DateField(required=False),
+            "to": serializers.DateField(required=False),
+        }
+
+    def validate(self, data):
+        if "from" in data and "to" in data and data["to"] <= data["from"]:
+            raise serializers.ValidationError("'to' must be after 'from'.")
+        return data
+
+    def filter_queryset(self, queryset):
+        """Apply the validated filters to a booking queryset."""
+        filters = self.validated_data
+        if "listing_id" in filters:
+            queryset = queryset.filter(listing_id=filters["listing_id"])
+        if "user_id" in filters:
+            queryset = queryset.filter(user_id=filters["user_id"])
+        if "status" in filters:
+            queryset = queryset.filter(status=filters["status"])
+        if "from" in filters:
+            queryset = queryset.filter(end_date__gt=filters["from"])
+        if "to" in filters:
+            queryset = queryset.filter(start_date__lt=filters["to"])
+        return queryset
@@ -0,0 +1,98 @@
+# listings/signals.py
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache, search, tasks
+from .models import Booking, Listing, ListingRating, Review
+
+
+@receiver(post_save, sender=Review)
+def apply_review_rating(sender, instance, created, **kwargs):
+    """Fold a new or edited review into its listing's rating aggregates."""
+    current = (instance.listing_id, instance.rating)
+    if created:
+        previous = None
+    elif hasattr(instance, "_loaded_rating"):
+        previous = instance._loaded_rating
+    else:
+        # An existing row saved from an instance we did not load: the old
+        # rating is unknown, so recount the listing instead of guessing.
+        ListingRating.objects.rebuild(listing_ids=[instance.listing_id])
+        instance._loaded_rating = current
+        return
+    if previous == current:
+        return
+
+    if previous is not None:
+        ListingRating.objects.adjust(*previous, delta=-1)
+    ListingRating.objects.adjust(*current, delta=1)
+    instance._loaded_rating = current
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """Take a deleted review out of its listing's rating aggregates."""
+    listing_id, rating = getattr(
+        instance, "_loaded_rating", (instance.listing_id, instance.rating)
+    )
+    ListingRating.objects.adjust(listing_id, rating, delta=-1)
+
+
+def invalidate_on_commit(using, *scopes):
+    """
+    Invalidate `scopes` once the write commits. Invalidating inside the
+    transaction would let a concurrent read cache the old rows under the
+    new token.
+    """
+    transaction.on_commit(partial(cache.invalidate, *scopes), using=using)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_listing_cache(sender, instance, using, **kwargs):
+    """A listing change affects its own responses and every list page."""
+    invalidate_on_commit(using, cache.COLLECTION, cache.listing_scope(instance.pk))
+
+
+@receiver(post_save, sender=Listing)
+def index_listing_text(sender, instance, using, update_fields=None, **kwargs):
+    """Keep the search tokens in step with the title and description."""
+    if update_fields is not None and not {"title", "description"} & update_fields:
+        return
+    search.index_listings([instance], using=using)
+
+
+@receiver(post_delete, sender=Listing)
+def record_listing_deletion(sender, instance, **kwargs):
+    cache.mark_deleted()
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def invalidate_availability_cache(sender, instance, using, **kwargs):
+    """Bookings only change which listings a date search returns."""
+    invalidate_on_commit(using, cache.AVAILABILITY)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def refresh_booking_stats(sender, instance, **kwargs):
+    """Queue a re-roll of the daily stats a confirmed stay held or holds."""
+    stays = {instance._stay, getattr(instance, "_loaded_stay", instance._stay)}
+    for listing_id, start, end, status in stays:
+        if status == "confirmed":
+            tasks.queue_stats_refresh(listing_id, start, end)
+    instance._loaded_stay = instance._stay
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_cache(sender, instance, using, **kwargs):
+    """Reviews change the listing's reviews, rating fields and sort order."""
+    invalidate_on_commit(
+        using, cache.COLLECTION, cache.listing_scope(instance.listing_id)
+    )
@@ -0,0 +1,163 @@
+# listings/tasks.py
+
+# Booking side effects that do not have to finish inside the request. The
+# night slots stay synchronous in Booking.save because they are what stops
+# double bookings; everything here is queued once the write has committed.
+
+import logging
+from datetime import date, timedelta
+from functools import partial
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache as listing_cache
+from .models import BookedNight, Booking, ListingDailyStats
+
+logger = logging.getLogger(__name__)
+
+BOOKING_MESSAGES = {
+    "pending": "We received your booking request for {listing}.",
+    "confirmed": "Your booking at {listing} is confirmed.",
+    "cancelled": "Your booking at {listing} was cancelled.",
+}
+
+
+@shared_task(
+    autoretry_for=(OSError,), retry_backoff=True, max_retries=5, acks_late=True
+)
+def notify_booking_status(booking_id):
+    """Email the guest about the current status of a booking."""
+    booking = (
+        Booking.objects.select_related("listing", "user").filter(pk=booking_id).first()
+    )
+    if booking is None or not booking.user.email:
+        return
+    message = BOOKING_MESSAGES[booking.status].format(listing=booking.listing.title)
+    send_mail(
+        subject=f"Booking {booking.status}: {booking.listing.title}",
+        message=(
+            f"{message}\n\n"
+            f"Check-in: {booking.start_date}\nCheck-out: {booking.end_date}\n"
+        ),
+        from_email=None,
+        recipient_list=[booking.user.email],
+    )
+
+
+@shared_task(acks_late=True)
+def refresh_listing_availability(listing_id):
+    """
+    Re-derive a listing's night slots from its active bookings.
+
+    Booking.save keeps the slots in step; this repairs any drift left by
+    queryset updates, along with the daily stats rolled up from the slots,
+    and refreshes the cached date searches. Returns the number of slots
+    removed and added.
+    """
+    with transaction.atomic():
+        # Locking the bookings orders this against concurrent status changes
+        bookings = (
+            Booking.objects.select_for_update()
+            .filter(listing_id=listing_id)
+            .active()
+            .only("pk", "start_date", "end_date")
+        )
+        expected = [
+            BookedNight(listing_id=listing_id, booking_id=booking.pk, night=night)
+            for booking in bookings
+            for night in booking.nights
+        ]
+        removed, _ = (
+            BookedNight.objects.filter(listing_id=listing_id)
+            .exclude(
+                booking__status__in=Booking.ACTIVE_STATUSES,
+                booking__start_date__lte=F("night"),
+                booking__end_date__gt=F("night"),
+            )
+            .delete()
+        )
+        held = set(
+            BookedNight.objects.filter(listing_id=listing_id).values_list(
+                "night", flat=True
+            )
+        )
+        added = BookedNight.objects.bulk_create(
+            (slot for slot in expected if slot.night not in held),
+            ignore_conflicts=True,
+        )
+        if removed or added:
+            ListingDailyStats.objects.refresh([listing_id])
+
+    listing_cache.invalidate(listing_cache.AVAILABILITY)
+    if removed or added:
+        logger.warning(
+            "Repaired night slots of listing %s: %d removed, %d added",
+            listing_id,
+            removed,
+            len(added),
+        )
+    return removed, len(added)
+
+
+@shared_task(acks_late=True)
+def refresh_listing_stats(listing_id, start, end):
+    """
+    Re-roll a listing's daily stats for the nights in [start, end), given
+    as ISO dates. Returns the number of rollup rows written.
+    """
+    return ListingDailyStats.objects.refresh(
+        [listing_id], date.fromisoformat(start), date.fromisoformat(end)
+    )
+
+
+@shared_task
+def expire_pending_bookings(hold_hours=None, batch_size=None):
+    """
+    Cancel pending bookings held longer than the hold window.
+
+    Runs on the Celery beat schedule and from the `expire_bookings` command.
+    Returns the number of bookings cancelled.
+    """
+    if hold_hours is None:
+        hold_hours = settings.BOOKING_PENDING_HOLD_HOURS
+    if batch_size is None:
+        batch_size = settings.BOOKING_EXPIRY_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(hours=hold_hours)
+    expired = Booking.objects.expire_pending(cutoff, batch_size=batch_size)
+    if expired:
+        # Queryset updates send no signals, so refresh the date searches here
+        listing_cache.invalidate(listing_cache.AVAILABILITY)
+        logger.info("Expired %d pending bookings older than %s", expired, cutoff)
+    return expired
+
+
+def _queue_booking_effects(booking_id, listing_id, status_changed):
+    notify_booking_status.delay(booking_id)
+    if status_changed:
+        refresh_listing_availability.delay(listing_id)
+
+
+def dispatch_booking_effects(booking, status_changed=False):
+    """
+    Queue the side effects of a booking write once the transaction commits.
+
+    Nothing is sent for a write that rolls back, and workers never read a
+    booking that is not visible yet.
+    """
+    transaction.on_commit(
+        partial(_queue_booking_effects, booking.pk, booking.listing_id, status_changed)
+    )
+
+
+def queue_stats_refresh(listing_id, start, end):
+    """Refresh the daily stats of a confirmed stay once the write commits."""
+    transaction.on_commit(
+        partial(
+            refresh_listing_stats.delay, listing_id, start.isoformat(), end.isoformat()
+        )
+    )
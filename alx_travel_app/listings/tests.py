@@ -1,21 +1,83 @@
 # listings/tests.py
 
 # Create your tests here.
+import asyncio
 import json
+import os
+import tempfile
+from base64 import b64encode
+from contextlib import nullcontext
 from datetime import date, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
+from asgiref.sync import SyncToAsync, async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.test import APIClient, APITestCase
 
-from .models import Booking, Listing, Review
-from .serializers import BookingSerializer, ListingSerializer, ReviewSerializer
+from . import cache as listing_cache
+from . import profiling, routers
+from . import search as listing_search
+from . import throttling
+from .exports import iter_booking_rows
+from .management.commands import bench_api, bench_asgi
+from .models import (
+    BookedNight,
+    Booking,
+    BookingConflict,
+    Listing,
+    ListingDailyStats,
+    ListingRating,
+    ListingSearchToken,
+    Review,
+)
+from .routers import ReplicaRouter, RoutingState
+from .serializers import (
+    BookingListSerializer,
+    BookingSerializer,
+    ListingListSerializer,
+    ListingSerializer,
+    ReviewSerializer,
+)
+from .tasks import expire_pending_bookings, refresh_listing_availability
+from .views import BookingViewSet, ListingViewSet
 
 User = get_user_model()
 
+# Rate limits are off here, since buckets keyed by 127.0.0.1 and reused user
+# ids would carry over between tests; ThrottlingTests turns them back on.
+_no_throttling = override_settings(
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {}}
+)
+
+
+def setUpModule():
+    _no_throttling.enable()
+
+
+def tearDownModule():
+    _no_throttling.disable()
+
 
 class ModelTests(TestCase):
     """Test the models for the listings app."""
@@ -133,6 +195,8 @@ class ListingAPITests(APITestCase):
     """Test the listing API endpoints."""
 
     def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             username="testuser", email="test@example.com", password="testpass123"
@@ -424,3 +488,2544 @@ class ReviewModelIntegrationTests(APITestCase):
         total_rating = sum(review.rating for review in reviews)
         avg_rating = total_rating / reviews.count()
         self.assertEqual(avg_rating, 4.0)  # (5 + 3) / 2 = 4.0
+
+
+class KeysetPaginationTests(APITestCase):
+    """Test keyset pagination on the listing and booking endpoints."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.listings = [
+            Listing.objects.create(
+                title=f"Listing {i}",
+                description="A test listing",
+                price_per_night=Decimal("100.00"),
+                max_guests=2,
+            )
+            for i in range(5)
+        ]
+        # Give two listings the same timestamp so the id tie-breaker is used
+        Listing.objects.filter(
+            pk__in=[self.listings[1].pk, self.listings[2].pk]
+        ).update(created_at=self.listings[1].created_at)
+
+    def _walk(self, url, params=None):
+        pages = []
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            pages.append(data)
+            url, params = data["next"], None
+        return pages
+
+    def test_pages_cover_every_row_once(self):
+        """Test walking forward returns each listing exactly once, newest first."""
+        pages = self._walk(reverse("listings:listing-list"), {"page_size": 2})
+        ids = [item["id"] for page in pages for item in page["results"]]
+
+        expected = list(
+            Listing.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(ids, expected)
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link_returns_prior_page(self):
+        """Test following a previous link returns the page before."""
+        pages = self._walk(reverse("listings:listing-list"), {"page_size": 2})
+        response = self.client.get(pages[1]["previous"])
+
+        self.assertEqual(response.json()["results"], pages[0]["results"])
+
+    def test_page_is_a_single_query(self):
+        """Test a deep page costs one query besides the ETag aggregate."""
+        first = self.client.get(reverse("listings:listing-list"), {"page_size": 2})
+        with self.assertNumQueries(2):
+            response = self.client.get(first.json()["next"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected with 404."""
+        cursor = b64encode(b"p=%5B%22not-a-date%22%2C%221%22%5D").decode()
+        response = self.client.get(reverse("listings:booking-list"), {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookingOverlapTests(TestCase):
+    """Test the booking overlap queryset used for availability checks."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Test Listing",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.start = date.today() + timedelta(days=10)
+        self.booking = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.start,
+            end_date=self.start + timedelta(days=3),
+        )
+
+    def _conflicts(self, start_offset, nights):
+        start = self.start + timedelta(days=start_offset)
+        return (
+            Booking.objects.filter(listing=self.listing)
+            .active()
+            .overlapping(start, start + timedelta(days=nights))
+            .exists()
+        )
+
+    def test_overlapping_ranges(self):
+        """Test partial and enclosing ranges overlap."""
+        self.assertTrue(self._conflicts(-1, 2))
+        self.assertTrue(self._conflicts(1, 1))
+        self.assertTrue(self._conflicts(-5, 20))
+
+    def test_adjacent_ranges_do_not_overlap(self):
+        """Test check-out day can be the next guest's check-in day."""
+        self.assertFalse(self._conflicts(3, 2))
+        self.assertFalse(self._conflicts(-2, 2))
+
+    def test_cancelled_bookings_are_ignored(self):
+        """Test cancelled bookings release their dates."""
+        Booking.objects.filter(pk=self.booking.pk).update(status="cancelled")
+        self.assertFalse(self._conflicts(0, 3))
+
+    def test_overlap_benchmark_command(self):
+        """Test the overlap benchmark runs and leaves no rows behind."""
+        out = StringIO()
+        call_command(
+            "bench_overlap",
+            listings=2,
+            bookings_per_listing=20,
+            checks=10,
+            stdout=out,
+        )
+        self.assertIn("after (booking_overlap_idx)", out.getvalue())
+        self.assertEqual(Listing.objects.count(), 1)
+
+
+class BookedNightTests(TestCase):
+    """Test the night slots that back race-free reservations."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Test Listing",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.start = date.today() + timedelta(days=10)
+        self.booking = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.start,
+            end_date=self.start + timedelta(days=3),
+        )
+
+    def test_active_booking_holds_each_night(self):
+        """Test a booking holds one slot per night, excluding check-out day."""
+        nights = BookedNight.objects.filter(booking=self.booking)
+        self.assertEqual(
+            sorted(nights.values_list("night", flat=True)),
+            [self.start + timedelta(days=i) for i in range(3)],
+        )
+
+    def test_conflicting_save_is_rejected(self):
+        """Test the database rejects a booking that skips the overlap check."""
+        clash = Booking(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.start + timedelta(days=2),
+            end_date=self.start + timedelta(days=5),
+        )
+        with self.assertRaises(BookingConflict):
+            clash.save()
+        self.assertIsNone(clash.pk)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_cancel_and_move_update_slots(self):
+        """Test cancelling releases nights and moving a booking re-holds them."""
+        self.booking.start_date += timedelta(days=1)
+        self.booking.end_date += timedelta(days=1)
+        self.booking.save()
+        self.assertEqual(
+            min(self.booking.booked_nights.values_list("night", flat=True)),
+            self.start + timedelta(days=1),
+        )
+
+        self.booking.status = "cancelled"
+        self.booking.save()
+        self.assertFalse(BookedNight.objects.exists())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Stress the reservation path from several threads."""
+
+    def test_no_double_bookings_under_concurrency(self):
+        """Test concurrent requests never double book a listing."""
+        out = StringIO()
+        call_command("stress_bookings", listings=2, threads=4, attempts=60, stdout=out)
+        self.assertIn("double booked: 0", out.getvalue())
+
+
+class AvailabilityAPITests(APITestCase):
+    """Test the listing availability calendar endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.listing = Listing.objects.create(
+            title="Test Listing",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.start = date.today() + timedelta(days=2)
+        self.booking = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.start,
+            end_date=self.start + timedelta(days=2),
+        )
+        self.url = reverse(
+            "listings:listing-availability", kwargs={"id": self.listing.pk}
+        )
+
+    def test_availability_window(self):
+        """Test booked nights are split out of the requested window."""
+        response = self.client.get(
+            self.url,
+            {
+                "from": self.start.isoformat(),
+                "to": (self.start + timedelta(days=4)).isoformat(),
+            },
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            data["booked"],
+            [self.start.isoformat(), (self.start + timedelta(days=1)).isoformat()],
+        )
+        self.assertEqual(
+            data["available"],
+            [
+                (self.start + timedelta(days=2)).isoformat(),
+                (self.start + timedelta(days=3)).isoformat(),
+            ],
+        )
+
+    def test_default_window_is_90_nights(self):
+        """Test the window defaults to the next 90 nights."""
+        data = self.client.get(self.url).json()
+        self.assertEqual(data["from"], date.today().isoformat())
+        self.assertEqual(len(data["available"]) + len(data["booked"]), 90)
+
+    def test_cancelled_booking_frees_nights(self):
+        """Test cancelling a booking through the API frees its nights."""
+        self.client.patch(
+            reverse("listings:booking-detail", kwargs={"id": self.booking.pk}),
+            data=json.dumps(
+                {
+                    "status": "cancelled",
+                    "listing": self.listing.pk,
+                    "start_date": self.booking.start_date.isoformat(),
+                    "end_date": self.booking.end_date.isoformat(),
+                }
+            ),
+            content_type="application/json",
+        )
+        self.assertEqual(self.client.get(self.url).json()["booked"], [])
+
+    def test_invalid_window(self):
+        """Test reversed or oversized windows are rejected."""
+        response = self.client.get(self.url, {"from": "2030-01-10", "to": "2030-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {"from": "2030-01-01", "to": "2031-06-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_is_one_query_after_lookup(self):
+        """Test the calendar costs the listing lookup plus one range read."""
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class ListingSearchTests(APITestCase):
+    """Test searching listings by stay dates, guests and price."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.cheap = Listing.objects.create(
+            title="Cheap",
+            description="Small room",
+            price_per_night=Decimal("50.00"),
+            max_guests=2,
+        )
+        self.large = Listing.objects.create(
+            title="Large",
+            description="Family house",
+            price_per_night=Decimal("200.00"),
+            max_guests=6,
+        )
+        self.booked = Listing.objects.create(
+            title="Booked",
+            description="Popular flat",
+            price_per_night=Decimal("120.00"),
+            max_guests=4,
+        )
+        self.check_in = date.today() + timedelta(days=7)
+        Booking.objects.create(
+            listing=self.booked,
+            user=self.user,
+            start_date=self.check_in + timedelta(days=1),
+            end_date=self.check_in + timedelta(days=4),
+        )
+
+    def _search(self, **params):
+        response = self.client.get(reverse("listings:listing-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item["title"] for item in response.json()["results"]}
+
+    def test_excludes_listings_booked_for_the_stay(self):
+        """Test listings with an overlapping active booking are excluded."""
+        titles = self._search(
+            check_in=self.check_in.isoformat(),
+            check_out=(self.check_in + timedelta(days=2)).isoformat(),
+        )
+        self.assertEqual(titles, {"Cheap", "Large"})
+
+        titles = self._search(
+            check_in=(self.check_in + timedelta(days=4)).isoformat(),
+            check_out=(self.check_in + timedelta(days=6)).isoformat(),
+        )
+        self.assertEqual(titles, {"Cheap", "Large", "Booked"})
+
+    def test_filters_by_guests_and_price_range(self):
+        """Test guest count and price bounds combine."""
+        self.assertEqual(self._search(guests=3), {"Large", "Booked"})
+        self.assertEqual(self._search(min_price="100", max_price="150"), {"Booked"})
+
+    def test_search_is_a_single_query(self):
+        """Test a combined search runs as one query."""
+        with self.assertNumQueries(1):
+            titles = self._search(
+                check_in=self.check_in.isoformat(),
+                check_out=(self.check_in + timedelta(days=2)).isoformat(),
+                guests=2,
+                min_price="40",
+                max_price="500",
+            )
+        self.assertEqual(titles, {"Cheap", "Large"})
+
+    def test_invalid_search(self):
+        """Test incomplete or reversed parameters are rejected."""
+        url = reverse("listings:listing-list")
+        invalid = [
+            {"check_in": self.check_in.isoformat()},
+            {"check_in": "2030-01-05", "check_out": "2030-01-01"},
+            {"min_price": "300", "max_price": "100"},
+            {"guests": "0"},
+        ]
+        for params in invalid:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RatingAggregateTests(APITestCase):
+    """Test the denormalized rating aggregates on listings."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.listing = Listing.objects.create(
+            title="Rated",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.other = Listing.objects.create(
+            title="Unrated",
+            description="Another test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.reviews = [
+            Review.objects.create(listing=self.listing, user=self.user, rating=rating)
+            for rating in (5, 4, 4)
+        ]
+
+    def _summary(self):
+        return ListingRating.objects.get(listing=self.listing)
+
+    def test_create_edit_and_delete_update_aggregates(self):
+        """Test each review change is folded into the aggregates."""
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum), (3, 13))
+        self.assertEqual(summary.histogram, {"1": 0, "2": 0, "3": 0, "4": 2, "5": 1})
+
+        review = Review.objects.get(pk=self.reviews[0].pk)
+        review.rating = 1
+        review.save()
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum), (3, 9))
+        self.assertEqual((summary.stars_1, summary.stars_5), (1, 0))
+
+        review.delete()
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum), (2, 8))
+        self.assertEqual(summary.average, 4.0)
+
+    def test_serializer_exposes_aggregates(self):
+        """Test listings expose review count, average and histogram."""
+        response = self.client.get(
+            reverse("listings:listing-detail", kwargs={"id": self.listing.pk})
+        )
+        data = response.json()
+        self.assertEqual(data["review_count"], 3)
+        self.assertEqual(data["average_rating"], 4.33)
+        self.assertEqual(data["rating_histogram"]["4"], 2)
+
+        response = self.client.get(
+            reverse("listings:listing-detail", kwargs={"id": self.other.pk})
+        )
+        self.assertEqual(response.json()["review_count"], 0)
+        self.assertIsNone(response.json()["average_rating"])
+
+    def test_filter_and_sort_by_rating(self):
+        """Test min_rating filtering and ordering by average rating."""
+        url = reverse("listings:listing-list")
+        results = self.client.get(url, {"min_rating": "4.3"}).json()["results"]
+        self.assertEqual([item["title"] for item in results], ["Rated"])
+        results = self.client.get(url, {"min_rating": "4.5"}).json()["results"]
+        self.assertEqual(results, [])
+
+        first = self.client.get(url, {"ordering": "average_rating", "page_size": 1})
+        self.assertEqual(first.json()["results"][0]["title"], "Unrated")
+        second = self.client.get(first.json()["next"])
+        self.assertEqual(second.json()["results"][0]["title"], "Rated")
+
+    def test_list_is_a_single_query(self):
+        """Test the aggregates are joined rather than fetched per listing."""
+        # The second query is the ETag aggregate of the collection
+        with self.assertNumQueries(2):
+            self.client.get(reverse("listings:listing-list"))
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test the rebuild command recomputes aggregates from reviews."""
+        ListingRating.objects.filter(listing=self.listing).update(
+            review_count=99, rating_sum=1
+        )
+        call_command("rebuild_ratings", stdout=StringIO())
+        summary = self._summary()
+        self.assertEqual((summary.review_count, summary.rating_sum), (3, 13))
+        self.assertFalse(ListingRating.objects.filter(listing=self.other).exists())
+
+    def test_detail_routes_ignore_rating_ordering(self):
+        """Test `ordering=average_rating` is only applied to the list."""
+        cache.clear()
+        detail = reverse("listings:listing-detail", kwargs={"id": self.listing.pk})
+        urls = [
+            detail,
+            reverse("listings:listing-reviews", kwargs={"id": self.listing.pk}),
+            reverse("listings:listing-availability", kwargs={"id": self.listing.pk}),
+        ]
+        params = {"ordering": "average_rating"}
+        for url in urls:
+            self.assertEqual(self.client.get(url, params).status_code, 200, url)
+        with bench_asgi.read_views(True):
+            for url in urls:
+                self.assertEqual(self.client.get(url, params).status_code, 200, url)
+        response = self.client.put(
+            f"{detail}?ordering=average_rating",
+            {
+                "title": "Rated",
+                "description": "A test listing",
+                "price_per_night": "90.00",
+                "max_guests": 4,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class ListingReviewsAPITests(APITestCase):
+    """Test the paginated listing reviews action."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.listing = Listing.objects.create(
+            title="Test Listing",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.reviewers = [
+            User.objects.create_user(
+                username=f"reviewer{i}",
+                email=f"reviewer{i}@example.com",
+                password="testpass123",
+                first_name=f"Reviewer {i}",
+            )
+            for i in range(5)
+        ]
+        self.reviews = [
+            Review.objects.create(listing=self.listing, user=user, rating=4)
+            for user in self.reviewers
+        ]
+        self.url = reverse("listings:listing-reviews", kwargs={"id": self.listing.pk})
+
+    def test_reviews_are_paginated_newest_first(self):
+        """Test reviews come back in pages, newest first."""
+        first = self.client.get(self.url, {"page_size": 3}).json()
+        second = self.client.get(first["next"]).json()
+
+        ids = [item["id"] for item in first["results"] + second["results"]]
+        self.assertEqual(ids, [review.pk for review in reversed(self.reviews)])
+        self.assertIsNone(second["next"])
+
+    def test_reviewer_summary_is_embedded(self):
+        """Test each review embeds its reviewer without private fields."""
+        item = self.client.get(self.url).json()["results"][0]
+        self.assertEqual(
+            item["reviewer"],
+            {
+                "id": self.reviewers[-1].pk,
+                "username": "reviewer4",
+                "first_name": "Reviewer 4",
+            },
+        )
+        self.assertEqual(item["user"], self.reviewers[-1].pk)
+
+    def test_reviews_page_query_count(self):
+        """Test a page costs the listing lookup plus one joined query."""
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.json()["results"]), 5)
+
+
+class SeedCommandTests(TestCase):
+    """Test the bulk seeding command."""
+
+    def _seed(self, **options):
+        call_command(
+            "seed",
+            listings=4,
+            bookings_per_listing=6,
+            reviews_per_listing=3,
+            seed=7,
+            start_date=date(2030, 1, 1),
+            batch_size=5,
+            stdout=StringIO(),
+            **options,
+        )
+        return list(
+            Booking.objects.order_by("pk").values_list(
+                "listing_id", "start_date", "end_date", "status"
+            )
+        )
+
+    def test_seed_creates_requested_volumes(self):
+        """Test row counts, night slots and rating aggregates are seeded."""
+        self._seed()
+        self.assertEqual(Listing.objects.count(), 4)
+        self.assertEqual(Booking.objects.count(), 24)
+        self.assertEqual(Review.objects.count(), 12)
+
+        expected_nights = sum(
+            (booking.end_date - booking.start_date).days
+            for booking in Booking.objects.active()
+        )
+        self.assertEqual(BookedNight.objects.count(), expected_nights)
+        self.assertEqual(
+            sum(ListingRating.objects.values_list("review_count", flat=True)), 12
+        )
+
+    def test_seeded_bookings_do_not_overlap(self):
+        """Test generated stays never overlap on the same listing."""
+        rows = self._seed()
+        for listing_id in {row[0] for row in rows}:
+            stays = sorted(row[1:3] for row in rows if row[0] == listing_id)
+            for (_, previous_end), (next_start, _) in zip(stays, stays[1:]):
+                self.assertLessEqual(previous_end, next_start)
+
+    def test_same_seed_reproduces_data(self):
+        """Test reseeding with the same seed rebuilds identical bookings."""
+        first = self._seed()
+        second = self._seed()
+        offset = second[0][0] - first[0][0]
+        self.assertEqual([(row[0] + offset, *row[1:]) for row in first], second)
+
+
+class BookingExportTests(APITestCase):
+    """Test the streaming booking exports."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.listing = Listing.objects.create(
+            title="Test Listing",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        start = date(2030, 1, 1)
+        self.bookings = [
+            Booking.objects.create(
+                listing=self.listing,
+                user=self.user,
+                start_date=start + timedelta(days=3 * i),
+                end_date=start + timedelta(days=3 * i + 2),
+                status=status_,
+            )
+            for i, status_ in enumerate(["pending", "confirmed", "cancelled"])
+        ]
+
+    def _export(self, export_format, params=None):
+        response = self.client.get(
+            reverse("listings:booking-export", kwargs={"export_format": export_format}),
+            params,
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export(self):
+        """Test CSV export has a header and one line per booking."""
+        lines = self._export("csv").splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "listing_id", "user_id"])
+        self.assertEqual(len(lines), 4)
+
+    def test_ndjson_export_with_filters(self):
+        """Test NDJSON export honours status and date filters."""
+        records = [
+            json.loads(line)
+            for line in self._export("ndjson", {"status": "confirmed"}).splitlines()
+        ]
+        self.assertEqual([r["id"] for r in records], [self.bookings[1].pk])
+        self.assertEqual(records[0]["start_date"], "2030-01-04")
+
+        body = self._export("ndjson", {"from": "2030-01-05", "to": "2030-01-08"})
+        ids = [json.loads(line)["id"] for line in body.splitlines()]
+        self.assertEqual(ids, [self.bookings[1].pk, self.bookings[2].pk])
+
+    def test_export_reads_in_batches(self):
+        """Test rows are fetched in primary-key batches, not all at once."""
+        with self.assertNumQueries(3):
+            rows = list(iter_booking_rows(Booking.objects.all(), chunk_size=2))
+        self.assertEqual([row[0] for row in rows], [b.pk for b in self.bookings])
+
+    def test_export_command(self):
+        """Test the management command writes the same CSV."""
+        out = StringIO()
+        call_command(
+            "export_bookings", format="csv", listing_id=self.listing.pk, stdout=out
+        )
+        self.assertEqual(out.getvalue(), self._export("csv"))
+
+
+class ListingBulkAPITests(APITestCase):
+    """Test the bulk listing create/update endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("listings:listing-bulk")
+        self.listings = [
+            Listing.objects.create(
+                title=f"Listing {i}",
+                description="A test listing",
+                price_per_night=Decimal("100.00"),
+                max_guests=2,
+            )
+            for i in range(3)
+        ]
+
+    def _post(self, payload):
+        return self.client.post(
+            self.url, data=json.dumps(payload), content_type="application/json"
+        )
+
+    def test_bulk_create_and_update(self):
+        """Test creates and partial updates are applied with per-item results."""
+        before = self.listings[0].updated_at
+        response = self._post(
+            [
+                {"id": self.listings[0].pk, "price_per_night": "80.00"},
+                {
+                    "title": "New",
+                    "description": "Brand new",
+                    "price_per_night": "120.00",
+                    "max_guests": 3,
+                },
+                {"id": self.listings[1].pk, "max_guests": 6},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()["results"]
+        self.assertEqual(
+            [item["status"] for item in results], ["updated", "created", "updated"]
+        )
+
+        first = Listing.objects.get(pk=self.listings[0].pk)
+        self.assertEqual(first.price_per_night, Decimal("80.00"))
+        self.assertEqual(first.max_guests, 2)
+        self.assertGreater(first.updated_at, before)
+        self.assertEqual(Listing.objects.get(pk=self.listings[1].pk).max_guests, 6)
+        self.assertTrue(Listing.objects.filter(title="New").exists())
+
+    def test_invalid_item_rolls_back_everything(self):
+        """Test one invalid item rejects the batch with per-item errors."""
+        response = self._post(
+            [
+                {"id": self.listings[0].pk, "price_per_night": "80.00"},
+                {"title": "Broken", "price_per_night": "-1", "max_guests": 1},
+                {"id": 999999, "max_guests": 2},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()["errors"]
+        self.assertEqual(errors[0], {})
+        self.assertIn("price_per_night", errors[1])
+        self.assertIn("id", errors[2])
+        self.assertEqual(
+            Listing.objects.get(pk=self.listings[0].pk).price_per_night,
+            Decimal("100.00"),
+        )
+        self.assertEqual(Listing.objects.count(), 3)
+
+    def test_rejects_non_integer_ids(self):
+        """Test booleans, strings and floats are not taken as listing ids."""
+        response = self._post(
+            [
+                {"id": True, "max_guests": 5},
+                {"id": str(self.listings[0].pk), "max_guests": 5},
+                {"id": self.listings[1].pk + 0.5, "max_guests": 5},
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["errors"],
+            [{"id": ["A valid integer is required."]}] * 3,
+        )
+        self.assertFalse(Listing.objects.filter(max_guests=5).exists())
+
+    def test_query_count_does_not_grow_with_batch(self):
+        """Test a large batch costs a constant number of queries."""
+        payload = [
+            {"id": listing.pk, "price_per_night": "90.00"} for listing in self.listings
+        ] + [
+            {
+                "title": f"Bulk {i}",
+                "description": "Bulk created",
+                "price_per_night": "60.00",
+                "max_guests": 2,
+            }
+            for i in range(50)
+        ]
+        # in_bulk, savepoint, bulk_create, bulk_update, search token delete
+        # and insert, release savepoint
+        with self.assertNumQueries(7):
+            response = self._post(payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Listing.objects.count(), 53)
+
+    def test_created_ids_without_bulk_returning(self):
+        """Test backends like MySQL, which return no bulk insert ids, get ids."""
+        payload = [
+            {
+                "title": f"Bulk {i}",
+                "description": "Bulk created",
+                "price_per_night": "60.00",
+                "max_guests": 2,
+            }
+            for i in range(2)
+        ]
+        features = type(connection.features)
+        with mock.patch.object(features, "can_return_rows_from_bulk_insert", False):
+            response = self._post(payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in response.json()["results"]]
+        self.assertEqual(
+            ids,
+            list(
+                Listing.objects.filter(title__startswith="Bulk")
+                .order_by("title")
+                .values_list("id", flat=True)
+            ),
+        )
+        self.assertNotIn(None, ids)
+        self.assertEqual(
+            listing_search.search_listings(Listing.objects.all(), "bulk").count(), 2
+        )
+
+    def test_rejects_non_list_payload(self):
+        """Test the endpoint requires a list body."""
+        response = self._post({"title": "Not a list"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ListingCacheTests(APITestCase):
+    """Test the read-through cache for listing responses."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Cached",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.detail_url = reverse(
+            "listings:listing-detail", kwargs={"id": self.listing.pk}
+        )
+
+    def test_second_read_is_served_from_cache(self):
+        """Test a repeated read hits the cache without touching the database."""
+        stats = listing_cache.cache_stats()
+        first = self.client.get(self.detail_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail_url)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(listing_cache.cache_stats()["hits"], stats["hits"] + 1)
+
+    def test_query_params_are_normalized(self):
+        """Test parameter order does not split the cache."""
+        url = reverse("listings:listing-list")
+        self.client.get(url + "?max_price=500&min_price=10")
+        response = self.client.get(url + "?min_price=10&max_price=500")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+        response = self.client.get(url + "?min_price=20&max_price=500")
+        self.assertEqual(response["X-Cache"], "MISS")
+
+    def test_listing_save_invalidates_detail_and_list(self):
+        """Test saving a listing drops its detail and the list pages."""
+        list_url = reverse("listings:listing-list")
+        self.client.get(self.detail_url)
+        self.client.get(list_url)
+
+        self.listing.title = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+
+        detail = self.client.get(self.detail_url)
+        self.assertEqual(detail["X-Cache"], "MISS")
+        self.assertEqual(detail.json()["title"], "Renamed")
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "MISS")
+
+    def test_invalidation_waits_for_commit(self):
+        """Test a write only drops cached responses once it commits."""
+        self.client.get(self.detail_url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.listing.title = "Renamed"
+            self.listing.save()
+        # A read before the commit cannot re-cache rows under a new token
+        self.assertEqual(self.client.get(self.detail_url)["X-Cache"], "HIT")
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(self.detail_url)["X-Cache"], "MISS")
+
+    def test_review_invalidates_only_its_listing(self):
+        """Test a new review refreshes its listing but not other listings."""
+        other = Listing.objects.create(
+            title="Other",
+            description="Another listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        other_url = reverse("listings:listing-detail", kwargs={"id": other.pk})
+        reviews_url = reverse(
+            "listings:listing-reviews", kwargs={"id": self.listing.pk}
+        )
+        self.client.get(self.detail_url)
+        self.client.get(other_url)
+        self.client.get(reviews_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(listing=self.listing, user=self.user, rating=5)
+
+        detail = self.client.get(self.detail_url)
+        self.assertEqual(detail.json()["review_count"], 1)
+        self.assertEqual(len(self.client.get(reviews_url).json()["results"]), 1)
+        self.assertEqual(self.client.get(other_url)["X-Cache"], "HIT")
+
+    def test_booking_invalidates_date_searches_only(self):
+        """Test bookings refresh date searches but keep other list pages."""
+        list_url = reverse("listings:listing-list")
+        dates = {
+            "check_in": (date.today() + timedelta(days=1)).isoformat(),
+            "check_out": (date.today() + timedelta(days=2)).isoformat(),
+        }
+        self.client.get(self.detail_url)
+        self.client.get(list_url)
+        self.assertEqual(len(self.client.get(list_url, dates).json()["results"]), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                listing=self.listing,
+                user=self.user,
+                start_date=date.today() + timedelta(days=1),
+                end_date=date.today() + timedelta(days=2),
+            )
+        self.assertEqual(self.client.get(self.detail_url)["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(list_url)["X-Cache"], "HIT")
+        search = self.client.get(list_url, dates)
+        self.assertEqual(search["X-Cache"], "MISS")
+        self.assertEqual(search.json()["results"], [])
+
+    def test_errors_are_not_cached(self):
+        """Test missing listings are not cached."""
+        url = reverse("listings:listing-detail", kwargs={"id": 999999})
+        misses = listing_cache.cache_stats()["misses"]
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(listing_cache.cache_stats()["misses"], misses + 2)
+
+
+class ConditionalRequestTests(APITestCase):
+    """Test ETag and Last-Modified handling on listing reads."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Conditional",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.detail_url = reverse(
+            "listings:listing-detail", kwargs={"id": self.listing.pk}
+        )
+        self.list_url = reverse("listings:listing-list")
+
+    def test_detail_not_modified(self):
+        """Test a matching If-None-Match gets a 304 with the same validators."""
+        first = self.client.get(self.detail_url)
+        self.assertTrue(first["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", first)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], first["ETag"])
+
+    def test_not_modified_without_serializing(self):
+        """Test a cold 304 costs one small query and a cached one none."""
+        etag = self.client.get(self.detail_url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        listing_cache.invalidate_all()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_edits_change_the_etag(self):
+        """Test listing edits and new reviews both change the detail ETag."""
+        etag = self.client.get(self.detail_url)["ETag"]
+        self.listing.title = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.save()
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(listing=self.listing, user=self.user, rating=4)
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["review_count"], 1)
+
+    def test_collection_if_modified_since(self):
+        """Test the list honours If-Modified-Since and notices deletions."""
+        other = Listing.objects.create(
+            title="Other",
+            description="Another listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        Listing.objects.update(updated_at=timezone.now() - timedelta(days=1))
+        cache.set(listing_cache.DELETED_KEY, 0, timeout=None)
+        listing_cache.invalidate_all()
+
+        last_modified = self.client.get(self.list_url)["Last-Modified"]
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        response = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_collection_etag_depends_on_filters(self):
+        """Test different filters and pages get different ETags."""
+        everything = self.client.get(self.list_url)["ETag"]
+        cheap = self.client.get(self.list_url, {"max_price": "50"})["ETag"]
+        self.assertNotEqual(everything, cheap)
+
+    def test_date_search_has_no_validators(self):
+        """Test availability searches skip conditional handling."""
+        response = self.client.get(
+            self.list_url,
+            {
+                "check_in": (date.today() + timedelta(days=1)).isoformat(),
+                "check_out": (date.today() + timedelta(days=2)).isoformat(),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class BookingTaskTests(APITestCase):
+    """Test the booking side effects queued through Celery."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.listing = Listing.objects.create(
+            title="Queued",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.start = date.today() + timedelta(days=3)
+        self.end = self.start + timedelta(days=2)
+
+    def _create_booking(self):
+        return self.client.post(
+            reverse("listings:booking-list"),
+            {
+                "listing": self.listing.pk,
+                "start_date": self.start.isoformat(),
+                "end_date": self.end.isoformat(),
+            },
+            format="json",
+        )
+
+    def _task_callbacks(self, callbacks):
+        """Leave out the response cache invalidations."""
+        return [
+            callback
+            for callback in callbacks
+            if getattr(callback, "func", None) is not listing_cache.invalidate
+        ]
+
+    def test_effects_wait_for_commit(self):
+        """Test nothing is queued until the booking transaction commits."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self._create_booking()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self._task_callbacks(callbacks)), 1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_create_sends_notification(self):
+        """Test a new booking emails the guest once committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self._create_booking()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("pending", mail.outbox[0].subject)
+        self.assertEqual(mail.outbox[0].to, ["test@example.com"])
+
+    def test_status_change_notifies_and_refreshes(self):
+        """Test cancelling queues a notification and an availability refresh."""
+        booking_id = self._create_booking().json()["id"]
+        url = reverse("listings:booking-detail", kwargs={"id": booking_id})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.client.patch(
+                url,
+                {
+                    "status": "cancelled",
+                    "listing": self.listing.pk,
+                    "start_date": self.start.isoformat(),
+                    "end_date": self.end.isoformat(),
+                },
+                format="json",
+            )
+        self.assertEqual(len(callbacks), 1)
+        self.assertIn("cancelled", mail.outbox[-1].subject)
+        self.assertFalse(BookedNight.objects.filter(listing=self.listing).exists())
+
+    def test_unchanged_status_queues_nothing(self):
+        """Test an edit that keeps the status queues no side effects."""
+        booking_id = self._create_booking().json()["id"]
+        url = reverse("listings:booking-detail", kwargs={"id": booking_id})
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(
+                url,
+                {
+                    "listing": self.listing.pk,
+                    "start_date": self.start.isoformat(),
+                    "end_date": (self.end + timedelta(days=1)).isoformat(),
+                },
+                format="json",
+            )
+        self.assertEqual(self._task_callbacks(callbacks), [])
+
+    def test_refresh_repairs_drifted_slots(self):
+        """Test the availability refresh fixes slots left by queryset updates."""
+        cancelled = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.start,
+            end_date=self.end,
+        )
+        Booking.objects.filter(pk=cancelled.pk).update(status="cancelled")
+        confirmed = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=self.end,
+            end_date=self.end + timedelta(days=1),
+            status="confirmed",
+        )
+        BookedNight.objects.filter(booking=confirmed).delete()
+
+        with self.assertLogs("listings.tasks", level="WARNING"):
+            removed, added = refresh_listing_availability(self.listing.pk)
+
+        self.assertEqual((removed, added), (2, 1))
+        self.assertEqual(
+            list(BookedNight.objects.values_list("booking_id", "night")),
+            [(confirmed.pk, self.end)],
+        )
+
+
+class ExpirePendingBookingsTests(TestCase):
+    """Test the sweeper that cancels stale pending bookings."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Held",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+
+    def _booking(self, offset, status="pending", age_hours=48):
+        start = date.today() + timedelta(days=offset)
+        booking = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=start,
+            end_date=start + timedelta(days=1),
+            status=status,
+        )
+        Booking.objects.filter(pk=booking.pk).update(
+            created_at=timezone.now() - timedelta(hours=age_hours)
+        )
+        return booking
+
+    def test_stale_pending_bookings_are_cancelled(self):
+        """Test only pending bookings past the hold window are cancelled."""
+        stale = [self._booking(offset) for offset in (1, 2, 3)]
+        fresh = self._booking(4, age_hours=1)
+        confirmed = self._booking(5, status="confirmed")
+        out = StringIO()
+
+        call_command(
+            "expire_bookings", "--hold-hours", "24", "--batch-size", "2", stdout=out
+        )
+
+        self.assertIn("Expired 3 pending bookings", out.getvalue())
+        statuses = dict(Booking.objects.values_list("pk", "status"))
+        self.assertEqual([statuses[booking.pk] for booking in stale], ["cancelled"] * 3)
+        self.assertEqual(statuses[fresh.pk], "pending")
+        self.assertEqual(statuses[confirmed.pk], "confirmed")
+        self.assertEqual(
+            set(BookedNight.objects.values_list("booking_id", flat=True)),
+            {fresh.pk, confirmed.pk},
+        )
+
+    def test_expired_nights_can_be_booked_again(self):
+        """Test an expired hold releases its nights for new bookings."""
+        self._booking(1)
+        self.assertEqual(expire_pending_bookings(hold_hours=24), 1)
+
+        serializer = BookingSerializer(
+            data={
+                "listing": self.listing.pk,
+                "start_date": date.today() + timedelta(days=1),
+                "end_date": date.today() + timedelta(days=2),
+            }
+        )
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save(user=self.user)
+
+    def test_batches_are_bounded(self):
+        """Test each batch locks and updates at most batch_size rows."""
+        for offset in range(1, 6):
+            self._booking(offset)
+        cutoff = timezone.now() - timedelta(hours=24)
+        with CaptureQueriesContext(connection) as queries:
+            expired = Booking.objects.expire_pending(cutoff, batch_size=2)
+
+        self.assertEqual(expired, 5)
+        updates = [q["sql"] for q in queries if q["sql"].startswith("UPDATE")]
+        # Two full batches of two and a last one with the remaining row
+        self.assertEqual(len(updates), 3)
+
+
+class BookingStatusTransitionTests(APITestCase):
+    """Test the status-only PATCH fast path and its state machine."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.listing = Listing.objects.create(
+            title="Transitions",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.booking = Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=date.today() + timedelta(days=1),
+            end_date=date.today() + timedelta(days=3),
+        )
+        self.url = reverse("listings:booking-detail", kwargs={"id": self.booking.pk})
+
+    def _patch(self, data):
+        return self.client.patch(self.url, data, format="json")
+
+    def test_status_only_patch_is_one_update(self):
+        """Test a status change loads the row once and updates it once."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self._patch({"status": "confirmed"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["status"], "confirmed")
+        self.assertEqual(response.json()["start_date"], str(self.booking.start_date))
+        statements = [
+            q["sql"].split()[0]
+            for q in queries
+            if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))
+        ]
+        self.assertEqual(statements, ["SELECT", "UPDATE"])
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "confirmed")
+
+    def test_cancel_frees_nights(self):
+        """Test cancelling through the fast path releases the night slots."""
+        self._patch({"status": "confirmed"})
+        response = self._patch({"status": "cancelled"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(BookedNight.objects.filter(booking=self.booking).exists())
+
+    def test_unchanged_stay_skips_overlap_check(self):
+        """Test resending the current stay with a new status takes the fast path."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self._patch(
+                {
+                    "status": "cancelled",
+                    "start_date": str(self.booking.start_date),
+                    "end_date": str(self.booking.end_date),
+                }
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('end_date" >' in q["sql"] for q in queries))
+
+    def test_disallowed_transition_is_rejected(self):
+        """Test a cancelled booking cannot be confirmed or reopened."""
+        self._patch({"status": "cancelled"})
+        for target in ("confirmed", "pending"):
+            response = self._patch({"status": target})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("status", response.json())
+
+    def test_concurrent_change_is_a_conflict(self):
+        """Test losing a race to another status change returns 409."""
+        stale = Booking.objects.get(pk=self.booking.pk)
+        Booking.objects.filter(pk=self.booking.pk).update(status="cancelled")
+        with mock.patch.object(BookingViewSet, "get_object", return_value=stale):
+            response = self._patch({"status": "confirmed"})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "cancelled")
+
+    def test_date_change_still_checks_overlap(self):
+        """Test moving the stay onto another booking is still rejected."""
+        Booking.objects.create(
+            listing=self.listing,
+            user=self.user,
+            start_date=date.today() + timedelta(days=5),
+            end_date=date.today() + timedelta(days=7),
+        )
+        response = self._patch({"end_date": str(date.today() + timedelta(days=6))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BenchAPICommandTests(TestCase):
+    """Test the API benchmark command on a tiny dataset."""
+
+    def setUp(self):
+        # The suite already runs in a test database
+        patcher = mock.patch.object(
+            bench_api.Command, "_test_database", lambda self: nullcontext()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.output = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+        self.output.close()
+        self.addCleanup(os.unlink, self.output.name)
+
+    def _run(self, *args):
+        call_command(
+            "bench_api",
+            "--scales",
+            "3",
+            "--requests",
+            "2",
+            "--output",
+            self.output.name,
+            *args,
+            stderr=StringIO(),
+        )
+        with open(self.output.name) as handle:
+            return json.load(handle)
+
+    def test_report_covers_every_route(self):
+        """Test each route is measured, succeeds and reports its queries."""
+        report = self._run()
+        routes = {row["route"]: row for row in report["results"]}
+
+        self.assertIn("listings.reviews", routes)
+        self.assertIn("bookings.export.csv", routes)
+        self.assertIn("bookings.update", routes)
+        for row in routes.values():
+            self.assertTrue(all(code < 400 for code in row["status"]), row)
+            self.assertGreater(row["queries"], 0)
+            self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+        self.assertEqual(routes["listings.list"]["rows_per_request"], 3)
+
+    def test_compare_fails_on_more_queries(self):
+        """Test --compare rejects a route that now runs more queries."""
+        report = self._run()
+        for row in report["results"]:
+            if row["route"] == "listings.retrieve":
+                row["queries"] -= 1
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as base:
+            json.dump(report, base)
+        self.addCleanup(os.unlink, base.name)
+
+        with self.assertRaisesMessage(CommandError, "listings.retrieve"):
+            self._run("--compare", base.name)
+
+
+@override_settings(REQUEST_PROFILING=True)
+class RequestProfilingTests(APITestCase):
+    """Test the opt-in request profiling middleware."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        profiling.route_stats.reset()
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        Listing.objects.create(
+            title="Profiled",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.url = reverse("listings:listing-list")
+
+    def test_server_timing_header(self):
+        """Test responses carry DB, serializer, render and total timings."""
+        response = self.client.get(self.url)
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "slowest-query;dur=", "serialize;dur="):
+            self.assertIn(metric, timing)
+        self.assertIn("render;dur=", timing)
+        self.assertIn('desc="2 queries"', timing)
+
+    def test_structured_log(self):
+        """Test each request is logged as one JSON record."""
+        with self.assertLogs("listings.profiling", level="INFO") as logs:
+            self.client.get(self.url)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["route"], "GET listings:listing-list")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(record["queries"], 2)
+        self.assertIn("listings_listing", record["slowest_query"])
+        self.assertGreater(record["serialize_ms"], 0)
+        self.assertGreaterEqual(record["total_ms"], record["db_ms"])
+
+    def test_stats_endpoint_is_admin_only(self):
+        """Test the histograms are aggregated per route for admins only."""
+        self.client.get(self.url)
+        self.client.get(self.url)
+        stats_url = reverse("listings:profiling")
+        self.assertEqual(self.client.get(stats_url).status_code, 403)
+
+        self.client.force_authenticate(user=self.admin)
+        report = self.client.get(stats_url).json()
+        route = report["routes"]["GET listings:listing-list"]
+        self.assertEqual(route["count"], 2)
+        # The second read is served by the listing cache
+        self.assertEqual(route["queries"], {"sum": 2, "max": 2})
+        self.assertEqual(sum(route["total_ms"]["buckets"].values()), 2)
+        self.assertEqual(report["listing_cache"], {"hits": 1, "misses": 1})
+
+        self.assertEqual(self.client.delete(stats_url).status_code, 204)
+        report = self.client.get(stats_url).json()
+        # Requests are recorded once answered, so only the DELETE remains
+        self.assertEqual(list(report["routes"]), ["DELETE listings:profiling"])
+        self.assertEqual(report["listing_cache"], {"hits": 0, "misses": 0})
+
+    def test_async_views_stay_async(self):
+        """Test async views are profiled without leaving the event loop."""
+
+        async def view(request):
+            await Listing.objects.acount()
+            return HttpResponse()
+
+        middleware = profiling.RequestProfilingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_template_response))
+        response = async_to_sync(middleware)(RequestFactory().get(self.url))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn('"1 queries"', response["Server-Timing"])
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled_by_default(self):
+        """Test the middleware drops out when profiling is off."""
+        response = self.client.get(self.url)
+        self.assertNotIn("Server-Timing", response)
+
+
+class LeanListSerializerTests(APITestCase):
+    """Test the values() list serializers render what the model ones do."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="guest", email="guest@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.rated = Listing.objects.create(
+            title="Rated",
+            description="A test listing",
+            price_per_night=Decimal("99.50"),
+            max_guests=2,
+        )
+        self.unrated = Listing.objects.create(
+            title="Unrated",
+            description="A test listing",
+            price_per_night=Decimal("120"),
+            max_guests=4,
+        )
+        for rating in (5, 4, 4):
+            Review.objects.create(
+                listing=self.rated, user=self.user, rating=rating, comment="Nice"
+            )
+        Booking.objects.create(
+            listing=self.rated,
+            user=self.user,
+            start_date=date.today() + timedelta(days=1),
+            end_date=date.today() + timedelta(days=3),
+        )
+
+    def test_listing_rows_match_model_serializer(self):
+        """Test rated and unrated listings render identically."""
+        queryset = Listing.objects.select_related("rating").order_by("id")
+        expected = ListingSerializer(queryset, many=True).data
+        lean = ListingListSerializer(
+            queryset.values(*ListingListSerializer.columns()), many=True
+        ).data
+        self.assertEqual(json.dumps(lean), json.dumps(expected))
+
+    def test_booking_rows_match_model_serializer(self):
+        """Test bookings render identically."""
+        queryset = Booking.objects.order_by("id")
+        expected = BookingSerializer(queryset, many=True).data
+        lean = BookingListSerializer(
+            queryset.values(*BookingListSerializer.columns()), many=True
+        ).data
+        self.assertEqual(json.dumps(lean), json.dumps(expected))
+
+    def test_list_routes_match_detail_routes(self):
+        """Test each list row equals the detail response of the same object."""
+        for name in ("listing", "booking"):
+            rows = self.client.get(reverse(f"listings:{name}-list")).json()["results"]
+            self.assertTrue(rows)
+            for row in rows:
+                url = reverse(f"listings:{name}-detail", kwargs={"id": row["id"]})
+                self.assertEqual(self.client.get(url).json(), row)
+
+    def test_benchmark_command(self):
+        """Test the serializer benchmark reports both lists and rolls back."""
+        out = StringIO()
+        call_command("bench_serializers", "--rows", "20", "--repeat", "1", stdout=out)
+        self.assertIn("listings", out.getvalue())
+        self.assertIn("bookings", out.getvalue())
+        self.assertEqual(Listing.objects.count(), 2)
+        with self.assertRaises(CommandError):
+            call_command("bench_serializers", "--rows", "0")
+
+
+class SparseFieldsetTests(APITestCase):
+    """Test `?fields=` on the listing and booking routes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="guest", email="guest@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.listings = [
+            Listing.objects.create(
+                title=f"Listing {i}",
+                description="A long description",
+                price_per_night=Decimal("80.00") + i,
+                max_guests=2,
+            )
+            for i in range(3)
+        ]
+        Review.objects.create(
+            listing=self.listings[0], user=self.user, rating=4, comment="Nice"
+        )
+        self.booking = Booking.objects.create(
+            listing=self.listings[0],
+            user=self.user,
+            start_date=date.today() + timedelta(days=1),
+            end_date=date.today() + timedelta(days=3),
+        )
+        self.list_url = reverse("listings:listing-list")
+
+    def _get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json(), " ".join(query["sql"] for query in queries)
+
+    def test_list_limits_fields_and_columns(self):
+        """Test the list returns and selects only the requested fields."""
+        data, sql = self._get(self.list_url, {"fields": "id,title,price_per_night"})
+        for row in data["results"]:
+            self.assertEqual(set(row), {"id", "title", "price_per_night"})
+        self.assertNotIn("description", sql)
+        self.assertNotIn("stars_1", sql)
+
+    def test_list_pages_with_selected_fields(self):
+        """Test the cursor still works when the ordering keys are not shown."""
+        data, _ = self._get(
+            self.list_url, {"fields": "title", "page_size": 2, "ordering": "-price"}
+        )
+        self.assertEqual(len(data["results"]), 2)
+        following = self.client.get(data["next"]).json()
+        titles = [row["title"] for row in data["results"] + following["results"]]
+        self.assertEqual(sorted(titles), sorted(l.title for l in self.listings))
+
+    def test_list_ordered_by_rating(self):
+        """Test ordering by the rating annotation with a sparse fieldset."""
+        data, _ = self._get(
+            self.list_url,
+            {"fields": "id,average_rating", "ordering": "-average_rating"},
+        )
+        self.assertEqual(
+            data["results"][0], {"id": self.listings[0].pk, "average_rating": 4.0}
+        )
+
+    def test_detail_limits_fields_and_columns(self):
+        """Test the detail route loads only the requested columns."""
+        url = reverse("listings:listing-detail", kwargs={"id": self.listings[0].pk})
+        data, sql = self._get(url, {"fields": "title,review_count"})
+        self.assertEqual(data, {"title": "Listing 0", "review_count": 1})
+        self.assertNotIn("description", sql)
+
+        data, sql = self._get(url, {"fields": "title"})
+        self.assertEqual(data, {"title": "Listing 0"})
+        self.assertNotIn("listings_listingrating", sql)
+
+    def test_bookings(self):
+        """Test bookings accept the same parameter on both routes."""
+        url = reverse("listings:booking-list")
+        data, sql = self._get(url, {"fields": "id,status"})
+        self.assertEqual(
+            data["results"], [{"id": self.booking.pk, "status": "pending"}]
+        )
+        self.assertNotIn("start_date", sql.split("FROM")[0])
+
+        url = reverse("listings:booking-detail", kwargs={"id": self.booking.pk})
+        data, _ = self._get(url, {"fields": "listing,end_date"})
+        self.assertEqual(
+            data,
+            {"listing": self.listings[0].pk, "end_date": str(self.booking.end_date)},
+        )
+
+    def test_unknown_field(self):
+        """Test unknown field names are rejected."""
+        response = self.client.get(self.list_url, {"fields": "id,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("secret", response.json()["fields"][0])
+
+    def test_writes_ignore_fields(self):
+        """Test writes validate and return the full representation."""
+        url = reverse("listings:listing-detail", kwargs={"id": self.listings[1].pk})
+        response = self.client.patch(
+            f"{url}?fields=title", {"max_guests": 5}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["max_guests"], 5)
+        self.assertIn("description", response.json())
+
+
+class ListingTextSearchTests(APITestCase):
+    """Test full-text search over listing titles and descriptions."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.villa = self._listing("Beach Villa", "Quiet villa by the beach.")
+        self.flat = self._listing(
+            "City Flat", "Flat near the old town, far from any beach."
+        )
+        self.cabin = self._listing("Mountain Cabin", "Log cabin with a fireplace.")
+        self.url = reverse("listings:listing-list")
+
+    def _listing(self, title, description):
+        return Listing.objects.create(
+            title=title,
+            description=description,
+            price_per_night=Decimal("100.00"),
+            max_guests=2,
+        )
+
+    def _search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row["title"] for row in response.json()["results"]]
+
+    def test_tokenize(self):
+        """Test text is split into lower-cased words of two or more letters."""
+        self.assertEqual(
+            listing_search.tokenize("A Beach-front VILLA, 2 rooms"),
+            ["beach", "front", "villa", "rooms"],
+        )
+
+    def test_ranks_title_matches_first(self):
+        """Test a title match outranks a description match."""
+        self.assertEqual(self._search(q="beach"), ["Beach Villa", "City Flat"])
+
+    def test_every_word_must_match(self):
+        """Test a multi-word query only keeps listings with all the words."""
+        self.assertEqual(self._search(q="Beach flat"), ["City Flat"])
+        self.assertEqual(self._search(q="beach fireplace"), [])
+
+    def test_combines_with_filters_and_ordering(self):
+        """Test search composes with the other filters and explicit ordering."""
+        self.flat.price_per_night = Decimal("50.00")
+        self.flat.save()
+        self.assertEqual(self._search(q="beach", max_price=60), ["City Flat"])
+        self.assertEqual(
+            self._search(q="beach", ordering="price_per_night"),
+            ["City Flat", "Beach Villa"],
+        )
+
+    def test_paginates_by_relevance(self):
+        """Test keyset pages follow (relevance, id) without repeats."""
+        for i in range(5):
+            self._listing(f"Beach house {i}", "By the beach " * i)
+        response = self.client.get(self.url, {"q": "beach", "page_size": 3})
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+        titles = [row["title"] for page in pages for row in page["results"]]
+        self.assertEqual(len(titles), 7)
+        self.assertEqual(len(set(titles)), 7)
+        self.assertEqual(titles[0], "Beach house 4")
+
+    def test_index_follows_edits(self):
+        """Test saving and deleting a listing updates its search tokens."""
+        self.cabin.title = "Beach Cabin"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cabin.save()
+        self.assertIn("Beach Cabin", self._search(q="beach"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cabin.delete()
+        self.assertNotIn("Beach Cabin", self._search(q="beach"))
+        self.assertFalse(ListingSearchToken.objects.filter(token="cabin").exists())
+
+    def test_bulk_endpoint_indexes_text(self):
+        """Test listings created and renamed in bulk are searchable."""
+        self.client.force_authenticate(
+            user=User.objects.create_user(username="bulk", password="testpass123")
+        )
+        response = self.client.post(
+            reverse("listings:listing-bulk"),
+            [
+                {"id": self.cabin.pk, "title": "Lake Cabin"},
+                {
+                    "title": "Lake House",
+                    "description": "On the lake",
+                    "price_per_night": "80.00",
+                    "max_guests": 3,
+                },
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._search(q="lake"), ["Lake House", "Lake Cabin"])
+
+    def test_query_count_is_constant(self):
+        """Test a search page is the ETag aggregate plus one query."""
+        for i in range(10):
+            self._listing(f"Beach house {i}", "Sea view")
+        with self.assertNumQueries(2):
+            self._search(q="beach house")
+
+    def test_rejects_empty_query(self):
+        """Test a query without words is a validation error."""
+        response = self.client.get(self.url, {"q": " - "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_search(self):
+        """Test the admin changelist searches the index."""
+        self.client.force_login(
+            User.objects.create_superuser(
+                username="admin", email="admin@example.com", password="testpass123"
+            )
+        )
+        response = self.client.get(
+            reverse("admin:listings_listing_changelist"), {"q": "cabin"}
+        )
+        self.assertContains(response, "Mountain Cabin")
+        self.assertNotContains(response, "Beach Villa")
+
+    def test_rebuild_command(self):
+        """Test the rebuild command restores a cleared index."""
+        ListingSearchToken.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_search_index", "--batch-size", "2", stdout=out)
+        self.assertIn("Indexed 3 listings", out.getvalue())
+        self.assertEqual(self._search(q="villa"), ["Beach Villa"])
+
+
+class AsyncReadViewTests(APITestCase):
+    """Test the async listing reads match the DRF views they stand in for."""
+
+    def setUp(self):
+        # Cached responses outlive each test's rolled-back rows
+        cache.clear()
+        self.client = APIClient()
+        self.listing = Listing.objects.create(
+            title="Async Villa",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        for i in range(3):
+            Listing.objects.create(
+                title=f"Listing {i}",
+                description="Another listing",
+                price_per_night=Decimal("50.00") + i,
+                max_guests=2,
+            )
+        guest = User.objects.create_user(username="guest", password="testpass123")
+        Review.objects.create(
+            listing=self.listing, user=guest, rating=5, comment="Lovely"
+        )
+        start = date.today() + timedelta(days=3)
+        Booking.objects.create(
+            listing=self.listing,
+            user=guest,
+            start_date=start,
+            end_date=start + timedelta(days=2),
+        )
+        self.list_url = reverse("listings:listing-list")
+        self.detail_url = reverse(
+            "listings:listing-detail", kwargs={"id": self.listing.pk}
+        )
+
+    def _both(self, url, params=None):
+        """Fetch `url` from the DRF view, then cold from the async view."""
+        expected = self.client.get(url, params)
+        cache.clear()
+        with bench_asgi.read_views(True):
+            self.assertTrue(
+                asyncio.iscoroutinefunction(resolve(url.split("?")[0]).func)
+            )
+            actual = self.client.get(url, params)
+        return expected, actual
+
+    def test_reads_match_drf_views(self):
+        """Test each async route returns the same status and JSON."""
+        start = (date.today() + timedelta(days=1)).isoformat()
+        end = (date.today() + timedelta(days=10)).isoformat()
+        for url, params in [
+            (self.list_url, None),
+            (self.list_url, {"page_size": 2, "ordering": "price_per_night"}),
+            (self.list_url, {"fields": "id,title", "q": "villa"}),
+            (self.detail_url, None),
+            (self.detail_url, {"fields": "title"}),
+            (
+                reverse("listings:listing-reviews", kwargs={"id": self.listing.pk}),
+                None,
+            ),
+            (
+                reverse(
+                    "listings:listing-availability", kwargs={"id": self.listing.pk}
+                ),
+                {"from": start, "to": end},
+            ),
+        ]:
+            with self.subTest(url=url, params=params):
+                expected, actual = self._both(url, params)
+                self.assertEqual(actual.status_code, status.HTTP_200_OK)
+                self.assertEqual(actual.json(), expected.json())
+                self.assertEqual(actual["Content-Type"], expected["Content-Type"])
+
+    def test_cursor_pages(self):
+        """Test the async list follows the same keyset cursors."""
+        expected, actual = self._both(self.list_url, {"page_size": 2})
+        with bench_asgi.read_views(True):
+            second = self.client.get(actual.json()["next"])
+        self.assertEqual(second.json(), self.client.get(expected.json()["next"]).json())
+        self.assertEqual(len(second.json()["results"]), 2)
+
+    def test_cache_and_conditional_requests(self):
+        """Test the async views share the cache and answer If-None-Match."""
+        with bench_asgi.read_views(True):
+            first = self.client.get(self.detail_url)
+            second = self.client.get(self.detail_url)
+            not_modified = self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+            listed = self.client.get(self.list_url)
+            relisted = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=listed["ETag"])
+
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(relisted.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_errors_match_drf_views(self):
+        """Test a missing listing is a 404 and bad parameters are a 400."""
+        missing = reverse("listings:listing-detail", kwargs={"id": 999999})
+        availability = reverse(
+            "listings:listing-availability", kwargs={"id": self.listing.pk}
+        )
+        for url, params, code in [
+            (missing, None, status.HTTP_404_NOT_FOUND),
+            (self.list_url, {"fields": "nope"}, status.HTTP_400_BAD_REQUEST),
+            (availability, {"from": "soon"}, status.HTTP_400_BAD_REQUEST),
+        ]:
+            with self.subTest(url=url, params=params):
+                expected, actual = self._both(url, params)
+                self.assertEqual(actual.status_code, code)
+                self.assertEqual(actual.json(), expected.json())
+
+    def test_other_requests_use_the_viewset(self):
+        """Test writes and other formats still go through the DRF viewset."""
+        self.client.force_authenticate(user=User.objects.get(username="guest"))
+        with bench_asgi.read_views(True):
+            response = self.client.patch(
+                self.detail_url, {"title": "Renamed"}, format="json"
+            )
+            browsable = self.client.get(self.detail_url, {"format": "api"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["title"], "Renamed")
+        self.assertEqual(browsable.status_code, status.HTTP_200_OK)
+        self.assertIn("text/html", browsable["Content-Type"])
+
+    def test_session_users_are_authenticated(self):
+        """Test a logged-in user is not anonymous to the async views."""
+        only_users = mock.patch.object(
+            ListingViewSet, "permission_classes", [IsAuthenticated]
+        )
+        with bench_asgi.read_views(True), only_users:
+            anonymous = self.client.get(self.detail_url)
+            self.client.login(username="guest", password="testpass123")
+            logged_in = self.client.get(self.detail_url)
+
+        self.assertEqual(anonymous.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(logged_in.status_code, status.HTTP_200_OK)
+
+    async def test_async_client(self):
+        """Test the views run natively under the async test client."""
+        with bench_asgi.read_views(True):
+            response = await self.async_client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["title"], "Async Villa")
+
+
+def sync_middleware(get_response):
+    """A middleware with no async support, for BenchASGICommandTests."""
+    return get_response
+
+
+class BenchASGICommandTests(TransactionTestCase):
+    """Test the ASGI/WSGI load benchmark on a tiny dataset."""
+
+    def setUp(self):
+        # Committed rows, so the server threads can read them
+        patcher = mock.patch.object(
+            bench_asgi.Command, "_test_database", lambda self: nullcontext()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_report_covers_every_variant(self):
+        """Test each server and view variant runs at each concurrency."""
+        out = StringIO()
+        call_command(
+            "bench_asgi",
+            "--listings",
+            "3",
+            "--requests",
+            "8",
+            "--concurrency",
+            "1,4",
+            stdout=out,
+            stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(
+            [(row["variant"], row["concurrency"]) for row in report["results"]],
+            [
+                (variant, level)
+                for variant, _, _ in bench_asgi.VARIANTS
+                for level in (1, 4)
+            ],
+        )
+        for row in report["results"]:
+            self.assertEqual((row["requests"], row["failures"]), (8, 0), row)
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+        self.assertTrue(report["meta"]["async_chain"])
+        self.assertEqual(report["meta"]["sync_middleware"], [])
+
+    @override_settings(WRITE_CONCURRENCY_LIMIT=4)
+    def test_reports_sync_only_middleware(self):
+        """Test middleware that pushes async views to a thread is named."""
+        path = f"{__name__}.sync_middleware"
+        self.assertEqual(bench_asgi.sync_only_middleware(), [])
+        with self.modify_settings(MIDDLEWARE={"append": path}):
+            self.assertEqual(bench_asgi.sync_only_middleware(), [path])
+
+    def test_rejects_bad_concurrency(self):
+        """Test --concurrency must be a list of positive integers."""
+        with self.assertRaisesMessage(CommandError, "--concurrency"):
+            call_command("bench_asgi", "--concurrency", "many")
+
+
+@override_settings(REPLICA_DATABASES=["replica"])
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test safe listing and booking reads go to a replica until a write."""
+
+    def setUp(self):
+        # A second connection to the test database stands in for the replica
+        primary = connections[DEFAULT_DB_ALIAS]
+        connections["replica"] = type(primary)(primary.settings_dict, "replica")
+        self.addCleanup(self._drop_replica)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.listing = Listing.objects.create(
+            title="Replicated",
+            description="A test listing",
+            price_per_night=Decimal("100.00"),
+            max_guests=4,
+        )
+        self.list_url = reverse("listings:listing-list")
+        cache.clear()
+
+    def _drop_replica(self):
+        connections["replica"].close()
+        del connections["replica"]
+
+    def _get(self, url, **params):
+        """GET `url`, returning the response and the queries per alias."""
+        with CaptureQueriesContext(
+            connections[DEFAULT_DB_ALIAS]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(primary), len(replica)
+
+    def test_router(self):
+        """Test reads use a replica only inside an opted-in request."""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Listing))
+
+        request = RequestFactory().get("/")
+        state = RoutingState(request)
+        token = routers._current.set(state)
+        self.addCleanup(routers._current.reset, token)
+        self.assertEqual(router.db_for_read(Listing), DEFAULT_DB_ALIAS)
+        request.resolver_match = resolve(reverse("listings:listing-list"))
+        self.assertEqual(Listing.objects.all().db, "replica")
+        self.assertEqual(router.db_for_write(Listing), DEFAULT_DB_ALIAS)
+        self.assertEqual(Listing.objects.all().db, "replica")
+
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(routers.track_writes):
+            Listing.objects.filter(pk=self.listing.pk).values("id").first()
+            self.assertFalse(state.wrote)
+            Listing.objects.filter(pk=self.listing.pk).update(max_guests=5)
+        self.assertTrue(state.wrote)
+        self.assertEqual(Listing.objects.all().db, DEFAULT_DB_ALIAS)
+
+        self.assertFalse(router.allow_migrate("replica", "listings"))
+        self.assertIsNone(router.allow_migrate(DEFAULT_DB_ALIAS, "listings"))
+
+    def test_safe_reads_use_the_replica(self):
+        """Test listing and booking reads run every query on the replica."""
+        for url in [
+            self.list_url,
+            reverse("listings:listing-detail", kwargs={"id": self.listing.pk}),
+            reverse("listings:booking-list"),
+        ]:
+            with self.subTest(url=url):
+                response, primary, replica = self._get(url)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+                self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_write_pins_the_client(self):
+        """Test a write keeps the request and the client's next reads on the primary."""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(
+            reverse("listings:listing-detail", kwargs={"id": self.listing.pk}),
+            {"title": "Renamed"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie["max-age"], settings.REPLICA_PIN_SECONDS)
+
+        response, primary, replica = self._get(self.list_url)
+        self.assertEqual(replica, 0)
+        self.assertEqual(response.json()["results"][0]["title"], "Renamed")
+
+        self.client.cookies.pop(routers.PIN_COOKIE)
+        _, primary, replica = self._get(self.list_url)
+        self.assertEqual(primary, 0)
+
+    def test_middleware_stays_async(self):
+        """Test async views keep the event loop, and their writes still pin."""
+        listings = Listing.objects.filter(pk=self.listing.pk)
+
+        async def view(request):
+            read_from = Listing.objects.all().db
+            # A thread of its own, so a connection the middleware never saw
+            await sync_to_async(listings.update, thread_sensitive=False)(max_guests=5)
+            return HttpResponse(f"{read_from} {Listing.objects.all().db}")
+
+        middleware = routers.ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get(self.list_url)
+        request.resolver_match = resolve(self.list_url)
+        response = async_to_sync(middleware)(request)
+        self.assertEqual(response.content, b"replica default")
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_other_views_use_the_primary(self):
+        """Test views that do not opt in never read from a replica."""
+        self.client.force_login(
+            User.objects.create_superuser(
+                username="admin", email="admin@example.com", password="testpass123"
+            )
+        )
+        _, primary, replica = self._get(reverse("listings:profiling"))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+
+class AdminChangelistTests(TestCase):
+    """Test the booking and review admin pages stay cheap as tables grow."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        self.client.force_login(self.admin)
+        self._add_rows(3)
+
+    def _add_rows(self, count):
+        start = date.today() + timedelta(days=1)
+        for i in range(count):
+            listing = Listing.objects.create(
+                title=f"Admin listing {Listing.objects.count()}",
+                description="A test listing",
+                price_per_night=Decimal("100.00"),
+                max_guests=2,
+            )
+            user = User.objects.create(username=f"guest{User.objects.count()}")
+            Booking.objects.create(
+                listing=listing,
+                user=user,
+                start_date=start,
+                end_date=start + timedelta(days=2),
+            )
+            Review.objects.create(listing=listing, user=user, rating=4)
+
+    def _queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        """Test the changelists join listing and user instead of a query per row."""
+        pages = [
+            (reverse("admin:listings_booking_changelist"), None),
+            (reverse("admin:listings_booking_changelist"), {"status": "pending"}),
+            (reverse("admin:listings_review_changelist"), None),
+            (reverse("admin:listings_review_changelist"), {"rating": "4"}),
+        ]
+        before = [self._queries(url, params) for url, params in pages]
+        self._add_rows(10)
+        after = [self._queries(url, params) for url, params in pages]
+        self.assertEqual(after, before)
+        # Session, user, count and rows
+        self.assertEqual(max(after), 4)
+
+    def test_unfiltered_count_uses_the_estimate(self):
+        """Test a large unfiltered table reports the estimate without COUNT(*)."""
+        url = reverse("admin:listings_booking_changelist")
+        with mock.patch(
+            "listings.pagination.estimated_row_count", return_value=2_000_000
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.context["cl"].result_count, 2_000_000)
+            self.assertFalse(any("COUNT(" in query["sql"].upper() for query in queries))
+
+            filtered = self.client.get(url, {"status": "pending"})
+        self.assertEqual(filtered.context["cl"].result_count, 3)
+
+    def test_small_table_is_counted_exactly(self):
+        """Test estimates below the threshold fall back to COUNT(*)."""
+        with mock.patch("listings.pagination.estimated_row_count", return_value=40):
+            response = self.client.get(reverse("admin:listings_review_changelist"))
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+    def test_change_form_does_not_load_every_choice(self):
+        """Test the FK widgets are autocompletes, not full option lists."""
+        booking = Booking.objects.select_related("listing").first()
+        other = Listing.objects.exclude(pk=booking.listing_id).first()
+        response = self.client.get(
+            reverse("admin:listings_booking_change", args=[booking.pk])
+        )
+        self.assertContains(response, "admin-autocomplete")
+        self.assertContains(response, booking.listing.title)
+        self.assertNotContains(response, other.title)
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+class ListingAnalyticsTests(APITestCase):
+    """Test the daily stats rollup and the analytics endpoint over it."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="testpass123"
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.villa = self._listing("Villa", "100.00")
+        self.flat = self._listing("Flat", "50.00")
+        self.url = reverse("listings:listing-analytics")
+        self.window = {"from": "2027-01-01", "to": "2027-03-01"}
+        # Nights of Jan 30, Jan 31 and Feb 1
+        self.stay = self._book(self.villa, date(2027, 1, 30), date(2027, 2, 2))
+        self._book(self.flat, date(2027, 2, 10), date(2027, 2, 14))
+        self._book(self.flat, date(2027, 2, 20), date(2027, 2, 22), "pending")
+
+    def _listing(self, title, price):
+        return Listing.objects.create(
+            title=title,
+            description="A test listing",
+            price_per_night=Decimal(price),
+            max_guests=2,
+        )
+
+    def _book(self, listing, start, end, status="confirmed"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                listing=listing,
+                user=self.admin,
+                start_date=start,
+                end_date=end,
+                status=status,
+            )
+
+    def _rows(self, **params):
+        response = self.client.get(self.url, {**self.window, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            (row["listing_id"], row["month"], row["nights_booked"], row["revenue"])
+            for row in response.json()["results"]
+        ]
+
+    def test_monthly_stats(self):
+        """Test confirmed nights are rolled up per listing and month."""
+        response = self.client.get(self.url, self.window)
+        self.assertEqual(
+            response.json()["results"][0],
+            {
+                "listing_id": self.villa.pk,
+                "month": "2027-01-01",
+                "nights_booked": 2,
+                "available_nights": 31,
+                "occupancy": 0.0645,
+                "revenue": "200.00",
+            },
+        )
+        self.assertEqual(
+            self._rows(),
+            [
+                (self.villa.pk, "2027-01-01", 2, "200.00"),
+                (self.villa.pk, "2027-02-01", 1, "100.00"),
+                (self.flat.pk, "2027-02-01", 4, "200.00"),
+            ],
+        )
+
+    def test_window_clips_months(self):
+        """Test occupancy counts only the month's nights inside the window."""
+        response = self.client.get(
+            self.url,
+            {"from": "2027-01-31", "to": "2027-02-11", "listing_id": self.villa.pk},
+        )
+        self.assertEqual(
+            [
+                (row["nights_booked"], row["available_nights"], row["occupancy"])
+                for row in response.json()["results"]
+            ],
+            [(1, 1, 1.0), (1, 10, 0.1)],
+        )
+
+    def test_one_query_over_the_rollup(self):
+        """Test a report page is one grouped query that never reads bookings."""
+        with CaptureQueriesContext(connection) as queries:
+            self._rows()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(Booking._meta.db_table, queries[0]["sql"])
+        self.assertIn(ListingDailyStats._meta.db_table, queries[0]["sql"])
+
+    def test_pages_by_listing_and_month(self):
+        """Test keyset pages walk every row once."""
+        response = self.client.get(self.url, {**self.window, "page_size": 2})
+        pages = [response.json()]
+        while pages[-1]["next"]:
+            pages.append(self.client.get(pages[-1]["next"]).json())
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(sum(len(page["results"]) for page in pages), 3)
+
+    def test_booking_writes_refresh_the_rollup(self):
+        """Test moving and cancelling a confirmed stay updates its nights."""
+        self.stay.refresh_from_db()
+        self.stay.start_date, self.stay.end_date = date(2027, 2, 5), date(2027, 2, 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stay.save()
+        self.assertEqual(
+            self._rows(listing_id=self.villa.pk),
+            [(self.villa.pk, "2027-02-01", 2, "200.00")],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse("listings:booking-detail", kwargs={"id": self.stay.pk}),
+                {"status": "cancelled"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._rows(listing_id=self.villa.pk), [])
+
+    def test_confirming_adds_the_stay(self):
+        """Test confirming a pending booking rolls up its nights."""
+        pending = Booking.objects.get(status="pending")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse("listings:booking-detail", kwargs={"id": pending.pk}),
+                {"status": "confirmed"},
+                format="json",
+            )
+        self.assertEqual(
+            self._rows(listing_id=self.flat.pk),
+            [(self.flat.pk, "2027-02-01", 6, "300.00")],
+        )
+
+    def test_requires_admin_and_a_valid_window(self):
+        """Test guests are refused and inverted windows rejected."""
+        response = self.client.get(self.url, {"from": "2027-03-01", "to": "2027-01-01"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(
+            user=User.objects.create_user(username="guest", password="testpass123")
+        )
+        response = self.client.get(self.url, self.window)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_concurrent_refreshes_do_not_conflict(self):
+        """Test a refresh overwrites rows another refresh inserted meanwhile."""
+        ListingDailyStats.objects.filter(listing=self.villa).update(
+            nights_booked=9, revenue=Decimal("900.00")
+        )
+        # The other refresh's rows appear after this one's delete
+        with mock.patch("django.db.models.query.QuerySet.delete"):
+            written = ListingDailyStats.objects.refresh([self.villa.pk])
+        self.assertEqual(written, 3)
+        self.assertEqual(
+            self._rows(listing_id=self.villa.pk),
+            [
+                (self.villa.pk, "2027-01-01", 2, "200.00"),
+                (self.villa.pk, "2027-02-01", 1, "100.00"),
+            ],
+        )
+
+    def test_refresh_command(self):
+        """Test the command rebuilds a cleared rollup."""
+        ListingDailyStats.objects.all().delete()
+        out = StringIO()
+        call_command("refresh_listing_stats", "--from", "2027-02-01", stdout=out)
+        self.assertIn("Rolled up 5 listing days", out.getvalue())
+        self.assertEqual([row[1] for row in self._rows()], ["2027-02-01", "2027-02-01"])
+
+
+class ThrottlingTests(APITestCase):
+    """Test the token-bucket rate limits and write load shedding."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.list_url = reverse("listings:listing-list")
+        self.payload = {
+            "title": "Throttled Listing",
+            "description": "A test listing",
+            "price_per_night": "80.00",
+            "max_guests": 2,
+        }
+        rates = override_settings(
+            REST_FRAMEWORK={
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {"read": "3/min", "write": "2/min"},
+            }
+        )
+        rates.enable()
+        self.addCleanup(rates.disable)
+        timer = mock.patch.object(
+            throttling.TokenBucketThrottle, "timer", return_value=1000.0
+        )
+        self.timer = timer.start()
+        self.addCleanup(timer.stop)
+
+    def _create(self, **extra):
+        return self.client.post(self.list_url, self.payload, format="json", **extra)
+
+    def test_burst_then_429_with_retry_after(self):
+        """Test writes past the burst are refused with Retry-After."""
+        for _ in range(2):
+            self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+        response = self._create()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # One token refills every 30 seconds at 2/min
+        self.assertEqual(response["Retry-After"], "30")
+        self.assertEqual(Listing.objects.count(), 2)
+
+    def test_bucket_refills_over_time(self):
+        """Test spent tokens come back at the configured rate."""
+        for _ in range(3):
+            self._create()
+        self.timer.return_value = 1029.0
+        self.assertEqual(self._create().status_code, 429)
+        self.timer.return_value = 1030.0
+        self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._create().status_code, 429)
+
+    def test_reads_and_writes_have_separate_budgets(self):
+        """Test spending the write budget leaves reads alone, and back."""
+        for _ in range(3):
+            self._create()
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.list_url).status_code, 200)
+        self.assertEqual(self.client.get(self.list_url).status_code, 429)
+
+        self.timer.return_value = 1060.0
+        for _ in range(2):
+            self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+
+    def test_buckets_per_user_and_per_ip(self):
+        """Test users and other addresses do not share an IP's bucket."""
+        for _ in range(3):
+            self._create()
+        self.assertEqual(self._create().status_code, 429)
+        self.assertEqual(
+            self._create(REMOTE_ADDR="10.0.0.2").status_code,
+            status.HTTP_201_CREATED,
+        )
+
+        for name in ("alice", "bob"):
+            self.client.force_authenticate(
+                user=User.objects.create_user(username=name, password="testpass123")
+            )
+            for _ in range(2):
+                self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+            self.assertEqual(self._create().status_code, 429)
+
+    def test_contended_bucket_fails_closed(self):
+        """Test a bucket locked by another request is not updated unlocked."""
+        cache.add("throttle:write:ip:127.0.0.1:lock", 1, 1)
+        response = self._create()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIsNone(cache.get("throttle:write:ip:127.0.0.1"))
+
+        cache.delete("throttle:write:ip:127.0.0.1:lock")
+        self.assertEqual(self._create().status_code, status.HTTP_201_CREATED)
+
+    def test_contended_bucket_never_sleeps_on_the_event_loop(self):
+        """Test the async reads are throttled at once instead of waiting."""
+        cache.add("throttle:read:ip:127.0.0.1:lock", 1, 1)
+        throttle = throttling.ReadThrottle()
+        request = RequestFactory().get(self.list_url)
+        request.user = None
+
+        async def allow():
+            return throttle.allow_request(request, None)
+
+        with mock.patch.object(throttling.time, "sleep") as sleep:
+            self.assertFalse(async_to_sync(allow)())
+        sleep.assert_not_called()
+        self.assertEqual(throttle.wait(), throttle.lock_retry_after)
+
+    def test_async_reads_are_throttled(self):
+        """Test the async listing reads spend the same read budget."""
+        with bench_asgi.read_views(True):
+            codes = [self.client.get(self.list_url).status_code for _ in range(4)]
+        self.assertEqual(codes, [200, 200, 200, 429])
+
+    def test_async_reads_are_keyed_by_user(self):
+        """Test two users behind one IP get their own async read buckets."""
+        for name in ("alice", "bob"):
+            User.objects.create_user(username=name, password="testpass123")
+        with bench_asgi.read_views(True):
+            self.client.login(username="alice", password="testpass123")
+            alice = [self.client.get(self.list_url).status_code for _ in range(4)]
+            self.client.login(username="bob", password="testpass123")
+            bob = [self.client.get(self.list_url).status_code for _ in range(4)]
+        self.assertEqual(alice, [200, 200, 200, 429])
+        self.assertEqual(bob, [200, 200, 200, 429])
+
+    @override_settings(WRITE_CONCURRENCY_LIMIT=1, LOAD_SHED_RETRY_AFTER=2)
+    def test_load_shedder_refuses_writes_over_the_limit(self):
+        """Test writes past the in-flight limit get 503, reads still run."""
+        factory = RequestFactory()
+        inner = []
+
+        def view(request):
+            if not inner:
+                inner.append(shedder(factory.post("/api/listings/")))
+                inner.append(shedder(factory.get("/api/listings/")))
+            return HttpResponse(status=201)
+
+        shedder = throttling.WriteLoadShedMiddleware(view)
+        self.assertEqual(shedder(factory.post("/api/listings/")).status_code, 201)
+        shed, read = inner
+        self.assertEqual(shed.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(shed["Retry-After"], "2")
+        self.assertEqual(read.status_code, 201)
+        # The slot is released once the write finishes
+        self.assertEqual(shedder(factory.put("/api/listings/1/")).status_code, 201)
+
+    @override_settings(WRITE_CONCURRENCY_LIMIT=1)
+    def test_load_shedder_stays_async(self):
+        """Test the load shedder keeps async views on the event loop."""
+        factory = RequestFactory()
+        inner = []
+
+        async def view(request):
+            if not inner:
+                inner.append(await shedder(factory.post("/api/listings/")))
+            return HttpResponse(status=201)
+
+        shedder = throttling.WriteLoadShedMiddleware(view)
+        self.assertTrue(iscoroutinefunction(shedder))
+        response = async_to_sync(shedder)(factory.post("/api/listings/"))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(inner[0].status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @override_settings(REQUEST_PROFILING=True, REPLICA_DATABASES=["replica"])
+    def test_asgi_middleware_chain_stays_async(self):
+        """Test no middleware in the chain sends async views to a thread."""
+        handler = ASGIHandler()
+        self.assertNotIsInstance(handler._middleware_chain, SyncToAsync)
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    @override_settings(WRITE_CONCURRENCY_LIMIT=0)
+    def test_load_shedder_can_be_turned_off(self):
+        """Test a limit of 0 removes the middleware."""
+        with self.assertRaises(MiddlewareNotUsed):
+            throttling.WriteLoadShedMiddleware(lambda request: None)
@@ -0,0 +1,164 @@
+# listings/throttling.py
+
+# Per-client rate limits and write load shedding.
+#
+# ReadThrottle and WriteThrottle are token buckets with separate budgets for
+# safe and unsafe requests, keyed by user for authenticated requests and by
+# client IP otherwise. A "N/period" rate allows bursts of N requests and
+# refills N tokens per period. Bucket state lives in the default cache, with
+# each update done under a short cache lock (`cache.add`), so the cache must
+# be shared by every worker (Redis or Memcached) for the limits to be global.
+# A request that cannot get the lock quickly is throttled, since updating the
+# bucket without it could lose another request's spend. On an event loop
+# (the async listing reads) it is throttled at once rather than waiting, since
+# sleeping there would stall every other request on the loop.
+#
+# WriteLoadShedMiddleware caps the writes in flight in each process and
+# answers the excess with 503 and Retry-After, so a burst fails fast instead
+# of queueing on database locks.
+
+import asyncio
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket per user, or per IP for anonymous requests."""
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+    safe = True
+    # How long to wait for another request's update of the same bucket, and
+    # the Retry-After sent when that runs out
+    lock_wait = 0.05
+    lock_retry_after = 1
+
+    def get_rate(self):
+        # Read at request time, so changed settings apply without a restart
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_cache_key(self, request, view):
+        if (request.method in SAFE_METHODS) != self.safe:
+            return None
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        lock = f"{self.key}:lock"
+        if not self._acquire(lock):
+            self.tokens = None
+            return False
+
+        refill = self.num_requests / self.duration
+        try:
+            now = self.timer()
+            tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + (now - updated) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            # An entry that expires has refilled completely anyway
+            self.cache.set(self.key, (tokens, now), self.duration)
+        finally:
+            self.cache.delete(lock)
+        self.tokens = tokens
+        return allowed
+
+    def wait(self):
+        if self.tokens is None:
+            return self.lock_retry_after
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+    def _acquire(self, lock):
+        # The lock expires by itself if its holder dies mid-update
+        deadline = time.monotonic() + (0 if _on_event_loop() else self.lock_wait)
+        while not self.cache.add(lock, 1, 1):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+
+def _on_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class ReadThrottle(TokenBucketThrottle):
+    scope = "read"
+    safe = True
+
+
+class WriteThrottle(TokenBucketThrottle):
+    scope = "write"
+    safe = False
+
+
+class WriteLoadShedMiddleware:
+    """
+    Answer writes with 503 once WRITE_CONCURRENCY_LIMIT of them are already
+    running in this process.
+
+    Removes itself when the limit is 0. Async-capable, so it keeps async views
+    on the event loop under ASGI; taking a slot never blocks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.WRITE_CONCURRENCY_LIMIT:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slots = threading.BoundedSemaphore(settings.WRITE_CONCURRENCY_LIMIT)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        if not self.slots.acquire(blocking=False):
+            return self._shed()
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS:
+            return await self.get_response(request)
+        if not self.slots.acquire(blocking=False):
+            return self._shed()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.slots.release()
+
+    def _shed(self):
+        response = JsonResponse(
+            {"detail": "Too many writes in progress; retry shortly."},
+            status=503,
+        )
+        response["Retry-After"] = str(settings.LOAD_SHED_RETRY_AFTER)
+        return response
@@ -1,18 +1,24 @@
 # listings/urls.py
 
+from django.conf import settings
 from django.urls import include, path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 # Create a router for API endpoints
 router = DefaultRouter()
 router.register(r"listings", views.ListingViewSet, basename="listing")
 router.register(r"bookings", views.BookingViewSet, basename="booking")
 
+router_urls = router.urls
+if settings.ASYNC_READ_VIEWS:
+    # Hot listing reads answered by native async views, for ASGI deployments
+    router_urls = async_views.route_reads(router_urls)
+
 # Schema view for app-specific documentation
 app_schema_view = get_schema_view(
     openapi.Info(
@@ -24,19 +30,31 @@ app_schema_view = get_schema_view(
         ## Available Endpoints
         - `/listings/` - Manage travel listings (GET, POST)
         - `/listings/{id}/` - Manage a specific listing (GET, PUT, PATCH, DELETE)
-        - `/listings/{id}/reviews/` - Get reviews for a listing (GET)
+        - `/listings/bulk/` - Create and update many listings in one transaction (POST)
+        - `/listings/{id}/reviews/` - Get paginated reviews for a listing, newest first (GET)
+        - `/listings/{id}/availability/` - Free and booked nights between `from` and `to` (GET)
+        - `/listings/analytics/` - Nights booked, occupancy and revenue per listing and month, admins only (GET)
         - `/bookings/` - Manage bookings (GET, POST)
         - `/bookings/{id}/` - Manage a specific booking (GET, PUT, PATCH, DELETE)
+        - `/bookings/export/csv/`, `/bookings/export/ndjson/` - Stream bookings (GET)
+        - `/profiling/` - Per-route timing histograms and listing cache hit counts, admins only (GET, DELETE)
         
         ## Filtering
-        - Listings can be filtered by `max_price`
-        - Bookings can be filtered by `listing_id` and `user_id`
+        - Listings can be searched by `check_in`/`check_out` (free for the stay),
+          `guests`, `min_price`, `max_price`, `min_rating` and `q` (words of the
+          title or description, ranked by relevance)
+        - Listings can be sorted with `ordering` on `created_at`, `price_per_night`
+          or `average_rating` (prefix `-` for descending)
+        - Bookings can be filtered by `listing_id`, `user_id`, `status` and a
+          `from`/`to` stay window
+        - Listing and booking reads accept `fields` (e.g. `fields=id,title`) to
+          return, and query, only those fields
         """,
     ),
     public=True,
     permission_classes=(permissions.AllowAny,),
     patterns=[
-        path("", include(router.urls)),
+        path("", include(router_urls)),
     ],
 )
 
@@ -44,7 +62,8 @@ app_name = "listings"
 
 urlpatterns = [
     # API endpoints
-    path("", include(router.urls)),
+    path("", include(router_urls)),
+    path("profiling/", views.ProfilingStatsView.as_view(), name="profiling"),
     # Documentation
     path(
         "docs/",
@@ -1,72 +1,511 @@
 # listings/views.py
 
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.db.models import Count, Exists, F, FloatField, Max, OuterRef
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import cache as listing_cache
+from . import profiling
+from . import search as listing_search
+from .exports import EXPORT_CONTENT_TYPES, stream_bookings
+from .models import BookedNight, Booking, Listing, ListingDailyStats, Review
+from .pagination import ListingStatsPagination
+from .serializers import (
+    AvailabilityQuerySerializer,
+    BookingFilterSerializer,
+    BookingListSerializer,
+    BookingSerializer,
+    ListingListSerializer,
+    ListingMonthStatsSerializer,
+    ListingReviewSerializer,
+    ListingSearchSerializer,
+    ListingSerializer,
+    ListingStatsQuerySerializer,
+)
+from .tasks import dispatch_booking_effects, queue_stats_refresh
+
+
+class FieldSelectionMixin:
+    """
+    Sparse fieldsets: `?fields=id,title` on the list and detail routes limits
+    the response to those fields and the query to the columns they need.
+
+    The field names come from `values_serializer_class.sources`; unknown
+    names are a 400. Detail reads load the columns with `.only()`, and the
+    model serializer drops the other fields.
+    """
 
-from .models import Booking, Listing, Review
-from .serializers import BookingSerializer, ListingSerializer, ReviewSerializer
+    values_serializer_class = None
 
+    def get_selected_fields(self):
+        raw = self.request.query_params.get("fields")
+        if self.action not in ("list", "retrieve") or not raw:
+            return None
+        fields = {name.strip() for name in raw.split(",") if name.strip()}
+        unknown = fields - set(self.values_serializer_class.sources)
+        if unknown:
+            raise ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(sorted(unknown))}."]}
+            )
+        return fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_selected_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_selected_fields()
+        if fields is None or not self.detail:
+            return queryset
+        columns = self.values_serializer_class.columns(fields | {"id"})
+        relations = {column.split("__")[0] for column in columns if "__" in column}
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+
+class ValuesListMixin(FieldSelectionMixin):
+    """
+    Serve the `list` action from `.values()` rows and a lean read serializer.
 
-class ListingViewSet(viewsets.ModelViewSet):
+    `values_serializer_class` renders the same JSON as the view's model
+    serializer. Only the columns of the selected fields are fetched, plus
+    the ordering keys.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_values_queryset()
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.get_values_serializer(queryset).data)
+        return self.get_paginated_response(self.get_values_serializer(page).data)
+
+    def get_values_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = self.values_serializer_class.columns(self.get_selected_fields())
+        # The paginator reads its cursor from the ordering keys and the id
+        for key in (*queryset.query.order_by, "id"):
+            if key.lstrip("-") not in columns:
+                columns.append(key.lstrip("-"))
+        return queryset.values(*columns)
+
+    def get_values_serializer(self, rows):
+        return self.values_serializer_class(
+            rows, many=True, fields=self.get_selected_fields()
+        )
+
+
+class ListingOrderingFilter(OrderingFilter):
+    """Text searches are ranked by relevance unless `ordering` says otherwise."""
+
+    def get_default_ordering(self, view):
+        if view.request.query_params.get("q"):
+            return ["-relevance"]
+        return super().get_default_ordering(view)
+
+    def get_valid_fields(self, queryset, view, context={}):
+        fields = super().get_valid_fields(queryset, view, context)
+        if view.action != "list":
+            # get_queryset only annotates the list with `average_rating`
+            fields = [field for field in fields if field[0] != "average_rating"]
+        return fields
+
+
+class ListingViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows listings to be viewed or edited.
     """
 
-    queryset = Listing.objects.all().order_by("-created_at")
+    queryset = Listing.objects.select_related("rating").order_by("-created_at", "-id")
     serializer_class = ListingSerializer
+    values_serializer_class = ListingListSerializer
     lookup_field = "id"
+    filter_backends = [ListingOrderingFilter]
+    ordering_fields = ["created_at", "price_per_night", "average_rating"]
+    ordering = ["-created_at"]
+    bulk_max_items = 1000
+    # Safe requests may read from REPLICA_DATABASES (listings/routers.py)
+    replica_reads = True
+    collection_stats = {"last_modified": Max("updated_at"), "count": Count("id")}
+
+    def list(self, request, *args, **kwargs):
+        return listing_cache.cached_response(
+            request,
+            listing_cache.collection_scopes(request),
+            lambda: super(ListingViewSet, self).list(request, *args, **kwargs),
+            validators=self._collection_validators,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return listing_cache.cached_response(
+            request,
+            [listing_cache.listing_scope(kwargs["id"])],
+            lambda: super(ListingViewSet, self).retrieve(request, *args, **kwargs),
+            validators=lambda: self._detail_validators(kwargs["id"]),
+        )
+
+    def _collection_validators(self):
+        """
+        Fingerprint the filtered collection with one aggregate query.
+
+        Any edit bumps `max(updated_at)` and any insert or delete changes the
+        count. Date searches are skipped: bookings change their results
+        without touching a listing.
+        """
+        if "check_in" in self.request.query_params:
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._collection_state(queryset.aggregate(**self.collection_stats))
+
+    async def _acollection_validators(self):
+        if "check_in" in self.request.query_params:
+            return None
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._collection_state(
+            await queryset.aaggregate(**self.collection_stats)
+        )
+
+    def _collection_state(self, stats):
+        last_modified = listing_cache.last_deleted()
+        if stats["last_modified"] is not None:
+            last_modified = max(last_modified, stats["last_modified"].timestamp())
+        fingerprint = f"{stats['count']}:{stats['last_modified']}"
+        return fingerprint, last_modified
+
+    def _detail_validators(self, pk):
+        try:
+            updated_at = self._updated_at(pk).first()
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+        return self._detail_state(updated_at)
+
+    async def _adetail_validators(self, pk):
+        try:
+            updated_at = await self._updated_at(pk).afirst()
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+        return self._detail_state(updated_at)
+
+    def _updated_at(self, pk):
+        return Listing.objects.filter(pk=pk).values_list("updated_at", flat=True)
+
+    def _detail_state(self, updated_at):
+        if updated_at is None:
+            return None
+        return updated_at.isoformat(), updated_at.timestamp()
 
     def get_queryset(self):
         """
-        Optionally filter listings by various parameters.
+        Optionally filter listings by stay dates, guest count, price, rating
+        and text.
+
+        Listings with a pending or confirmed booking overlapping
+        `check_in`..`check_out` are excluded with a correlated NOT EXISTS
+        on the booking overlap index, so the search is a single query.
+        `q` keeps the listings whose title or description contains every
+        word, annotated with their `relevance` (see `listings.search`).
         """
         queryset = super().get_queryset()
-        # Example of filtering by query parameters
-        max_price = self.request.query_params.get("max_price")
-        if max_price is not None:
-            queryset = queryset.filter(price_per_night__lte=max_price)
+        if self.action == "list":
+            # Only the list can be ordered by rating
+            queryset = queryset.annotate(
+                average_rating=Coalesce(
+                    Cast("rating__rating_sum", FloatField())
+                    / NullIf("rating__review_count", 0),
+                    0.0,
+                )
+            )
+        params = ListingSearchSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        search = params.validated_data
+
+        if "guests" in search:
+            queryset = queryset.filter(max_guests__gte=search["guests"])
+        if "min_price" in search:
+            queryset = queryset.filter(price_per_night__gte=search["min_price"])
+        if "max_price" in search:
+            queryset = queryset.filter(price_per_night__lte=search["max_price"])
+        if "min_rating" in search:
+            # sum >= min * count, so the average is never divided out per row
+            queryset = queryset.filter(
+                rating__review_count__gt=0,
+                rating__rating_sum__gte=search["min_rating"]
+                * F("rating__review_count"),
+            )
+        if "check_in" in search:
+            conflicts = (
+                Booking.objects.filter(listing=OuterRef("pk"))
+                .active()
+                .overlapping(search["check_in"], search["check_out"])
+            )
+            queryset = queryset.filter(~Exists(conflicts))
+        if "q" in search:
+            queryset = listing_search.search_listings(queryset, search["q"])
         return queryset
 
     @action(detail=True, methods=["get"])
     def reviews(self, request, id=None):
         """
-        Retrieve all reviews for a specific listing.
+        Retrieve the reviews for a specific listing, newest first.
+
+        Pages with a keyset cursor on (created_at, id) over the
+        `review_listing_created_idx` index, and joins each reviewer's summary
+        into the same query.
         """
+        return listing_cache.cached_response(
+            request,
+            [listing_cache.listing_scope(id)],
+            lambda: self._reviews_page(request),
+        )
+
+    def _reviews_page(self, request):
         listing = self.get_object()
-        reviews = Review.objects.filter(listing=listing)
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        # A dedicated paginator, so the listing `ordering` fields do not apply
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(self._reviews(listing), request)
+        serializer = ListingReviewSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
+    def _reviews(self, listing):
+        return Review.objects.filter(listing=listing).select_related("user")
+
+    @action(detail=True, methods=["get"])
+    def availability(self, request, id=None):
+        """
+        Return the booked and free nights of a listing between `from` and `to`.
+
+        Reads the night slots kept by `Booking.save`, so the calendar is one
+        range scan on the (listing, night) unique index.
+        """
+        listing = self.get_object()
+        start, end = self._availability_window(request)
+        booked = list(self._booked_nights(listing, start, end))
+        return self._availability_response(listing, start, end, booked)
 
-class BookingViewSet(viewsets.ModelViewSet):
+    def _availability_window(self, request):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return params.validated_data["from"], params.validated_data["to"]
+
+    def _booked_nights(self, listing, start, end):
+        return (
+            BookedNight.objects.filter(listing=listing, night__gte=start, night__lt=end)
+            .order_by("night")
+            .values_list("night", flat=True)
+        )
+
+    def _availability_response(self, listing, start, end, booked):
+        taken = set(booked)
+        nights = (start + timedelta(days=i) for i in range((end - start).days))
+        return Response(
+            {
+                "listing": listing.pk,
+                "from": start,
+                "to": end,
+                "available": [night for night in nights if night not in taken],
+                "booked": booked,
+            }
+        )
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def analytics(self, request):
+        """
+        Nights booked, occupancy and revenue per listing and month.
+
+        Covers the months overlapping `from`..`to` (optionally for one
+        `listing_id`) with one grouped query over the daily stats rollup,
+        never the bookings, and pages by (listing, month).
+        """
+        params = ListingStatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        window = params.validated_data
+
+        rows = ListingDailyStats.objects.monthly(window["from"], window["to"])
+        if "listing_id" in window:
+            rows = rows.filter(listing_id=window["listing_id"])
+        paginator = ListingStatsPagination()
+        page = paginator.paginate_queryset(rows, request)
+        serializer = ListingMonthStatsSerializer(page, many=True, context=window)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Create and update many listings in one request and one transaction.
+
+        The body is a list of listing payloads: items with an `id` are partial
+        updates, the others are creates. Every item is validated first; if any
+        fails, nothing is written and the per-item errors are returned.
+        Otherwise creates go through `bulk_create` and updates through
+        `bulk_update`. MySQL does not return ids from bulk inserts, so there
+        each create is its own INSERT, which reports the new id.
+        """
+        items = request.data
+        if not isinstance(items, list) or not all(
+            isinstance(item, dict) for item in items
+        ):
+            return Response(
+                {"detail": "Expected a list of listing objects."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {"detail": f"At most {self.bulk_max_items} listings per request."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        create_index = [i for i, item in enumerate(items) if "id" not in item]
+        update_index = [i for i, item in enumerate(items) if "id" in item]
+        creates = ListingSerializer(data=[items[i] for i in create_index], many=True)
+        updates = ListingSerializer(
+            data=[items[i] for i in update_index], many=True, partial=True
+        )
+
+        errors = [{} for _ in items]
+        if not creates.is_valid():
+            for i, item_errors in zip(create_index, creates.errors):
+                errors[i] = item_errors
+        if not updates.is_valid():
+            for i, item_errors in zip(update_index, updates.errors):
+                errors[i] = item_errors
+
+        update_ids = [items[i]["id"] for i in update_index]
+        # bool is an int subclass, but `true` is not a listing id
+        valid_ids = [
+            pk for pk in update_ids if isinstance(pk, int) and not isinstance(pk, bool)
+        ]
+        existing = Listing.objects.in_bulk(valid_ids)
+        seen = set()
+        for i, pk in zip(update_index, update_ids):
+            if not isinstance(pk, int) or isinstance(pk, bool):
+                errors[i].setdefault("id", ["A valid integer is required."])
+            elif pk not in existing:
+                errors[i].setdefault("id", ["Listing not found."])
+            elif pk in seen:
+                errors[i].setdefault("id", ["Listing appears more than once."])
+            seen.add(pk)
+
+        if any(errors):
+            return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        changed_fields = {"updated_at"}
+        to_update = []
+        for pk, data in zip(update_ids, updates.validated_data):
+            listing = existing[pk]
+            for field, value in data.items():
+                setattr(listing, field, value)
+            listing.updated_at = now
+            changed_fields.update(data)
+            to_update.append(listing)
+
+        created = [Listing(**data) for data in creates.validated_data]
+        with transaction.atomic():
+            if connection.features.can_return_rows_from_bulk_insert:
+                Listing.objects.bulk_create(created)
+                unindexed = created
+            else:
+                for listing in created:
+                    listing.save(force_insert=True)
+                unindexed = []  # post_save indexed these
+            if to_update:
+                Listing.objects.bulk_update(
+                    to_update, sorted(changed_fields), batch_size=500
+                )
+            # No post_save either, so index the new and edited text here
+            listing_search.index_listings(
+                unindexed
+                + [
+                    listing
+                    for listing, data in zip(to_update, updates.validated_data)
+                    if {"title", "description"} & data.keys()
+                ]
+            )
+
+        # bulk_create and bulk_update do not send model signals
+        listing_cache.invalidate(
+            listing_cache.COLLECTION,
+            *(listing_cache.listing_scope(listing.pk) for listing in to_update),
+        )
+
+        results = [None] * len(items)
+        for i, listing in zip(create_index, created):
+            results[i] = {"id": listing.pk, "status": "created"}
+        for i, listing in zip(update_index, to_update):
+            results[i] = {"id": listing.pk, "status": "updated"}
+        return Response({"results": results})
+
+
+class BookingViewSet(ValuesListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows bookings to be viewed or edited.
     """
 
     serializer_class = BookingSerializer
+    values_serializer_class = BookingListSerializer
     lookup_field = "id"
+    replica_reads = True
 
     def get_queryset(self):
         """
-        Optionally filter bookings by listing_id or user.
+        Optionally filter bookings by listing_id, user_id, status or dates.
         """
-        queryset = Booking.objects.all().order_by("-created_at")
-        listing_id = self.request.GET.get("listing_id")
-        user_id = self.request.GET.get("user_id")
+        queryset = Booking.objects.all().order_by("-created_at", "-id")
+        filters = BookingFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        return filters.filter_queryset(queryset)
 
-        if listing_id:
-            queryset = queryset.filter(listing_id=listing_id)
-        if user_id:
-            queryset = queryset.filter(user_id=user_id)
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export/(?P<export_format>csv|ndjson)",
+    )
+    def export(self, request, export_format=None):
+        """
+        Stream the filtered bookings as CSV or NDJSON.
 
-        return queryset
+        Rows are read in primary-key batches and written as they arrive, so
+        memory stays flat however many bookings match.
+        """
+        response = StreamingHttpResponse(
+            stream_bookings(self.get_queryset(), export_format),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="bookings.{export_format}"'
+        )
+        return response
 
     def perform_create(self, serializer):
         """
         Automatically set the user to the current user when creating a booking.
         """
-        serializer.save(user=self.request.user)
+        booking = serializer.save(user=self.request.user)
+        dispatch_booking_effects(booking)
+
+    def perform_update(self, serializer):
+        """
+        Save the booking and queue its side effects if the status changed.
+        """
+        previous_status = serializer.instance.status
+        booking = serializer.save()
+        if booking.status != previous_status:
+            dispatch_booking_effects(booking, status_changed=True)
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -83,15 +522,63 @@ class BookingViewSet(viewsets.ModelViewSet):
     def partial_update(self, request, *args, **kwargs):
         """
         Handle PATCH requests for updating a booking.
+
+        A PATCH that only changes the status is applied with one conditional
+        UPDATE (see `Booking.change_status`) and answered from the loaded
+        row; a concurrent status change gets a 409. Anything else goes
+        through a regular serializer save.
         """
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
 
-        # Save the updated instance
+        # Compare foreign keys by id, so the loaded listing is not fetched
+        changed = {
+            name
+            for name, value in serializer.validated_data.items()
+            if getattr(instance, Booking._meta.get_field(name).attname)
+            != getattr(value, "pk", value)
+        }
+        if changed == {"status"}:
+            return self._change_status(instance, serializer.validated_data["status"])
+
         self.perform_update(serializer)
+        return Response(serializer.data)
+
+    def _change_status(self, instance, new_status):
+        previous_status = instance.status
+        if not instance.change_status(new_status):
+            return Response(
+                {"detail": "The booking status was changed by another request."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        # The queryset update sends no signals
+        listing_cache.invalidate(listing_cache.AVAILABILITY)
+        dispatch_booking_effects(instance, status_changed=True)
+        if "confirmed" in (previous_status, new_status):
+            queue_stats_refresh(
+                instance.listing_id, instance.start_date, instance.end_date
+            )
+        return Response(self.get_serializer(instance).data)
 
-        # Refresh the instance from the database to get the updated status
-        instance.refresh_from_db()
 
-        return Response(serializer.data)
+class ProfilingStatsView(APIView):
+    """
+    Per-route timing histograms from the request profiling middleware, and
+    the hit and miss counters of the listing response cache.
+
+    Admins only. Histograms cover the serving process, and the cache counters
+    every process sharing the cache, since their start or the last DELETE.
+    """
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(
+            {**profiling.stats_report(), "listing_cache": listing_cache.cache_stats()}
+        )
+
+    def delete(self, request):
+        profiling.route_stats.reset()
+        listing_cache.reset_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)